@@ -1,3 +1,28 @@
 # -*- coding: utf-8 -*-
-from .ias_parser import generate_ias_catalog
-from .pycbc_parser import generate_pycbc_catalog
\ No newline at end of file
+import importlib
+
+# {public name: module defining it}, imported on first access so that
+# `import catalog_generators` does not load pandas, h5py or bilby
+_LAZY_ATTRIBUTES = {
+    "Catalog": "catalog_query",
+    "CatalogGenerator": "catalog_generator",
+    "get_catalog_generator": "catalog_generator",
+    "register_catalog": "catalog_generator",
+    "generate_ias_catalog": "ias_parser",
+    "generate_pycbc_catalog": "pycbc_parser",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES.keys())
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_LAZY_ATTRIBUTES[name]}", __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted([*globals().keys(), *__all__])
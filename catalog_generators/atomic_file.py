@@ -0,0 +1,69 @@
+"""Write files atomically: to a temporary file next to them, renamed over them
+once complete.
+
+Readers (eg other processes loading a cache entry) then never see a partially
+written file, and the temporary name is unique to the writing process and
+thread (and numbered), so concurrent writers of the same file do not clobber
+each other's temporary file (the last one to finish wins).
+
+Example usage:
+
+    with atomic_write("data/file_index.json") as f:
+        json.dump(index, f)
+
+    output = AtomicFile("data/ias_catalog.json")  # written over several calls
+    output.file.write(...)
+    output.commit()  # or output.discard()
+
+"""
+import itertools
+import os
+import threading
+
+_COUNTER = itertools.count()
+
+
+def get_temporary_fname(fname: str) -> str:
+    """<fname>.<pid>.<thread id>.<n>.tmp (unique to each call)"""
+    return f"{fname}.{os.getpid()}.{threading.get_ident()}.{next(_COUNTER)}.tmp"
+
+
+class AtomicFile:
+
+    def __init__(self, fname: str, mode: str = 'w'):
+        """
+        :param mode: open mode of the temporary file ('w' or 'wb')
+        """
+        self.fname = fname
+        self.tmp_fname = get_temporary_fname(fname)
+        self.file = open(self.tmp_fname, mode)
+
+    def commit(self):
+        """Replace fname with the written file"""
+        if self.file.closed:
+            return
+        self.file.close()
+        os.replace(self.tmp_fname, self.fname)
+
+    def discard(self):
+        """Remove the written file (fname is left untouched)"""
+        if self.file.closed:
+            return
+        self.file.close()
+        os.remove(self.tmp_fname)
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
+
+
+def atomic_write(fname: str, mode: str = 'w') -> AtomicFile:
+    """Context manager giving a file that replaces fname once the block
+    completes (and is discarded if it raises)"""
+    return AtomicFile(fname, mode)
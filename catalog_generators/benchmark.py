@@ -0,0 +1,242 @@
+"""Time each stage of the catalog pipeline on synthetic posteriors.
+
+For every catalog a synthetic data dir (see synthetic_data) is written and the
+stages are timed separately (after an untimed pass over the first file, which
+pays the lazy imports of pandas, h5py, astropy...), with the peak memory
+allocated during each stage (tracemalloc, so only the main process is
+measured):
+ - load: read the summary parameters of every posterior file
+ - convert: make the samples GWOSC compatible
+ - summarise: quantile summaries of every event
+ - redshift: per-sample luminosity distance -> redshift conversion
+ - serialise: write the catalog json
+ - generate: the whole (non-incremental) CatalogGenerator.generate
+
+With --compact the samples are held in compact form (see compact_samples) and
+the memory saved is reported for each catalog.
+
+With --imports the import time of the package modules (in fresh interpreters)
+is reported instead, along with the heavy dependencies each import loads.
+
+Example usage:
+
+    python -m catalog_generators.benchmark --n-events 50 --n-samples 20000 \
+        --out benchmark.json
+
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from . import profiling
+from .catalog_generator import get_catalog_generator
+from .cosmology import luminosity_distance_to_redshift
+from .synthetic_data import SYNTHETIC_WRITERS, write_synthetic_catalog
+
+STAGES = ["load", "convert", "summarise", "redshift", "serialise", "generate"]
+
+IMPORT_MODULES = [
+    "catalog_generators", "catalog_generators.catalog_generator",
+    "catalog_generators.ias_parser", "catalog_generators.pycbc_parser",
+    "catalog_generators.lvc_gwtc1_parser", "catalog_generators.bilby_parser",
+    "catalog_generators.sample_store",
+]
+HEAVY_DEPENDENCIES = ["astropy", "bilby", "corner", "h5py", "pandas", "scipy"]
+
+_IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps(dict(seconds=seconds, loaded=[m for m in {heavy} if m in sys.modules])))
+"""
+
+
+def time_stage(func: Callable, track_memory: Optional[bool] = True):
+    """:return: func(), dict(seconds=..., peak_memory_mb=...)"""
+    if track_memory:
+        tracemalloc.reset_peak()
+        start_memory = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    result = func()
+    timing = dict(seconds=time.perf_counter() - start)
+    if track_memory:
+        timing['peak_memory_mb'] = (tracemalloc.get_traced_memory()[1] - start_memory) / 1e6
+    return result, timing
+
+
+def warm_up(generator, files: List[str]):
+    """Run the stages on the first file, so that the timed stages of the first
+    catalog do not include the imports of the heavy dependencies"""
+    if not files:
+        return
+    samples = generator.load_catalog_event_samples(files[:1], generator.summary_params)
+    samples = generator.make_events_gwosc_compatible(samples)
+    generator.summarise_all_events(samples)
+    for df in samples.values():
+        luminosity_distance_to_redshift(df['luminosity_distance'].to_numpy())
+
+
+def benchmark_catalog(
+        catalog: str,
+        data_dir: str,
+        out_dir: str,
+        n_workers: Optional[int] = 1,
+        executor: Optional[str] = None,
+        track_memory: Optional[bool] = True,
+        compact: Optional[bool] = False
+) -> Dict:
+    """Time the stages of one catalog's pipeline on the files in data_dir
+
+    :return: dict(n_events, n_samples, file_mb, stages={stage: timing}[,
+        samples_mb=dict(before, after)] (the latter with compact=True))
+    """
+    generator = get_catalog_generator(catalog)(data_dir, n_workers, executor, compact)
+    files = generator.get_event_files()
+    out_catalog_fname = os.path.join(out_dir, f"{catalog}_catalog.json")
+    stages = {}
+
+    warm_up(generator, files)
+    samples, stages['load'] = time_stage(
+        lambda: generator.load_catalog_event_samples(files, generator.summary_params),
+        track_memory)
+    samples, stages['convert'] = time_stage(
+        lambda: generator.make_events_gwosc_compatible(samples), track_memory)
+    summaries, stages['summarise'] = time_stage(
+        lambda: generator.summarise_all_events(samples), track_memory)
+    distances = np.concatenate([df['luminosity_distance'].to_numpy() for df in samples.values()])
+    _, stages['redshift'] = time_stage(
+        lambda: luminosity_distance_to_redshift(distances), track_memory)
+    _, stages['serialise'] = time_stage(
+        lambda: generator.save_catalog(out_catalog_fname, summaries), track_memory)
+    _, stages['generate'] = time_stage(
+        lambda: generator.generate(out_catalog_fname, incremental=False), track_memory)
+
+    n_samples = sum(len(df) for df in samples.values())
+    file_mb = sum(os.path.getsize(f) for f in files) / 1e6
+    for stage, timing in stages.items():
+        timing['samples_per_second'] = n_samples / timing['seconds']
+        if stage in ["load", "generate"]:
+            timing['mb_per_second'] = file_mb / timing['seconds']
+    results = dict(n_events=len(files), n_samples=n_samples, file_mb=file_mb, stages=stages)
+    if compact:
+        results['samples_mb'] = {
+            key: sum(usage[key] for usage in generator.memory_report.values()) / 1e6
+            for key in ["before", "after"]
+        }
+    return results
+
+
+def time_import(module: str, repeat: Optional[int] = 3) -> Dict:
+    """Import time of module in fresh interpreters (best of repeat)
+
+    :return: dict(seconds, loaded=[heavy dependencies imported by module])
+    """
+    script = _IMPORT_SCRIPT.format(module=module, heavy=HEAVY_DEPENDENCIES)
+    results = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", script], check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return min(results, key=lambda r: r['seconds'])
+
+
+def benchmark_imports(modules: Optional[List[str]] = None, repeat: Optional[int] = 3) -> Dict:
+    """{module: time_import(module)} (default modules: IMPORT_MODULES)"""
+    modules = IMPORT_MODULES if modules is None else modules
+    return {module: time_import(module, repeat) for module in modules}
+
+
+def run_benchmarks(
+        catalogs: Optional[List[str]] = None,
+        n_events: Optional[int] = 10,
+        n_samples: Optional[int] = 5000,
+        work_dir: Optional[str] = None,
+        compression: Optional[str] = None,
+        seed: Optional[int] = 0,
+        **kwargs
+) -> Dict:
+    """Write synthetic catalogs and benchmark them
+
+    :param catalogs: catalogs to benchmark (default: all with synthetic writers)
+    :param work_dir: dir for the synthetic data (default: a temporary dir)
+    :param kwargs: passed to benchmark_catalog
+    :return: dict(config={...}, catalogs={catalog: benchmark_catalog(...)})
+    """
+    catalogs = list(SYNTHETIC_WRITERS.keys()) if catalogs is None else catalogs
+    config = dict(catalogs=catalogs, n_events=n_events, n_samples=n_samples,
+                  compression=compression, seed=seed, **kwargs)
+    results = dict(config=config, catalogs={})
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+        if kwargs.get('track_memory', True):
+            tracemalloc.start()
+        try:
+            for catalog in catalogs:
+                data_dir = os.path.join(tmp_dir, catalog)
+                write_synthetic_catalog(catalog, data_dir, n_events, n_samples,
+                                        seed, compression)
+                results['catalogs'][catalog] = benchmark_catalog(
+                    catalog, data_dir, tmp_dir, **kwargs)
+        finally:
+            tracemalloc.stop()
+    return results
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--catalogs", nargs="+", default=None,
+                        choices=list(SYNTHETIC_WRITERS.keys()))
+    parser.add_argument("--n-events", type=int, default=10)
+    parser.add_argument("--n-samples", type=int, default=5000)
+    parser.add_argument("--n-workers", type=int, default=1)
+    parser.add_argument("--executor", default=None, help="serial, thread or process")
+    parser.add_argument("--compression", default=None, help="eg gzip")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=None, help="dir for the synthetic data")
+    parser.add_argument("--compact", action="store_true",
+                        help="hold the samples as float32/sparse (see compact_samples)")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="do not track the peak memory (tracemalloc slows allocations)")
+    parser.add_argument("--out", default=None, help="json report (default: stdout)")
+    parser.add_argument("--profile", default=None,
+                        help="also save a profiling report (with cProfile stats) to this json")
+    parser.add_argument("--imports", action="store_true",
+                        help="benchmark the package import times instead")
+    return parser
+
+
+def main(args=None):
+    args = create_parser().parse_args(args)
+    if args.profile:
+        profiling.enable_profiling(cprofile=True)
+    if args.imports:
+        results = dict(imports=benchmark_imports())
+    else:
+        results = run_benchmarks(
+            catalogs=args.catalogs, n_events=args.n_events, n_samples=args.n_samples,
+            work_dir=args.work_dir, compression=args.compression, seed=args.seed,
+            n_workers=args.n_workers, executor=args.executor,
+            track_memory=not args.no_memory, compact=args.compact
+        )
+    report = json.dumps(results, indent=2)
+    if args.out is None:
+        print(report)
+    else:
+        with open(args.out, 'w') as f:
+            f.write(report)
+    if args.profile:
+        profiling.save_profile_report(args.profile)
+        profiling.disable_profiling()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,154 @@
 # -*- coding: utf-8 -*-
-"""Module one liner
+"""Parser for bilby result files and pesummary metafiles
 
-This module does what....
+Reads the posterior of bilby results ("posterior/<param>") and pesummary
+metafiles ("<label>/posterior_samples"), eg the GWTC-1 pesummary release
+downloaded by download_and_unpack.sh. Their parameters already follow the
+bilby/GWOSC naming, so only a few columns need to be derived.
+
+Files inside zip archives in the data dir (eg pesummary_samples.zip) are read
+in place, without unpacking the archive (see zip_reader).
 
 Example usage:
 
+    generate_bilby_catalog(data_dir="data/bilby/gwtc1",
+                           out_catalog_fname="data/bilby_catalog.json")
+
 """
-import numpy as np
-import matplotlib.pyplot as plt
+from __future__ import annotations
+
+import os
+import re
+
+from . import gwosc_conversion as conversion
+from .catalog_generator import CatalogGenerator, register_catalog
+from .hdf5_reader import count_rows, describe_samples, list_columns, open_hdf5, read_columns
+from .lazy_import import lazy_import
+from .zip_reader import ZIP_MEMBER_SEPARATOR
 
+h5py = lazy_import("h5py")
+pd = lazy_import("pandas")
 
-def plot():
-    """Plots a scatter plot."""
-    sample_x = np.random.normal(4, 0.1, 500)
-    sample_y = np.random.normal(4, 0.1, 500)
-    fig, ax = plt.subplots()
-    ax.plot(sample_x, sample_y, '.')
-    fig.show()
+DATA_DIR = "../data/bilby/gwtc1/"
+PARSER_VERSION = 1
+
+# pesummary labels used for the release samples (else the first label is used)
+PREFERRED_LABELS = ["PublicationSamples", "Overall"]
+
+# Parameters needed by convert_df_to_gwosc_df and the catalog summary (only
+# those present in a file are read)
+SUMMARY_PARAMS = [
+    "geocent_time", "mass_1", "mass_2", "chirp_mass", "total_mass",
+    "mass_1_source", "mass_2_source", "chirp_mass_source", "total_mass_source",
+    "final_mass_source", "luminosity_distance", "redshift", "chi_eff",
+    "network_matched_filter_snr",
+]
 
 
 def main():
-    plot()
+    generate_bilby_catalog(data_dir=DATA_DIR,
+                           out_catalog_fname="../data/bilby_catalog.json")
+
+
+def generate_bilby_catalog(data_dir, out_catalog_fname, n_workers=1, incremental=True):
+    BilbyCatalog(data_dir, n_workers).generate(out_catalog_fname, incremental)
+    print("Completed catalog generation.")
+
+
+def load_event_samples_to_dataframes(data_dir, n_workers=1, files=None,
+                                     parameters=None, rows=None):
+    """Load bilby/pesummary files into dict of df (sorted by filename)"""
+    return BilbyCatalog(data_dir, n_workers).load_catalog_event_samples(
+        files, parameters, rows)
+
+
+def make_events_gwosc_compatible(events_df_container):
+    return BilbyCatalog().make_events_gwosc_compatible(events_df_container)
+
+
+def get_event_name(file):
+    member = file.split(ZIP_MEMBER_SEPARATOR)[-1]
+    event_name = os.path.splitext(os.path.basename(member))[0]
+    match = re.search(r"GW\d{6}(_\d{6})?", event_name)
+    return match.group(0) if match else event_name
+
+
+def get_posterior_path(h5file, label=None):
+    """Path of the posterior in a bilby result or pesummary metafile"""
+    if "posterior" in h5file:
+        return "posterior"
+    labels = sorted(
+        k for k in h5file.keys()
+        if isinstance(h5file[k], h5py.Group) and "posterior_samples" in h5file[k]
+    )
+    if not labels:
+        raise ValueError(f"No posterior found in {h5file.filename}")
+    if label is None:
+        label = next((l for l in PREFERRED_LABELS if l in labels), labels[0])
+    return f"{label}/posterior_samples"
+
+
+def read_event_file(file, parameters=None, rows=None, label=None):
+    """Load (only the parameters/rows of) one bilby/pesummary file
+    :param file: filename or zip member ("<archive>.zip::<member>")
+    :param label: pesummary label to read (default: see PREFERRED_LABELS)
+    :return: event name, df of samples
+    """
+    event_name = get_event_name(file)
+    with open_hdf5(file) as h5file:
+        posterior = h5file[get_posterior_path(h5file, label)]
+        available = list_columns(posterior)
+        if parameters is None:
+            parameters = available
+        parameters = [p for p in parameters if p in available]
+        event_dict = read_columns(posterior, parameters, rows)
+    return event_name, pd.DataFrame(event_dict)
+
+
+def count_event_samples(file, label=None):
+    with open_hdf5(file) as h5file:
+        return count_rows(h5file[get_posterior_path(h5file, label)])
+
+
+def describe_event_file(file, label=None):
+    with open_hdf5(file) as h5file:
+        return describe_samples(h5file[get_posterior_path(h5file, label)])
+
+
+def convert_df_to_gwosc_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the missing GWOSC parameters (without copying the samples, see
+    gwosc_conversion)"""
+    aliases = {'GPS': 'geocent_time'} if 'geocent_time' in df else {}
+    columns = conversion.get_columns(df, aliases)
+    missing = [p for p in ['total_mass', 'chirp_mass'] if p not in columns]
+    derived = {}
+    if missing:
+        derived = conversion.derive_columns(
+            "component_masses", missing, columns, ["mass_1", "mass_2"],
+            conversion.derive_component_mass_columns)
+    return conversion.to_dataframe({**columns, **derived})
+
+
+@register_catalog
+class BilbyCatalog(CatalogGenerator):
+    name = "bilby"
+    short_name = "bilby"
+    reference = "https://dcc.ligo.org/LIGO-P2000193/public"
+    default_data_dir = DATA_DIR
+    data_subdir = "bilby/gwtc1"
+    file_pattern = "**/*.h*5"
+    archive_pattern = "**/*.zip"
+    parser_version = PARSER_VERSION
+    summary_params = SUMMARY_PARAMS
+    ess_params = ["mass_1", "luminosity_distance"]
+    # pesummary files have samples of the redshift
+    redshift_from_distance = False
+
+    get_event_name = staticmethod(get_event_name)
+    read_event_file = staticmethod(read_event_file)
+    count_event_samples = staticmethod(count_event_samples)
+    describe_event_file = staticmethod(describe_event_file)
+    convert_samples = staticmethod(convert_df_to_gwosc_df)
 
 
 if __name__ == "__main__":
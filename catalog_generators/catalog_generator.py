@@ -1,9 +1,540 @@
+"""Load -> convert -> summarise -> save pipeline shared by all catalogs.
+
+Each source of posteriors (IAS, PyCBC, GWTC-1, ...) subclasses CatalogGenerator,
+describing how to find, name, read and convert its files, and registers itself
+with @register_catalog. The engine then runs the stages with a pluggable
+executor ("serial", "thread", "process" or a concurrent.futures.Executor) and
+incremental rebuilds for every catalog. The files are summarised largest first,
+within an optional memory budget (see scheduler).
+
+Example usage:
+
+    generator = get_catalog_generator("IAS")(data_dir="data/ias_search", n_workers=4)
+    generator.generate("data/ias_catalog.json")
+
+"""
+from __future__ import annotations
+
+import functools
+import glob
+import importlib
+import os
+import zlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from . import profiling
+from .compact_samples import compact_dataframe, memory_usage
+from .cosmology import luminosity_distance_to_redshift
+from .downsampling import Downsampler, autocorrelation_ess
+from .hdf5_reader import keep_open
+from .event_keys import GWOSC_KEYS
+from .json_stream import CatalogWriter, write_catalog
+from .lazy_import import lazy_import
+from .manifest import CatalogManifest
+from .parallel import parallel_map
+from .scheduler import Scheduler
+from .streaming_quantiles import DEFAULT_SKETCH_SIZE, StreamingQuantiles, sketch_rows_bound
+from .utils import bootstrap_dataframe, summarise_dataframe
+from .zip_reader import list_zip_members
+
+pd = lazy_import("pandas")
+
+PARSER_MODULES = [
+    "ias_parser", "pycbc_parser", "lvc_gwtc1_parser", "lvc_gwtc2_parser",
+    "bilby_parser"
+]
+
+CATALOG_REGISTRY = {}
+
+# bump to invalidate the summaries cached by every catalog (changes of the
+# shared convert -> summarise stages, see also CatalogGenerator.parser_version)
+SUMMARY_VERSION = 1
+
+SUMMARY_TYPES = ["_lower", "_upper", ""]
+SOURCE_FRAME_PARAMS = ['mass_1', 'mass_2', 'chirp_mass', 'total_mass']
+# peak bytes of summarise_event_file per summarised value (measured: ~7
+# float64 copies, the samples read, their conversions and the sorted copies of
+# the quantiles)
+BYTES_PER_SUMMARISED_VALUE = 64
+# summary keys that are not summaries of the samples
+METADATA_KEYS = ['version', 'reference', 'catalog.shortName', 'commonName', 'jsonurl']
+
+
+def register_catalog(catalog_class):
+    """Class decorator adding a CatalogGenerator subclass to the registry"""
+    CATALOG_REGISTRY[catalog_class.name] = catalog_class
+    return catalog_class
+
+
+def get_catalog_generator(name: str):
+    """The registered CatalogGenerator subclass for a catalog name"""
+    for module in PARSER_MODULES:
+        importlib.import_module(f".{module}", __package__)
+    if name not in CATALOG_REGISTRY:
+        raise ValueError(f"Catalog {name} not in {list(CATALOG_REGISTRY.keys())}")
+    return CATALOG_REGISTRY[name]
+
+
+def get_catalog_names() -> List[str]:
+    for module in PARSER_MODULES:
+        importlib.import_module(f".{module}", __package__)
+    return list(CATALOG_REGISTRY.keys())
+
+
 class CatalogGenerator:
-    def __init__(self):
-        pass
+    # registry key
+    name = None
+    # summary 'catalog.shortName', 'reference' and 'version'
+    short_name = None
+    reference = None
+    catalog_version = 1
+    default_data_dir = None
+    # data dir relative to a data root (eg "data/" of download_and_unpack.sh)
+    data_subdir = None
+    # glob pattern (relative to data_dir) of the posterior files
+    file_pattern = "*"
+    # glob pattern of zip archives (relative to data_dir) whose members matching
+    # file_pattern are read in place (None: no archives)
+    archive_pattern = None
+    # "process" for HDF5 (decompression holds the GIL), "thread" for npy
+    executor = "process"
+    # bump to invalidate the summaries cached in catalog manifests
+    parser_version = 1
+    # parameters in the posterior files: {name: description}
+    search_params = {}
+    # parameters needed by convert_samples and the summary (None: all)
+    summary_params = None
+    # pilot columns whose autocorrelation gives the effective sample size of a
+    # file, for Downsampler(ess=...) (None: the rows are independent samples)
+    ess_params = None
+    # rows of the pilot columns read to estimate the ess (the autocorrelation
+    # time of the first rows is assumed to hold for the whole file)
+    ess_pilot_rows = 2 ** 16
+    # use the redshift of the luminosity distance quantiles (even if the
+    # samples have a redshift)
+    redshift_from_distance = True
+
+    def __init__(
+            self,
+            data_dir: Optional[str] = None,
+            n_workers: Optional[int] = 1,
+            executor=None,
+            compact: Optional[bool] = False,
+            downsampler: Optional[Downsampler] = None,
+            n_bootstrap: Optional[int] = None,
+            chunk_size: Optional[int] = None,
+            sketch_size: Optional[int] = DEFAULT_SKETCH_SIZE,
+            memory_budget: Optional[float] = None,
+            file_index=None
+    ):
+        """
+        :param data_dir: dir with the posterior files (default: default_data_dir)
+        :param n_workers: number of workers (None/0 uses all cores)
+        :param executor: "serial", "thread", "process" or an Executor instance
+            (default: the class executor)
+        :param compact: hold the samples loaded by load_catalog_event_samples
+            in compact form (see compact_samples)
+        :param downsampler: only read the rows it selects from each file (see
+            downsampling)
+        :param n_bootstrap: add the bootstrap standard errors (of this many
+            replicates) of the summary values to each summary
+            ('standard_errors': {key: error})
+        :param chunk_size: summarise each file in blocks of this many rows
+            with bounded memory (see streaming_quantiles; the summaries are
+            within streaming_quantiles.rank_error_bound(n_samples, sketch_size)
+            in quantile level of the exact ones)
+        :param sketch_size: of the streaming quantiles
+        :param memory_budget: max bytes of the (estimated) memory of the files
+            summarised at once by generate (None: no limit, see scheduler)
+        :param file_index: a file_index.FileIndex, whose number of samples of
+            the unchanged files are used instead of reading their metadata
+        """
+        if chunk_size and n_bootstrap:
+            raise ValueError("The bootstrap needs all the samples at once, "
+                             "so n_bootstrap cannot be combined with chunk_size")
+        self.data_dir = data_dir if data_dir is not None else self.default_data_dir
+        self.n_workers = n_workers
+        if executor is not None:
+            self.executor = executor
+        self.compact = compact
+        # {event_name: dict(before=bytes, after=bytes)} of the compacted samples
+        self.memory_report = {}
+        self.downsampler = downsampler
+        self.n_bootstrap = n_bootstrap
+        self.chunk_size = chunk_size
+        self.sketch_size = sketch_size
+        self.memory_budget = memory_budget
+        self.file_index = file_index
+        # (see scheduler.Scheduler.report) of the last generate
+        self.schedule_report = {}
+
+    def __getstate__(self):
+        # the generator is sent to the "process" workers with each file, and
+        # only the scheduler (in this process) needs the file index
+        state = dict(self.__dict__)
+        state['file_index'] = None
+        return state
+
+    @staticmethod
+    def get_event_name(file: str) -> str:
+        raise NotImplementedError
+
+    @staticmethod
+    def read_event_file(file: str, parameters=None, rows=None) -> Tuple[str, pd.DataFrame]:
+        """:return: event name, df of samples"""
+        raise NotImplementedError
+
+    @staticmethod
+    def count_event_samples(file: str) -> int:
+        """Number of samples in file (without reading them)"""
+        raise NotImplementedError
+
+    @staticmethod
+    def describe_event_file(file: str) -> Dict:
+        """dict(format, dataset, n_samples, columns={name: dtype}) of the
+        samples in file (without reading them)"""
+        raise NotImplementedError
+
+    @staticmethod
+    def open_event_file(file: str):
+        """Context manager in which all the reads of file share one open file
+        (see hdf5_reader.keep_open)"""
+        return keep_open(file)
+
+    @staticmethod
+    def convert_samples(samples: pd.DataFrame) -> pd.DataFrame:
+        """Add the GWOSC parameters to the samples"""
+        return samples
+
+    def get_event_files(self) -> List[str]:
+        """Posterior files in data_dir (followed by the matching archive members)"""
+        files = sorted(glob.glob(
+            os.path.join(self.data_dir, self.file_pattern), recursive=True))
+        if self.archive_pattern is not None:
+            archives = glob.glob(
+                os.path.join(self.data_dir, self.archive_pattern), recursive=True)
+            member_pattern = os.path.basename(self.file_pattern)
+            for archive in sorted(archives):
+                files += list_zip_members(archive, member_pattern)
+        return files
+
+    def _read_event_file(self, file: str, parameters=None, rows=None) -> Tuple[str, pd.DataFrame]:
+        """read_event_file (of the downsampler rows), timed and counted by the
+        profiler"""
+        with profiling.timer("read"):
+            if rows is None and self.downsampler is not None:
+                rows = self.select_rows(file)
+            event_name, samples = self.read_event_file(file, parameters=parameters, rows=rows)
+        profiling.count("files_read")
+        profiling.count("samples_read", len(samples))
+        profiling.count("bytes_read", int(samples.memory_usage(index=False).sum()))
+        return event_name, samples
+
+    def _read_event_chunks(self, file: str, parameters=None) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """read_event_file in blocks of chunk_size rows (of the downsampler
+        rows), timed and counted by the profiler
+
+        The file is opened once (see open_event_file) and each block is read
+        from the open file.
+        """
+        with self.open_event_file(file):
+            n_rows = self.count_event_samples(file)
+            rows = None
+            if self.downsampler is not None:
+                rows = self.select_rows(file, n_rows)
+                n_rows = n_rows if rows is None else len(rows)
+            profiling.count("files_read")
+            for start in range(0, max(n_rows, 1), self.chunk_size):
+                stop = start + self.chunk_size
+                with profiling.timer("read"):
+                    event_name, samples = self.read_event_file(
+                        file, parameters=parameters,
+                        rows=slice(start, stop) if rows is None else rows[start:stop])
+                profiling.count("chunks_read")
+                profiling.count("samples_read", len(samples))
+                profiling.count("bytes_read", int(samples.memory_usage(index=False).sum()))
+                yield event_name, samples
+
+    def estimate_ess(self, file: str, n_total: Optional[int] = None) -> Optional[float]:
+        """Effective sample size of all the samples in file, from the
+        autocorrelation of its ess_params (None: independent samples).
+
+        Only the first ess_pilot_rows rows of the pilot columns are read, so
+        the cost is bounded whatever the size of the file.
+
+        :param n_total: number of samples in file (default: count_event_samples)
+        """
+        if not self.ess_params:
+            return None
+        if n_total is None:
+            n_total = self.count_event_samples(file)
+        with profiling.timer("ess"):
+            _, pilot = self.read_event_file(
+                file, parameters=self.ess_params, rows=slice(0, self.ess_pilot_rows))
+            if not len(pilot):
+                return None
+            return autocorrelation_ess(pilot.to_numpy()) * n_total / len(pilot)
+
+    def select_rows(self, file: str, n_total: Optional[int] = None) -> Optional[np.ndarray]:
+        """Rows of file selected by the downsampler (None: all of them; the
+        pilot columns are only read for an ess target)"""
+        if n_total is None:
+            n_total = self.count_event_samples(file)
+        ess_total = self.estimate_ess(file, n_total) if self.downsampler.ess is not None else None
+        return self.downsampler.select_rows(n_total, file, ess_total)
+
+    def downsampling_report(self, files=None) -> Dict[str, Dict]:
+        """{event_name: dict(n_samples, n_selected, quantile_error)} of the
+        downsampler (see downsampling.Downsampler.report)
+
+        :param files: default: get_event_files()
+        """
+        if self.downsampler is None:
+            raise ValueError("No downsampler")
+        if files is None:
+            files = self.get_event_files()
+        report = {}
+        for f in files:
+            n_total = self.count_event_samples(f)
+            ess_total = self.estimate_ess(f, n_total) if self.downsampler.ess is not None else None
+            report[self.get_event_name(f)] = self.downsampler.report(n_total, ess_total)
+        return report
+
+    def estimate_event_file_cost(self, file: str) -> Tuple[float, float]:
+        """(work, memory) estimates of summarise_event_file(file), from the
+        number of samples and parameters it summarises (known before reading
+        the samples: from the file index, else from the file metadata)"""
+        entry = None if self.file_index is None else self.file_index.get_current_entry(file)
+        if entry is None:
+            try:
+                entry = self.describe_event_file(file)
+            except Exception:
+                # (fails again, with its error, when summarised)
+                return 0, 0
+        n_rows = entry['n_samples']
+        if self.downsampler is not None and self.downsampler.ess is None:
+            # (an ess target depends on the samples: all the rows are assumed)
+            n_rows = min(n_rows, self.downsampler.target_size(n_rows))
+        n_columns = len(self.summary_params or entry['columns'])
+        n_held_rows = n_rows
+        if self.chunk_size:
+            n_held_rows = min(n_rows, self.chunk_size) + sketch_rows_bound(n_rows, self.sketch_size)
+        return n_rows * n_columns, n_held_rows * n_columns * BYTES_PER_SUMMARISED_VALUE
+
+    def estimate_event_file_costs(self, files: List[str]) -> List[Tuple[float, float]]:
+        """estimate_event_file_cost of each file, by the workers for the files
+        that are not in the file index (as their metadata has to be read)"""
+        if self.file_index is None:
+            unindexed = files
+        else:
+            unindexed = [f for f in files if self.file_index.get_current_entry(f) is None]
+        costs = {}
+        if unindexed:
+            costs = dict(zip(unindexed, self._map(
+                self.estimate_event_file_cost, unindexed, desc=f"Estimating {self.name} Costs")))
+        return [costs[f] if f in costs else self.estimate_event_file_cost(f) for f in files]
+
+    def _read_compact_event_file(self, file: str, parameters=None, rows=None):
+        """_read_event_file compacted in the worker (so only the compact samples
+        are sent back)
+        :return: event name, compact df of samples, dict(before=bytes, after=bytes)
+        """
+        event_name, samples = self._read_event_file(file, parameters=parameters, rows=rows)
+        before = memory_usage(samples)
+        samples = compact_dataframe(samples)
+        return event_name, samples, dict(before=before, after=memory_usage(samples))
+
+    def _map(self, func, items, desc):
+        return parallel_map(func, items, n_workers=self.n_workers,
+                            executor=self.executor, desc=desc)
+
+    def load_catalog_event_samples(
+            self, files=None, parameters=None, rows=None
+    ) -> Dict[str, pd.DataFrame]:
+        """Load posterior files into dict of df (sorted by filename)
+
+        :param files: files to load (default: get_event_files())
+        :param parameters: only read these parameters (default: search_params)
+        :param rows: only read these rows (eg slice(None, None, 10) to thin by 10)
+        """
+        if files is None:
+            files = self.get_event_files()
+        desc = f"Reading {self.name} Posteriors"
+        if not self.compact:
+            read_file = functools.partial(self._read_event_file, parameters=parameters, rows=rows)
+            return dict(self._map(read_file, files, desc=desc))
+
+        read_file = functools.partial(
+            self._read_compact_event_file, parameters=parameters, rows=rows)
+        events = {}
+        for event_name, samples, usage in self._map(read_file, files, desc=desc):
+            events[event_name] = samples
+            self.memory_report[event_name] = usage
+        return events
+
+    def make_events_gwosc_compatible(self, events_df_container):
+        for event_name in events_df_container.keys():
+            with profiling.timer("convert"):
+                samples = self.convert_samples(events_df_container[event_name])
+                if self.compact:
+                    samples = compact_dataframe(samples)
+                events_df_container[event_name] = samples
+        return events_df_container
+
+    def summarise_event(self, event_name: str, samples: pd.DataFrame) -> Dict:
+        """GWOSC summary of the (converted) samples of one event
+
+        The source frame masses (and the redshift) are computed from the
+        luminosity distance quantiles when the samples do not have them.
+        """
+        with profiling.timer("summarise"):
+            summary = summarise_dataframe(samples)
+        profiling.count("samples_summarised", samples.size)
+        summary = self.to_gwosc_summary(event_name, summary)
+        if self.n_bootstrap:
+            summary['standard_errors'] = self.bootstrap_standard_errors(event_name, samples)
+        return summary
+
+    def to_gwosc_summary(self, event_name: str, summary: Dict) -> Dict:
+        """GWOSC summary of the summary values of the samples"""
+        self.add_source_frame_summary(summary)
+        summary = {k: summary.get(k, None) for k in GWOSC_KEYS}
+        summary['version'] = self.catalog_version
+        summary['reference'] = self.reference
+        summary['catalog.shortName'] = self.short_name
+        summary['commonName'] = event_name
+        return summary
+
+    def add_source_frame_summary(self, summary: Dict):
+        """Add the redshift and source frame mass summaries (the summary values
+        can be floats or arrays of bootstrap replicates)"""
+        if self.redshift_from_distance or 'redshift' not in summary:
+            with profiling.timer("redshift"):
+                redshifts = luminosity_distance_to_redshift(
+                    np.array([summary[f'luminosity_distance{t}'] for t in SUMMARY_TYPES]))
+            for param_type, redshift in zip(SUMMARY_TYPES, redshifts):
+                summary[f'redshift{param_type}'] = \
+                    float(redshift) if np.ndim(redshift) == 0 else redshift
+        for key in SOURCE_FRAME_PARAMS:
+            if f'{key}_source' in summary or key not in summary:
+                continue
+            for param_type in SUMMARY_TYPES:
+                summary[f'{key}_source{param_type}'] = \
+                    summary[f"{key}{param_type}"] / (1 + summary[f'redshift{param_type}'])
+
+    def bootstrap_standard_errors(self, event_name: str, samples: pd.DataFrame) -> Dict:
+        """{key: bootstrap standard error} of the (sample) GWOSC summary values
+        (None for keys without a summary); seeded by the event name"""
+        rng = np.random.default_rng(zlib.crc32(event_name.encode()))
+        replicates = bootstrap_dataframe(samples, self.n_bootstrap, rng)
+        self.add_source_frame_summary(replicates)
+        return {
+            k: float(np.std(replicates[k], ddof=1)) if k in replicates else None
+            for k in GWOSC_KEYS if k not in METADATA_KEYS
+        }
+
+    def summarise_all_events(self, events_samples_dict) -> Dict[str, Dict]:
+        return {event_name: self.summarise_event(event_name, event_df)
+                for event_name, event_df in events_samples_dict.items()}
+
+    def summarise_event_file(self, file: str) -> Tuple[str, Dict]:
+        """Load, convert and summarise one file (run inside the workers, so only
+        the summary is sent back to the main process)"""
+        with profiling.profile_event(os.path.basename(file)):
+            if self.chunk_size:
+                return self.summarise_event_file_chunked(file)
+            event_name, samples = self._read_event_file(file, parameters=self.summary_params)
+            with profiling.timer("convert"):
+                samples = self.convert_samples(samples)
+            return event_name, self.summarise_event(event_name, samples)
+
+    def summarise_event_file_chunked(self, file: str) -> Tuple[str, Dict]:
+        """summarise_event_file holding one block of chunk_size samples (and the
+        streaming quantile sketch) at a time"""
+        quantiles = None
+        for event_name, samples in self._read_event_chunks(file, parameters=self.summary_params):
+            with profiling.timer("convert"):
+                samples = self.convert_samples(samples)
+            with profiling.timer("summarise"):
+                if quantiles is None:
+                    quantiles = StreamingQuantiles(list(samples.columns), self.sketch_size)
+                quantiles.update(samples)
+            profiling.count("samples_summarised", samples.size)
+        with profiling.timer("summarise"):
+            summary = quantiles.summary()
+        return event_name, self.to_gwosc_summary(event_name, summary)
+
+    def generate(
+            self,
+            out_catalog_fname: str,
+            incremental: Optional[bool] = True,
+            catalog_mode: Optional[str] = None
+    ) -> Dict:
+        """Summarise the posteriors in data_dir into a GWOSC-like catalog json.
+
+        With incremental=True only files that are new or changed since the last
+        run (see manifest.CatalogManifest) are loaded and summarised. Each
+        summary is streamed to the catalog as soon as it is finished.
+
+        :param catalog_mode: "pretty", "compact" or "ndjson" (see
+            json_stream.CatalogWriter)
+        :return: {event_name: summary}
+        """
+        files = self.get_event_files()
+        with profiling.timer("manifest"):
+            manifest = CatalogManifest.load(
+                out_catalog_fname, self.parser_version, reset=not incremental,
+                settings=self.manifest_settings())
+            stale_files = manifest.stale_files(files)
+        profiling.count("files_cached", len(files) - len(stale_files))
+
+        summaries = {}
+        with CatalogWriter(out_catalog_fname, catalog_mode) as writer:
+            stale = set(stale_files)
+            for file in files:
+                if file not in stale:
+                    self._write_event(writer, *manifest.get_summary(file))
+            scheduler = Scheduler(self.n_workers, self.executor, self.memory_budget)
+            with profiling.timer("schedule"):
+                if scheduler.n_workers == 1 and self.memory_budget is None:
+                    # (the order does not matter to a single worker)
+                    costs = [(0, 0)] * len(stale_files)
+                else:
+                    costs = self.estimate_event_file_costs(stale_files)
+            finished = scheduler.imap(self.summarise_event_file, stale_files, costs,
+                                      desc=f"Summarising {self.name} Posteriors")
+            for _, (event_name, summary) in finished:
+                summaries[event_name] = summary
+                self._write_event(writer, event_name, summary)
+            self.schedule_report = scheduler.report
+
+        with profiling.timer("manifest"):
+            manifest.update(stale_files, self.get_event_name, summaries)
+            summaries = manifest.summaries(files)
+            manifest.save()
+        return summaries
+
+    def manifest_settings(self) -> Dict:
+        """Options that change the summaries, stored in the manifest (the
+        cached summaries are dropped when they change)"""
+        settings = dict(summary_version=SUMMARY_VERSION)
+        if self.downsampler is not None:
+            settings['downsampler'] = self.downsampler.settings()
+        if self.n_bootstrap:
+            settings['n_bootstrap'] = self.n_bootstrap
+        if self.chunk_size:
+            # the summaries do not depend on the chunk size
+            settings['sketch_size'] = self.sketch_size
+        return settings
 
-    def load_catalog_event_samples(self):
-        pass
+    @staticmethod
+    def _write_event(writer: CatalogWriter, event_name: str, summary: Dict):
+        with profiling.timer("serialise"):
+            writer.write_event(event_name, summary)
 
-    def save_catlog(self):
-        pass
\ No newline at end of file
+    def save_catalog(self, out_catalog_fname: str, summaries: Dict[str, Dict],
+                     catalog_mode: Optional[str] = None):
+        with profiling.timer("serialise"):
+            write_catalog(out_catalog_fname, summaries, catalog_mode)
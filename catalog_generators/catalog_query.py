@@ -0,0 +1,301 @@
+"""Indexed in-memory queries over the events of several generated catalogs.
+
+A Catalog holds one row per (catalog, event) summary and keeps an index per
+key:
+ - numeric keys (eg mass_1_source, GPS): the rows sorted by value, so a range
+   filter is two binary searches
+ - other keys (eg catalog.shortName): {value: rows}
+
+The INDEXED_KEYS are indexed up front and any other key on its first query. A
+query only materialises the rows of its most selective filter and checks the
+remaining filters on those; an ordered query with a limit (top-k) walks the
+sorted index of its key. Results are cached (LRU), so repeated dashboard
+queries are dictionary lookups.
+
+Filters are {key: condition}, with a condition being:
+ - (low, high): low <= value <= high (None for an open end)
+ - a list/set: value in it
+ - anything else: value == it
+
+Example usage:
+
+    catalog = Catalog.from_catalog_files({
+        "IAS": "data/ias_catalog.json", "GWTC-1": "data/gwtc1_catalog.json"})
+    rows = catalog.query({"mass_1_source": (30, None), "catalog.shortName": ["IAS"]},
+                         order_by="luminosity_distance", limit=5)
+    catalog.to_dataframe(rows)
+
+"""
+from __future__ import annotations
+
+import json
+from collections import OrderedDict
+from numbers import Number
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from . import profiling
+from .json_stream import iter_catalog_events
+from .lazy_import import lazy_import
+from .manifest import load_cached_summaries
+
+pd = lazy_import("pandas")
+
+INDEXED_KEYS = ["mass_1_source", "luminosity_distance", "GPS",
+                "network_matched_filter_snr", "catalog.shortName"]
+DEFAULT_CACHE_SIZE = 256
+
+Row = Tuple[str, str]
+
+
+def is_numeric(values: List) -> bool:
+    """True if every (non-None) value is a number"""
+    return all(isinstance(v, Number) and not isinstance(v, bool)
+               for v in values if v is not None)
+
+
+def normalise_condition(condition) -> Tuple:
+    """("range", low, high) or ("in", values) of a filter condition"""
+    if isinstance(condition, tuple):
+        if len(condition) != 2:
+            raise ValueError(f"Expected a (low, high) range, got {condition}")
+        return ("range", *condition)
+    if isinstance(condition, (list, set, frozenset)):
+        # (equal values, eg 1 and 1.0, are kept once)
+        return ("in", tuple(sorted(dict.fromkeys(condition), key=repr)))
+    return ("in", (condition,))
+
+
+class NumericIndex:
+
+    def __init__(self, values: List):
+        self.values = np.array([np.nan if v is None else v for v in values], dtype=float)
+        present = np.flatnonzero(~np.isnan(self.values))
+        self.rows = present[np.argsort(self.values[present], kind="stable")]
+        self.sorted_values = self.values[self.rows]
+
+    def _bounds(self, condition: Tuple) -> List[Tuple[int, int]]:
+        """[start, stop) positions in self.rows matching the condition"""
+        if condition[0] == "range":
+            low, high = condition[1:]
+            start = 0 if low is None else np.searchsorted(self.sorted_values, low, "left")
+            stop = (len(self.rows) if high is None
+                    else np.searchsorted(self.sorted_values, high, "right"))
+            return [(start, max(start, stop))]
+        values = np.unique([v for v in condition[1] if isinstance(v, Number)])
+        return [self._bounds(("range", v, v))[0] for v in values]
+
+    def count(self, condition: Tuple) -> int:
+        return sum(stop - start for start, stop in self._bounds(condition))
+
+    def select(self, condition: Tuple) -> np.ndarray:
+        return np.concatenate([self.rows[start:stop] for start, stop in self._bounds(condition)]
+                              or [np.empty(0, dtype=int)])
+
+    def matches(self, rows: np.ndarray, condition: Tuple) -> np.ndarray:
+        values = self.values[rows]
+        if condition[0] == "in":
+            return np.isin(values, [v for v in condition[1] if isinstance(v, Number)])
+        low, high = condition[1:]
+        mask = ~np.isnan(values)
+        if low is not None:
+            mask[mask] = values[mask] >= low
+        if high is not None:
+            mask[mask] = values[mask] <= high
+        return mask
+
+    def ordered(self, descending: bool) -> np.ndarray:
+        return self.rows[::-1] if descending else self.rows
+
+    def sort(self, rows: np.ndarray, descending: bool) -> np.ndarray:
+        """rows with a value, in the order of ordered()"""
+        rows = rows[~np.isnan(self.values[rows])]
+        rows = rows[np.argsort(self.values[rows], kind="stable")]
+        return rows[::-1] if descending else rows
+
+
+class CategoricalIndex:
+
+    def __init__(self, values: List):
+        self.values = values
+        rows = {}
+        for row, value in enumerate(values):
+            if value is not None:
+                rows.setdefault(value, []).append(row)
+        self.rows = {value: np.array(r) for value, r in rows.items()}
+        # (for order_by)
+        self.sorted_values = sorted(self.rows, key=str)
+
+    def count(self, condition: Tuple) -> int:
+        return len(self.select(condition))
+
+    def select(self, condition: Tuple) -> np.ndarray:
+        if condition[0] == "range":
+            values = [v for v in self.sorted_values if _in_range(v, *condition[1:])]
+        else:
+            values = [v for v in condition[1] if v in self.rows]
+        return np.sort(np.concatenate([self.rows[v] for v in values]
+                                      or [np.empty(0, dtype=int)]))
+
+    def matches(self, rows: np.ndarray, condition: Tuple) -> np.ndarray:
+        if condition[0] == "range":
+            return np.array([self.values[r] is not None and _in_range(self.values[r], *condition[1:])
+                             for r in rows], dtype=bool)
+        allowed = set(condition[1])
+        return np.array([self.values[r] in allowed for r in rows], dtype=bool)
+
+    def ordered(self, descending: bool) -> np.ndarray:
+        rows = np.concatenate([self.rows[v] for v in self.sorted_values]
+                              or [np.empty(0, dtype=int)])
+        return rows[::-1] if descending else rows
+
+    def sort(self, rows: np.ndarray, descending: bool) -> np.ndarray:
+        """rows with a value, in the order of ordered()"""
+        rows = sorted((r for r in rows if self.values[r] is not None),
+                      key=lambda r: str(self.values[r]))
+        rows = np.array(rows, dtype=int)
+        return rows[::-1] if descending else rows
+
+
+def _in_range(value, low, high) -> bool:
+    try:
+        return (low is None or value >= low) and (high is None or value <= high)
+    except TypeError:
+        return False
+
+
+class Catalog:
+
+    def __init__(
+            self,
+            catalogs: Dict[str, Dict[str, Dict]],
+            indexed_keys: Optional[List[str]] = INDEXED_KEYS,
+            cache_size: Optional[int] = DEFAULT_CACHE_SIZE
+    ):
+        """
+        :param catalogs: {catalog: {event_name: summary}}
+        :param indexed_keys: keys indexed up front (others on their first query)
+        :param cache_size: number of query results kept
+        """
+        self.rows: List[Row] = [(c, e) for c, summaries in catalogs.items()
+                                for e in sorted(summaries)]
+        self.summaries = [catalogs[c][e] for c, e in self.rows]
+        self._row_of = {row: i for i, row in enumerate(self.rows)}
+        self.cache_size = cache_size
+        self._indexes = {}
+        self._results = OrderedDict()
+        for key in indexed_keys:
+            self.get_index(key)
+
+    @classmethod
+    def from_catalog_files(cls, catalog_fnames: Dict[str, str], **kwargs):
+        """:param catalog_fnames: {catalog: catalog json (as written by generate)}"""
+        return cls({catalog: dict(iter_catalog_events(fname))
+                    for catalog, fname in catalog_fnames.items()}, **kwargs)
+
+    @classmethod
+    def from_manifests(cls, catalog_fnames: Dict[str, str], **kwargs):
+        """From the summaries cached in the manifests of the catalogs (which
+        need not have been written)
+
+        :param catalog_fnames: {catalog: catalog json the manifest belongs to}
+        """
+        return cls({catalog: load_cached_summaries(fname)
+                    for catalog, fname in catalog_fnames.items()}, **kwargs)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get_index(self, key: str):
+        index = self._indexes.get(key)
+        if index is None:
+            values = [s.get(key) for s in self.summaries]
+            index = NumericIndex(values) if is_numeric(values) else CategoricalIndex(values)
+            self._indexes[key] = index
+        return index
+
+    def query(
+            self,
+            filters: Optional[Dict[str, Any]] = None,
+            order_by: Optional[str] = None,
+            descending: Optional[bool] = False,
+            limit: Optional[int] = None
+    ) -> Tuple[Row, ...]:
+        """(catalog, event_name) of the events matching every filter (in the
+        order of the rows, or of order_by)
+
+        :param filters: {key: condition} (see the module docstring)
+        :param order_by: sort the events by this key (events without a value
+            are left out)
+        :param limit: at most this many events (the top-k with order_by)
+        """
+        conditions = tuple(sorted(
+            (key, normalise_condition(c)) for key, c in (filters or {}).items()))
+        cache_key = json.dumps([conditions, order_by, descending, limit], default=repr)
+        if cache_key in self._results:
+            profiling.count("query_cache_hits")
+            self._results.move_to_end(cache_key)
+            return self._results[cache_key]
+        profiling.count("query_cache_misses")
+
+        rows = self._select(conditions, order_by, descending, limit)
+        result = tuple(self.rows[r] for r in rows)
+        self._results[cache_key] = result
+        if len(self._results) > self.cache_size:
+            self._results.popitem(last=False)
+        return result
+
+    def _select(self, conditions, order_by, descending, limit) -> np.ndarray:
+        indexes = [(self.get_index(key), condition) for key, condition in conditions]
+        if order_by is not None:
+            order_index = self.get_index(order_by)
+            if not indexes:
+                return order_index.ordered(descending)[:limit]
+            counts = [index.count(condition) for index, condition in indexes]
+            if limit is not None and min(counts) > limit:
+                # unselective filters: walk the order until limit rows match
+                return self._first_matches(order_index.ordered(descending), indexes, limit)
+        if not indexes:
+            return np.arange(len(self.rows))[:limit]
+
+        # rows of the most selective filter, checked against the others
+        indexes.sort(key=lambda item: item[0].count(item[1]))
+        index, condition = indexes[0]
+        rows = index.select(condition)
+        for index, condition in indexes[1:]:
+            rows = rows[index.matches(rows, condition)]
+        if order_by is not None:
+            return order_index.sort(rows, descending)[:limit]
+        return np.sort(rows)[:limit]
+
+    def _first_matches(self, ordered, indexes, limit) -> np.ndarray:
+        matches, start = [], 0
+        block = max(limit, 16)
+        while start < len(ordered) and sum(map(len, matches)) < limit:
+            rows = ordered[start:start + block]
+            for index, condition in indexes:
+                rows = rows[index.matches(rows, condition)]
+            matches.append(rows)
+            start += block
+            block *= 2
+        return np.concatenate(matches or [np.empty(0, dtype=int)])[:limit]
+
+    def count(self, filters: Optional[Dict[str, Any]] = None) -> int:
+        return len(self.query(filters))
+
+    def top_k(self, key: str, k: int, filters: Optional[Dict[str, Any]] = None,
+              largest: Optional[bool] = True) -> Tuple[Row, ...]:
+        """The k events with the largest (or smallest) key"""
+        return self.query(filters, order_by=key, descending=largest, limit=k)
+
+    def get_summary(self, catalog: str, event_name: str) -> Dict:
+        return self.summaries[self._row_of[(catalog, event_name)]]
+
+    def to_dataframe(self, rows: Optional[Tuple[Row, ...]] = None,
+                     columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Table of the summaries of rows (default: all), indexed by (catalog, event)"""
+        rows = self.rows if rows is None else list(rows)
+        df = pd.DataFrame([self.get_summary(*row) for row in rows],
+                          index=pd.MultiIndex.from_tuples(rows, names=["catalog", "event"]))
+        return df if columns is None else df.reindex(columns=columns)
@@ -0,0 +1,230 @@
+"""Build any subset of the catalogs from the command line.
+
+Each catalog is read from <data root>/<catalog data_subdir> (or the dir given
+with --data-dir NAME=DIR) and written to <out dir>/<name>_catalog.json (eg
+gwtc1_catalog.json for GWTC-1). Independent catalogs are built concurrently in
+--jobs processes, and within a catalog the files can be summarised by
+--workers workers, largest first and (with --memory-budget) only as many at
+once as fit in the budget. Builds are incremental unless --full is given.
+
+Installed as the `catalog-generators` console script.
+
+Example usage:
+
+    catalog-generators IAS PyCBC --data-root data --out-dir data --jobs 2 \
+        --cache-dir ~/.cache/catalog_generators --profile profile.json
+    catalog-generators GWTC-2 PyCBC --workers 0 --memory-budget 4000
+    catalog-generators --list
+    catalog-generators --scan --data-root data  # writes data/file_index.json
+
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from . import profiling
+from .catalog_generator import get_catalog_generator, get_catalog_names
+from .cosmology import CACHE_DIR_ENV, get_redshift_interpolator
+from .downsampling import Downsampler
+from .file_index import DEFAULT_INDEX_FNAME, FileIndex
+from .json_stream import MODES
+from .parallel import parallel_map
+from .transform_cache import CACHE_SIZE_ENV, DEFAULT_MAX_BYTES
+
+DEFAULT_DATA_ROOT = "data"
+
+
+def get_catalog_fname(name: str, out_dir: str, catalog_mode: Optional[str] = None) -> str:
+    """<out_dir>/<name, lower case without dashes>_catalog.json (.ndjson in
+    ndjson mode)"""
+    extension = ".ndjson" if catalog_mode == "ndjson" else ".json"
+    return os.path.join(out_dir, f"{name.lower().replace('-', '')}_catalog{extension}")
+
+
+def parse_data_dirs(data_dirs: List[str]) -> Dict[str, str]:
+    """{catalog: dir} of "NAME=DIR" arguments"""
+    parsed = {}
+    for data_dir in data_dirs:
+        name, sep, path = data_dir.partition("=")
+        if not sep or not name or not path:
+            raise ValueError(f"Expected NAME=DIR, got {data_dir}")
+        parsed[name] = path
+    return parsed
+
+
+def build_catalog(job: Dict) -> Dict:
+    """Build one catalog (run in the --jobs worker processes)
+
+    :param job: dict(name, data_dir, out_catalog_fname, n_workers, executor,
+        incremental, catalog_mode, n_samples, n_bootstrap, chunk_size,
+        memory_budget, index_fname)
+    :return: dict(name, out_catalog_fname, n_events, seconds, schedule[, error])
+    """
+    result = dict(name=job['name'], out_catalog_fname=job['out_catalog_fname'])
+    start = time.perf_counter()
+    try:
+        if not os.path.isdir(job['data_dir']):
+            raise FileNotFoundError(f"No data dir {job['data_dir']}")
+        downsampler = None
+        if job['n_samples']:
+            downsampler = Downsampler(n_samples=job['n_samples'])
+        generator = get_catalog_generator(job['name'])(
+            job['data_dir'], job['n_workers'], job['executor'],
+            downsampler=downsampler, n_bootstrap=job['n_bootstrap'],
+            chunk_size=job['chunk_size'], memory_budget=job['memory_budget'],
+            file_index=FileIndex.load(job['index_fname']) if job['index_fname'] else None)
+        os.makedirs(os.path.dirname(job['out_catalog_fname']) or ".", exist_ok=True)
+        summaries = generator.generate(
+            job['out_catalog_fname'], job['incremental'], job['catalog_mode'])
+        result['n_events'] = len(summaries)
+        result['schedule'] = generator.schedule_report
+    except Exception:
+        result['error'] = traceback.format_exc()
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+
+def scan(data_dirs: Dict[str, str], index_fname: str, n_workers: int) -> int:
+    """Update the file index of the catalogs and print what it holds"""
+    index = FileIndex.load(index_fname)
+    described = index.scan(data_dirs, n_workers=n_workers or None)
+    index.save()
+    print(f"{index_fname}: {len(described)} files (re)scanned")
+    for catalog, totals in index.summary().items():
+        print(f"{catalog}: {totals['n_files']} files, {totals['n_samples']} samples, "
+              f"{totals['size'] / 1e6:.1f} MB" +
+              (f", {totals['n_errors']} unreadable" if totals['n_errors'] else ""))
+    return 0
+
+
+def create_parser():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("catalogs", nargs="*",
+                        help="catalogs to build (default: all, see --list)")
+    parser.add_argument("--list", action="store_true", help="list the catalogs and exit")
+    parser.add_argument("--scan", action="store_true",
+                        help="index the posterior files of the catalogs (see --index) and exit")
+    parser.add_argument("--index", default=None,
+                        help="file index written by --scan, and read (if it exists) "
+                             "for the sizes of the files when scheduling them "
+                             f"(default: <data root>/{DEFAULT_INDEX_FNAME})")
+    parser.add_argument("--data-root", default=DEFAULT_DATA_ROOT,
+                        help="dir with the data dirs of the catalogs")
+    parser.add_argument("--data-dir", action="append", default=[], metavar="NAME=DIR",
+                        help="data dir of one catalog (overrides --data-root)")
+    parser.add_argument("--out-dir", default=DEFAULT_DATA_ROOT,
+                        help="dir the catalog jsons are written to")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="number of catalogs built concurrently (0: all cores)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="workers summarising the files of each catalog (0: all cores; "
+                             "default: 1, or all cores with --memory-budget)")
+    parser.add_argument("--memory-budget", type=float, default=None, metavar="MB",
+                        help="max estimated memory of the files summarised at once "
+                             "by the workers of each catalog")
+    parser.add_argument("--executor", default=None,
+                        help="executor of the --workers: serial, thread or process "
+                             "(default: the catalog's)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="dir for caches shared between runs and processes "
+                             "(the redshift lookup tables and the derived sample columns)")
+    parser.add_argument("--cache-size", type=float, default=None, metavar="MB",
+                        help="max size of the derived column cache "
+                             f"(default: {DEFAULT_MAX_BYTES // 2 ** 20} MB)")
+    parser.add_argument("--profile", default=None,
+                        help="save a profiling report (with cProfile stats) to this json")
+    parser.add_argument("--full", action="store_true",
+                        help="rebuild every event (ignore the cached summaries)")
+    parser.add_argument("--catalog-mode", default=None, choices=MODES,
+                        help="json layout of the catalogs (default: pretty)")
+    parser.add_argument("--n-samples", type=int, default=None,
+                        help="down-sample each posterior to this many samples")
+    parser.add_argument("--bootstrap", type=int, default=None,
+                        help="add bootstrap standard errors (of this many replicates)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="summarise the posteriors in blocks of this many samples "
+                             "(bounded memory, approximate quantiles)")
+    return parser
+
+
+def main(args=None) -> int:
+    parser = create_parser()
+    args = parser.parse_args(args)
+    names = get_catalog_names()
+    if args.list:
+        for name in names:
+            print(f"{name}: {get_catalog_generator(name).data_subdir}")
+        return 0
+    catalogs = args.catalogs or names
+    unknown = [c for c in catalogs if c not in names]
+    if unknown:
+        parser.error(f"unknown catalogs {unknown} (available: {names})")
+    try:
+        data_dirs = parse_data_dirs(args.data_dir)
+    except ValueError as e:
+        parser.error(str(e))
+    unselected = [name for name in data_dirs if name not in catalogs]
+    if unselected:
+        parser.error(f"--data-dir given for catalogs that are not built {unselected} "
+                     f"(selected: {catalogs})")
+    if args.cache_dir:
+        # inherited by every worker process, which then load the redshift
+        # table built (once) here
+        os.environ[CACHE_DIR_ENV] = os.path.abspath(args.cache_dir)
+        get_redshift_interpolator(cache_dir=os.environ[CACHE_DIR_ENV])
+    if args.cache_size is not None:
+        os.environ[CACHE_SIZE_ENV] = str(args.cache_size)
+
+    data_dirs = {
+        name: data_dirs.get(name, os.path.join(args.data_root, get_catalog_generator(name).data_subdir))
+        for name in catalogs
+    }
+    index_fname = args.index or os.path.join(args.data_root, DEFAULT_INDEX_FNAME)
+    n_workers = args.workers
+    if n_workers is None:
+        n_workers = 0 if args.memory_budget else 1
+    if args.scan:
+        return scan(data_dirs, index_fname, n_workers)
+
+    jobs = [
+        dict(
+            name=name,
+            data_dir=data_dirs[name],
+            out_catalog_fname=get_catalog_fname(name, args.out_dir, args.catalog_mode),
+            n_workers=n_workers, executor=args.executor,
+            incremental=not args.full, catalog_mode=args.catalog_mode,
+            n_samples=args.n_samples, n_bootstrap=args.bootstrap,
+            chunk_size=args.chunk_size,
+            memory_budget=args.memory_budget * 2 ** 20 if args.memory_budget else None,
+            index_fname=index_fname if os.path.isfile(index_fname) else None,
+        )
+        for name in catalogs
+    ]
+    if args.profile:
+        profiling.enable_profiling(cprofile=True)
+    executor = "process" if args.jobs != 1 and len(jobs) > 1 else "serial"
+    results = parallel_map(build_catalog, jobs, n_workers=args.jobs or None,
+                           executor=executor, desc="Building catalogs")
+    if args.profile:
+        profiling.save_profile_report(args.profile)
+        profiling.disable_profiling()
+
+    for result in results:
+        if 'error' in result:
+            print(f"{result['name']} failed:\n{result['error']}", file=sys.stderr)
+        else:
+            schedule = result['schedule']
+            workers = ""
+            if schedule.get('n_workers', 1) > 1 and 'efficiency' in schedule:
+                workers = (f", {schedule['n_workers']} workers at "
+                           f"{schedule['efficiency']:.0%} of the ideal wall time")
+            print(f"{result['name']}: {result['n_events']} events -> "
+                  f"{result['out_catalog_fname']} ({result['seconds']:.1f} s{workers})")
+    return 1 if any('error' in r for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,362 @@
+"""Overlaid corner plots drawn from cached histograms.
+
+Plotting the posteriors of several catalogs with corner.corner re-bins (and
+smooths) every parameter pair of the full samples on each call. Here the binned
+1D/2D histograms and the contour levels are computed once per (catalog, event,
+parameter pair), in parallel, and cached in memory and (with a cache_dir) on
+disk. Rendering only draws the cached grids, so restyling or regenerating the
+plots of all the events in several catalogs is cheap.
+
+The histograms, smoothing and contour levels follow corner.hist2d (with the
+CORNER_KWARGS of read_samples.ipynb: 20 bins, smooth=0.9, 1-3 sigma levels).
+Cached entries are keyed by the settings, the plot ranges and the hash of the
+samples, so changed samples or ranges are re-binned.
+
+Example usage:
+
+    cache = HistogramCache(cache_dir="plots/histograms", n_workers=4)
+    samples = {"LVC": lvc_samples["GW150914"], "IAS": ias_samples["GW150914"]}
+    fig = plot_overlaid_corner(samples, "GW150914", ["mass_1", "mass_2", "ra", "dec"], cache)
+    fig.savefig("GW150914.png")
+
+    plot_overlapping_events({"LVC": lvc_samples, "IAS": ias_samples},
+                            ["mass_1", "mass_2"], "plots", cache)
+
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .atomic_file import atomic_write
+from .event_keys import PARAMETERS
+from .lazy_import import lazy_import
+from .parallel import parallel_map
+from .transform_cache import transform_key
+
+pd = lazy_import("pandas")
+ndimage = lazy_import("scipy.ndimage")
+mpl_colors = lazy_import("matplotlib.colors")
+mpl_figure = lazy_import("matplotlib.figure")
+mpl_lines = lazy_import("matplotlib.lines")
+
+DEFAULT_BINS = 20
+DEFAULT_SMOOTH = 0.9
+# 1, 2 and 3 sigma (of a 2D gaussian)
+DEFAULT_LEVELS = (1 - np.exp(-0.5), 1 - np.exp(-2), 1 - np.exp(-9 / 2.))
+DEFAULT_QUANTILES = (0.16, 0.84)
+
+
+def get_ranges(samples_list: List[pd.DataFrame], parameters: List[str]
+               ) -> Dict[str, Tuple[float, float]]:
+    """{parameter: (min, max)} over all the samples (shared plot ranges)"""
+    return {
+        p: (float(min(np.nanmin(s[p]) for s in samples_list)),
+            float(max(np.nanmax(s[p]) for s in samples_list)))
+        for p in parameters
+    }
+
+
+def histogram_1d(
+        values: np.ndarray,
+        value_range: Tuple[float, float],
+        bins: Optional[int] = DEFAULT_BINS,
+        quantiles: Optional[Tuple[float, ...]] = DEFAULT_QUANTILES
+) -> Dict[str, np.ndarray]:
+    """dict(edges, counts, quantiles) of values"""
+    counts, edges = np.histogram(values, bins=bins, range=_bin_range(value_range))
+    return dict(edges=edges, counts=counts.astype(float),
+                quantiles=np.quantile(values, quantiles))
+
+
+def histogram_2d(
+        x: np.ndarray,
+        y: np.ndarray,
+        ranges: Tuple[Tuple[float, float], Tuple[float, float]],
+        bins: Optional[int] = DEFAULT_BINS,
+        smooth: Optional[float] = DEFAULT_SMOOTH,
+        levels: Optional[Tuple[float, ...]] = DEFAULT_LEVELS
+) -> Dict[str, np.ndarray]:
+    """dict(x_edges, y_edges, counts, levels) of the (smoothed) 2D histogram
+    and the counts enclosing the levels probability mass (as corner.hist2d)"""
+    counts, x_edges, y_edges = np.histogram2d(
+        x, y, bins=bins, range=[_bin_range(r) for r in ranges])
+    if smooth:
+        counts = ndimage.gaussian_filter(counts, smooth)
+    return dict(x_edges=x_edges, y_edges=y_edges, counts=counts,
+                levels=contour_levels(counts, levels))
+
+
+def contour_levels(counts: np.ndarray, levels: Tuple[float, ...]) -> np.ndarray:
+    """Sorted counts above which the levels fractions of the total lie"""
+    flat = np.sort(counts.ravel())[::-1]
+    cumulative = np.cumsum(flat)
+    cumulative /= cumulative[-1]
+    values = np.array([
+        flat[cumulative <= level][-1] if np.any(cumulative <= level) else flat[0]
+        for level in levels
+    ])
+    values.sort()
+    # contour levels must increase
+    repeated = np.diff(values) == 0
+    while np.any(repeated):
+        values[np.where(repeated)[0][0]] *= 1.0 - 1e-4
+        repeated = np.diff(values) == 0
+    values.sort()
+    return values
+
+
+def _bin_range(value_range: Tuple[float, float]) -> Tuple[float, float]:
+    low, high = sorted(value_range)
+    if low == high:
+        # np.histogram needs a non-empty range
+        low, high = low - 0.5, high + 0.5
+    return low, high
+
+
+def _compute_histogram(job: Dict) -> Dict[str, np.ndarray]:
+    if len(job['values']) == 1:
+        return histogram_1d(job['values'][0], job['ranges'][0], job['bins'], job['quantiles'])
+    return histogram_2d(*job['values'], job['ranges'], job['bins'], job['smooth'],
+                        job['levels'])
+
+
+class HistogramCache:
+
+    def __init__(
+            self,
+            cache_dir: Optional[str] = None,
+            bins: Optional[int] = DEFAULT_BINS,
+            smooth: Optional[float] = DEFAULT_SMOOTH,
+            levels: Optional[Tuple[float, ...]] = DEFAULT_LEVELS,
+            quantiles: Optional[Tuple[float, ...]] = DEFAULT_QUANTILES,
+            n_workers: Optional[int] = 1,
+            executor: Optional[str] = "thread"
+    ):
+        """
+        :param cache_dir: dir the histograms are saved to (in
+            <catalog>/<event>/<parameters>.npz), None to only cache in memory
+        :param n_workers: workers computing the histograms of the pairs
+        :param executor: executor of the workers (see parallel_map)
+        """
+        self.cache_dir = cache_dir
+        self.bins = bins
+        self.smooth = smooth
+        self.levels = tuple(float(l) for l in levels)
+        self.quantiles = tuple(float(q) for q in quantiles)
+        self.n_workers = n_workers
+        self.executor = executor
+        self._histograms = {}
+
+    def settings(self) -> Dict:
+        return dict(bins=self.bins, smooth=self.smooth, levels=self.levels,
+                    quantiles=self.quantiles)
+
+    def get_histograms(
+            self,
+            catalog: str,
+            event_name: str,
+            samples: pd.DataFrame,
+            parameters: List[str],
+            ranges: Optional[Dict[str, Tuple[float, float]]] = None
+    ) -> Dict[Tuple[str, ...], Dict[str, np.ndarray]]:
+        """The histograms of each parameter and each pair of parameters (only
+        the missing or stale ones are computed)
+
+        :param ranges: {parameter: (min, max)} (default: of the samples)
+        :return: {(parameter,): histogram_1d, (x, y): histogram_2d}
+        """
+        ranges = ranges or get_ranges([samples], parameters)
+        keys = [(p,) for p in parameters] + list(itertools.combinations(parameters, 2))
+        histograms, jobs = {}, []
+        for key in keys:
+            content_key = transform_key(
+                json.dumps(dict(parameters=key, ranges=[ranges[p] for p in key],
+                                **self.settings())),
+                [samples[p].to_numpy() for p in key])
+            histogram = self._load(catalog, event_name, key, content_key)
+            if histogram is None:
+                jobs.append((key, content_key))
+            else:
+                histograms[key] = histogram
+
+        if not jobs:
+            return histograms
+        results = parallel_map(
+            _compute_histogram,
+            [dict(values=[samples[p].to_numpy() for p in key],
+                  ranges=tuple(ranges[p] for p in key), **self.settings())
+             for key, _ in jobs],
+            n_workers=self.n_workers, executor=self.executor,
+            desc=f"Histogramming {catalog} {event_name}")
+        for (key, content_key), histogram in zip(jobs, results):
+            self._save(catalog, event_name, key, content_key, histogram)
+            histograms[key] = histogram
+        return histograms
+
+    def fname(self, catalog: str, event_name: str, key: Tuple[str, ...]) -> str:
+        return os.path.join(self.cache_dir, catalog, event_name, "__".join(key) + ".npz")
+
+    def _load(self, catalog, event_name, key, content_key) -> Optional[Dict[str, np.ndarray]]:
+        cached = self._histograms.get((catalog, event_name, key))
+        if cached is not None and cached[0] == content_key:
+            return cached[1]
+        if self.cache_dir is None:
+            return None
+        try:
+            with np.load(self.fname(catalog, event_name, key)) as npz:
+                if str(npz['key']) != content_key:
+                    return None
+                histogram = {k: npz[k] for k in npz.files if k != 'key'}
+        except (OSError, ValueError, KeyError):
+            return None
+        self._histograms[(catalog, event_name, key)] = (content_key, histogram)
+        return histogram
+
+    def _save(self, catalog, event_name, key, content_key, histogram):
+        self._histograms[(catalog, event_name, key)] = (content_key, histogram)
+        if self.cache_dir is None:
+            return
+        fname = self.fname(catalog, event_name, key)
+        os.makedirs(os.path.dirname(fname), exist_ok=True)
+        with atomic_write(fname, 'wb') as f:
+            np.savez(f, key=content_key, **histogram)
+
+
+def render_overlaid_corner(
+        histograms: Dict[str, Dict[Tuple[str, ...], Dict[str, np.ndarray]]],
+        parameters: List[str],
+        colors: Optional[List] = None,
+        ranges: Optional[Dict[str, Tuple[float, float]]] = None
+) -> mpl_figure.Figure:
+    """Draw the cached histograms of several catalogs on one corner plot
+
+    :param histograms: {label: HistogramCache.get_histograms output}
+    :param colors: one matplotlib color per label (default: C0, C1, ...)
+    :return: the figure (not attached to pyplot)
+    """
+    n = len(parameters)
+    colors = colors or [f"C{i}" for i in range(len(histograms))]
+    fig = mpl_figure.Figure(figsize=(2.5 * n, 2.5 * n))
+    axes = np.array(fig.subplots(n, n, squeeze=False))
+    fig.subplots_adjust(wspace=0.05, hspace=0.05)
+    for (label, event_histograms), color in zip(histograms.items(), colors):
+        for i, j in itertools.product(range(n), repeat=2):
+            ax = axes[i, j]
+            if j > i:
+                ax.set_visible(False)
+            elif i == j:
+                _draw_histogram_1d(ax, event_histograms[(parameters[i],)], color)
+            else:
+                _draw_histogram_2d(ax, event_histograms[(parameters[j], parameters[i])], color)
+    for i, j in itertools.product(range(n), repeat=2):
+        ax = axes[i, j]
+        if ranges is not None:
+            ax.set_xlim(ranges[parameters[j]])
+            if i != j:
+                ax.set_ylim(ranges[parameters[i]])
+        ax.tick_params(labelsize=8)
+        if i < n - 1:
+            ax.set_xticklabels([])
+        else:
+            ax.set_xlabel(PARAMETERS.get(parameters[j], parameters[j]), fontsize=16)
+        if j > 0 or i == j:
+            ax.set_yticklabels([])
+        else:
+            ax.set_ylabel(PARAMETERS.get(parameters[i], parameters[i]), fontsize=16)
+        if i == j:
+            ax.set_yticks([])
+    fig.legend(handles=[mpl_lines.Line2D([], [], color=c, label=label)
+                        for label, c in zip(histograms, colors)],
+               fontsize=16, frameon=False, loc="upper right")
+    return fig
+
+
+def _draw_histogram_1d(ax, histogram: Dict[str, np.ndarray], color):
+    counts = histogram['counts']
+    # fractions, so catalogs with different numbers of samples overlay
+    ax.stairs(counts / max(counts.sum(), 1), histogram['edges'], color=color)
+    for quantile in histogram['quantiles']:
+        ax.axvline(quantile, ls="dashed", color=color)
+
+
+def _draw_histogram_2d(ax, histogram: Dict[str, np.ndarray], color):
+    counts, levels = histogram['counts'], histogram['levels']
+    x, y, padded = _pad_histogram(histogram['x_edges'], histogram['y_edges'], counts)
+    # filled contours fading from transparent (outside) to color (inside)
+    rgba = mpl_colors.to_rgba(color)
+    fill_colors = [(*rgba[:3], rgba[3] * i / (len(levels) + 1)) for i in range(len(levels) + 1)]
+    ax.contourf(x, y, padded.T, np.concatenate([levels, [counts.max() * (1 + 1e-4)]]),
+                colors=fill_colors, antialiased=False)
+    ax.contour(x, y, padded.T, levels, colors=[color])
+
+
+def _pad_histogram(x_edges, y_edges, counts) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Bin centres and counts extended by two bins (as corner.hist2d, so the
+    contours close at the edges of the range)"""
+    padded = np.full((counts.shape[0] + 4, counts.shape[1] + 4), counts.min())
+    padded[1:-1, 1:-1] = np.pad(counts, 1, mode="edge")
+    centers = []
+    for edges in [x_edges, y_edges]:
+        mid = 0.5 * (edges[1:] + edges[:-1])
+        width = edges[1] - edges[0]
+        centers.append(np.concatenate([mid[0] - np.array([2, 1]) * width, mid,
+                                       mid[-1] + np.array([1, 2]) * width]))
+    return centers[0], centers[1], padded
+
+
+def plot_overlaid_corner(
+        samples: Dict[str, pd.DataFrame],
+        event_name: str,
+        parameters: List[str],
+        cache: Optional[HistogramCache] = None,
+        fname: Optional[str] = None,
+        colors: Optional[List] = None
+) -> mpl_figure.Figure:
+    """Corner plot of the samples of one event in several catalogs
+
+    :param samples: {catalog label: df of samples}
+    :param fname: save the figure to this file
+    """
+    cache = cache or HistogramCache()
+    ranges = get_ranges(list(samples.values()), parameters)
+    histograms = {
+        label: cache.get_histograms(label, event_name, df, parameters, ranges)
+        for label, df in samples.items()
+    }
+    fig = render_overlaid_corner(histograms, parameters, colors, ranges)
+    if fname is not None:
+        fig.savefig(fname)
+    return fig
+
+
+def plot_overlapping_events(
+        catalogs: Dict[str, Dict[str, pd.DataFrame]],
+        parameters: List[str],
+        out_dir: str,
+        cache: Optional[HistogramCache] = None,
+        min_catalogs: Optional[int] = 2
+) -> List[str]:
+    """Save <out_dir>/<event>.png overlaid corner plots of the events in at
+    least min_catalogs catalogs
+
+    :param catalogs: {catalog label: {event name: df of samples}}
+    :return: the plot file names
+    """
+    cache = cache or HistogramCache()
+    os.makedirs(out_dir, exist_ok=True)
+    event_names = sorted(set(itertools.chain.from_iterable(catalogs.values())))
+    fnames = []
+    for event_name in event_names:
+        samples = {label: events[event_name] for label, events in catalogs.items()
+                   if event_name in events}
+        if len(samples) < min_catalogs:
+            continue
+        fname = os.path.join(out_dir, f"{event_name}.png")
+        plot_overlaid_corner(samples, event_name, parameters, cache, fname)
+        fnames.append(fname)
+    return fnames
@@ -0,0 +1,157 @@
+"""Luminosity distance to redshift conversions from a cached lookup table.
+
+The table for each cosmology is built lazily once per process (and can be
+persisted to disk), after which every conversion is a vectorised np.interp.
+The tables are persisted to the cache_dir argument or, if not given, to the
+dir in the CACHE_DIR_ENV environment variable (so worker processes share them).
+A table that could not meet its accuracy within MAX_GRID_POINTS points is used
+with a warning, but never persisted.
+
+Example usage:
+
+    z = luminosity_distance_to_redshift([100, 440, 5000])
+
+"""
+import functools
+import os
+import warnings
+from typing import Optional
+
+import numpy as np
+
+from . import profiling
+from .atomic_file import atomic_write
+
+DEFAULT_COSMOLOGY = "Planck15"
+CACHE_DIR_ENV = "CATALOG_GENERATORS_CACHE_DIR"
+MAX_GRID_POINTS = 2 ** 20
+
+
+class RedshiftInterpolator:
+    """Interpolates z(d_L) from a grid refined until it meets a relative accuracy.
+
+    The smooth ratio z / d_L (-> H0 / c as z -> 0) is interpolated rather than
+    z itself, so the relative error stays second order down to z = 0.
+
+    :param cosmology: name of an astropy.cosmology realisation (eg "Planck15")
+    :param z_max: largest redshift in the lookup table
+    :param rtol: max relative error in z at the midpoints of the grid
+    :param cache_dir: if given, the grid is saved to/loaded from this dir
+    """
+
+    def __init__(
+            self,
+            cosmology: Optional[str] = DEFAULT_COSMOLOGY,
+            z_max: Optional[float] = 10.0,
+            rtol: Optional[float] = 1e-6,
+            cache_dir: Optional[str] = None
+    ):
+        self.cosmology = cosmology
+        self.z_max = z_max
+        self.rtol = rtol
+        self.cache_dir = cache_dir
+        self.z_grid, self.dl_grid = self._load_or_build_grid()
+        self.ratio_grid = self._ratio(self.z_grid, self.dl_grid)
+
+    @property
+    def cache_fname(self) -> str:
+        fname = f"redshift_grid_{self.cosmology}_zmax{self.z_max}_rtol{self.rtol}.npz"
+        return os.path.join(self.cache_dir, fname)
+
+    def _load_or_build_grid(self):
+        if self.cache_dir and os.path.isfile(self.cache_fname):
+            grid = np.load(self.cache_fname)
+            return grid["z"], grid["dl"]
+        with profiling.timer("redshift_grid_build"):
+            z_grid, dl_grid, max_error = self._build_grid()
+        if max_error >= self.rtol:
+            warnings.warn(
+                f"The redshift grid of {self.cosmology} has a relative error of "
+                f"{max_error:.2g} > rtol={self.rtol:g} with {len(z_grid)} points "
+                f"(MAX_GRID_POINTS); it is not persisted", RuntimeWarning)
+        elif self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with atomic_write(self.cache_fname, 'wb') as f:
+                np.savez(f, z=z_grid, dl=dl_grid)
+        return z_grid, dl_grid
+
+    def _build_grid(self, n_points=1000):
+        """Double the grid density until the midpoint error is below rtol (or
+        the grid has MAX_GRID_POINTS points)
+
+        :return: z grid, d_L grid, max relative error at the midpoints
+        """
+        while True:
+            z_grid = np.expm1(np.linspace(0, np.log1p(self.z_max), n_points))
+            dl_grid = self.exact_luminosity_distance(z_grid)
+            z_mid = (z_grid[1:] + z_grid[:-1]) / 2
+            dl_mid = self.exact_luminosity_distance(z_mid)
+            ratio = np.interp(dl_mid, dl_grid, self._ratio(z_grid, dl_grid))
+            max_error = np.max(np.abs(ratio * dl_mid - z_mid) / z_mid)
+            if max_error < self.rtol or n_points >= MAX_GRID_POINTS:
+                return z_grid, dl_grid, max_error
+            n_points = min(2 * n_points, MAX_GRID_POINTS)
+
+    def _ratio(self, z_grid, dl_grid):
+        """z / d_L, with the Hubble law limit at z = 0"""
+        from astropy import cosmology, units
+        cosmo = getattr(cosmology, self.cosmology)
+        ratio = np.empty_like(z_grid)
+        ratio[0] = 1 / cosmo.hubble_distance.to(units.Mpc).value
+        ratio[1:] = z_grid[1:] / dl_grid[1:]
+        return ratio
+
+    def exact_luminosity_distance(self, z):
+        """Luminosity distance [Mpc] computed by astropy"""
+        from astropy import cosmology, units
+        cosmo = getattr(cosmology, self.cosmology)
+        return cosmo.luminosity_distance(z).to(units.Mpc).value
+
+    def exact_redshift(self, dl):
+        """Redshift from a root-find for each (scalar) luminosity distance"""
+        from astropy import cosmology, units
+        cosmo = getattr(cosmology, self.cosmology)
+        return np.array([
+            cosmology.z_at_value(
+                cosmo.luminosity_distance, d * units.Mpc, zmax=1e4).value
+            for d in np.atleast_1d(dl)
+        ])
+
+    def __call__(self, dl):
+        """Redshift for luminosity distances [Mpc].
+
+        Distances beyond the grid fall back to an exact root-find, and
+        negative distances give nan.
+        """
+        scalar = np.ndim(dl) == 0
+        dl = np.atleast_1d(np.asarray(dl, dtype=float))
+        z = np.interp(dl, self.dl_grid, self.ratio_grid) * dl
+        outside = dl > self.dl_grid[-1]
+        profiling.count("redshifts_interpolated", len(dl))
+        if np.any(outside):
+            profiling.count("redshifts_root_found", int(outside.sum()))
+            z[outside] = self.exact_redshift(dl[outside])
+        z[dl < 0] = np.nan
+        return float(z[0]) if scalar else z
+
+
+@functools.lru_cache(maxsize=None)
+def get_redshift_interpolator(
+        cosmology: Optional[str] = DEFAULT_COSMOLOGY,
+        z_max: Optional[float] = 10.0,
+        rtol: Optional[float] = 1e-6,
+        cache_dir: Optional[str] = None
+) -> RedshiftInterpolator:
+    """Process-wide RedshiftInterpolator (built on first use)"""
+    return RedshiftInterpolator(cosmology, z_max, rtol, cache_dir)
+
+
+def luminosity_distance_to_redshift(dl, cosmology=DEFAULT_COSMOLOGY, **kwargs):
+    """Vectorised luminosity distance [Mpc] to redshift conversion
+
+    :param dl: float or array of luminosity distances in Mpc
+    :param cosmology: name of an astropy.cosmology realisation
+    :param kwargs: z_max, rtol, cache_dir for get_redshift_interpolator
+    """
+    kwargs.setdefault('cache_dir', os.environ.get(CACHE_DIR_ENV))
+    return get_redshift_interpolator(cosmology, **kwargs)(dl)
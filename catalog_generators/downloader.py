@@ -0,0 +1,247 @@
+"""Concurrent, resumable and verified downloads of the posterior files.
+
+Downloads are written to "<target>.part" and renamed once complete, so an
+existing target is always a complete file. Interrupted downloads resume with an
+HTTP Range request. Repeated urls/targets are downloaded once, and targets that
+are complete (and match the size/sha256 recorded in the manifest) are skipped.
+Targets without a manifest entry (eg written by the old wget script, which
+left truncated files behind) are only skipped if they have the size of the
+remote file (HEAD Content-Length), and resumed if they are shorter. The size
+and sha256 of new downloads are added to the manifest, so later runs verify
+against them.
+
+Example usage:
+
+    tasks = parse_data_files("data_files.txt")
+    download_all(tasks, manifest_fname="data_files.manifest.json", n_workers=4)
+
+"""
+import functools
+import json
+import os
+import shlex
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+from .atomic_file import atomic_write
+from .manifest import file_hash
+from .parallel import parallel_map
+
+CHUNK_SIZE = 2 ** 20
+PART_SUFFIX = ".part"
+
+# statuses of download results
+SKIPPED = "skipped"
+DOWNLOADED = "downloaded"
+RESUMED = "resumed"
+FAILED = "failed"
+
+
+def parse_data_files(fname: str) -> List[Tuple[str, str]]:
+    """(url, target) of each "<url> -O <target>" line (wget args) of fname
+
+    Lines without -O are saved to the basename of the url (without query).
+    """
+    tasks = []
+    with open(fname, 'r') as f:
+        for line in f:
+            args = shlex.split(line)
+            if not args:
+                continue
+            url = args[0]
+            if "-O" in args:
+                target = args[args.index("-O") + 1]
+            else:
+                target = os.path.basename(url.split("?")[0])
+            tasks.append((url, target))
+    return tasks
+
+
+def deduplicate_tasks(tasks: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Drop repeated (url, target) pairs (keeping the first occurrence order)
+
+    :raises ValueError: if a target is given different urls
+    """
+    urls = {}
+    for url, target in tasks:
+        target = os.path.normpath(target)
+        if urls.setdefault(target, url) != url:
+            raise ValueError(f"{target} has different urls: {urls[target]}, {url}")
+    return [(url, target) for target, url in urls.items()]
+
+
+def load_download_manifest(fname: Optional[str]) -> Dict[str, Dict]:
+    """{target: dict(url, size, sha256)} (empty if fname is None/missing)"""
+    if fname is None or not os.path.isfile(fname):
+        return {}
+    with open(fname, 'r') as f:
+        return json.load(f)
+
+
+def save_download_manifest(fname: str, manifest: Dict[str, Dict]):
+    with atomic_write(fname) as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def is_complete(target: str, expected: Optional[Dict] = None) -> bool:
+    """True if target exists and matches the expected size and sha256"""
+    if not os.path.isfile(target):
+        return False
+    if expected is None:
+        return True
+    if 'size' in expected and os.path.getsize(target) != expected['size']:
+        return False
+    if 'sha256' in expected and file_hash(target) != expected['sha256']:
+        return False
+    return True
+
+
+def get_remote_size(url: str, timeout: Optional[float] = 60) -> Optional[int]:
+    """Content-Length of a HEAD request of url (None if it is not given)"""
+    request = urllib.request.Request(url, method="HEAD")
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        length = response.headers.get("Content-Length")
+    return None if length is None else int(length)
+
+
+def download_file(
+        url: str,
+        target: str,
+        expected: Optional[Dict] = None,
+        retries: Optional[int] = 3,
+        timeout: Optional[float] = 60,
+        backoff: Optional[float] = 1.0
+) -> Dict:
+    """Download url to target (resuming target.part if it exists)
+
+    :param expected: dict(size=..., sha256=...) to verify the download against
+        (None: an existing target is checked against the remote size)
+    :param retries: number of retries after a failed attempt
+    :param backoff: seconds before the first retry (doubled after each retry)
+    :return: dict(url, target, status, bytes, size, sha256[, error])
+    """
+    result = dict(url=url, target=target, status=SKIPPED, bytes=0)
+    part = target + PART_SUFFIX
+    untracked = expected is None and os.path.isfile(target)
+    if untracked:
+        # only trusted if it has the remote size (else downloaded again)
+        try:
+            size = get_remote_size(url, timeout)
+        except (urllib.error.URLError, OSError, ValueError):
+            size = None
+        expected = None if size is None else dict(size=size)
+        if size is not None and os.path.getsize(target) < size and not os.path.isfile(part):
+            # truncated: resume it
+            os.replace(target, part)
+    if (expected is not None or not untracked) and is_complete(target, expected):
+        return _with_fingerprint(result, expected)
+
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    for attempt in range(retries + 1):
+        try:
+            result['status'], n_bytes = _download_part(url, part, timeout)
+            result['bytes'] += n_bytes
+            _verify(part, expected)
+            os.replace(part, target)
+            return _with_fingerprint(result, None)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            result['error'] = f"{type(e).__name__}: {e}"
+            if isinstance(e, ValueError) and os.path.isfile(part):
+                # corrupt download: start again from scratch
+                os.remove(part)
+            if attempt < retries:
+                time.sleep(backoff * 2 ** attempt)
+    result['status'] = FAILED
+    return result
+
+
+def _download_part(url: str, part: str, timeout: float) -> Tuple[str, int]:
+    """Download (the rest of) url into part
+    :return: status, number of bytes downloaded
+    """
+    offset = os.path.getsize(part) if os.path.isfile(part) else 0
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+    try:
+        response = urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and offset:
+            # range not satisfiable: the part is already complete
+            return RESUMED, 0
+        raise
+    with response:
+        resumed = offset and response.status == 206
+        status = RESUMED if resumed else DOWNLOADED
+        expected_length = response.headers.get("Content-Length")
+        n_bytes = 0
+        with open(part, 'ab' if resumed else 'wb') as f:
+            for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                f.write(chunk)
+                n_bytes += len(chunk)
+    if expected_length is not None and n_bytes != int(expected_length):
+        raise OSError(f"Incomplete download of {url}: {n_bytes}/{expected_length} bytes")
+    return status, n_bytes
+
+
+def _verify(fname: str, expected: Optional[Dict]):
+    if expected is None:
+        return
+    size = os.path.getsize(fname)
+    if 'size' in expected and size != expected['size']:
+        raise ValueError(f"{fname} has {size} bytes, expected {expected['size']}")
+    if 'sha256' in expected and file_hash(fname) != expected['sha256']:
+        raise ValueError(f"{fname} does not match its sha256")
+
+
+def _with_fingerprint(result: Dict, expected: Optional[Dict]) -> Dict:
+    """Add the size and sha256 of the target (reusing the verified ones)"""
+    if expected is not None and 'size' in expected and 'sha256' in expected:
+        result.update(size=expected['size'], sha256=expected['sha256'])
+    else:
+        result.update(size=os.path.getsize(result['target']),
+                      sha256=file_hash(result['target']))
+    return result
+
+
+def _download_task(task: Tuple[str, str, Optional[Dict]], **kwargs) -> Dict:
+    url, target, expected = task
+    return download_file(url, target, expected, **kwargs)
+
+
+def download_all(
+        tasks: List[Tuple[str, str]],
+        manifest_fname: Optional[str] = None,
+        n_workers: Optional[int] = 4,
+        raise_on_failure: Optional[bool] = True,
+        **kwargs
+) -> List[Dict]:
+    """Download the (url, target) tasks with a pool of threads
+
+    :param manifest_fname: json of {target: dict(url, size, sha256)} used to
+        verify and skip downloads (updated with the new downloads)
+    :param raise_on_failure: raise a RuntimeError if any download failed (after
+        saving the manifest of the successful ones)
+    :param kwargs: passed to download_file (retries, timeout, backoff)
+    :return: download_file results
+    """
+    manifest = load_download_manifest(manifest_fname)
+    tasks = [(url, target, manifest.get(target)) for url, target in deduplicate_tasks(tasks)]
+    results = parallel_map(
+        functools.partial(_download_task, **kwargs), tasks,
+        n_workers=n_workers, executor="thread", desc="Downloading Event Samples")
+
+    for result in results:
+        if result['status'] != FAILED:
+            manifest[result['target']] = dict(
+                url=result['url'], size=result['size'], sha256=result['sha256'])
+    if manifest_fname is not None:
+        save_download_manifest(manifest_fname, manifest)
+
+    failed = [r for r in results if r['status'] == FAILED]
+    if failed and raise_on_failure:
+        raise RuntimeError("Failed downloads:\n" + "\n".join(
+            f"{r['url']}: {r['error']}" for r in failed))
+    return results
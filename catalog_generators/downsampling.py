@@ -0,0 +1,184 @@
+"""Seeded down-sampling of posterior samples at read time.
+
+A Downsampler picks the rows of each posterior file to read (before any
+samples are loaded), so every later stage only sees the selected samples. The
+number of rows kept is set by one of:
+ - n_samples: at most this many rows
+ - fraction: this fraction of the rows
+ - ess: enough rows for this effective sample size. The ESS of a file is
+   estimated from the integrated autocorrelation time of a few pilot columns
+   (autocorrelation_ess; MCMC chains that are not fully thinned have an ESS
+   below their number of rows, so more rows are kept)
+
+and the rows are drawn with:
+ - "reservoir": a uniform sample without replacement (the distribution of a
+   reservoir sample; with the number of rows known up front it is drawn
+   directly)
+ - "stratified": one row drawn uniformly from each of n equal blocks of rows
+   (spreads the selection over the whole chain/file)
+
+The selection is seeded by (seed, file name), so it does not depend on the
+order or the worker the files are read in.
+
+The error introduced is bounded with the Dvoretzky-Kiefer-Wolfowitz
+inequality: with probability 1 - alpha, the empirical cdf of n selected rows
+is within epsilon = sqrt(ln(2 / alpha) / (2 n)) of the cdf of all rows, so
+each reported quantile q lies between the q - epsilon and q + epsilon
+quantiles of the full posterior (quantile_error_bound, and
+quantile_error_intervals for the bound in parameter units).
+
+Example usage:
+
+    downsampler = Downsampler(n_samples=5000, method="stratified", seed=1)
+    generator = get_catalog_generator("PyCBC")(data_dir, downsampler=downsampler)
+    generator.generate("data/pycbc_catalog.json")
+    generator.downsampling_report()
+
+"""
+import math
+import os
+import zlib
+from typing import Dict, List, Optional
+
+import numpy as np
+
+METHODS = ["reservoir", "stratified"]
+DEFAULT_ALPHA = 0.05
+
+
+def quantile_error_bound(n_samples: int, alpha: Optional[float] = DEFAULT_ALPHA) -> float:
+    """DKW bound on the cdf (so quantile level) error of n_samples samples
+    (holds with probability 1 - alpha)"""
+    if n_samples <= 0:
+        return 1.0
+    return min(1.0, math.sqrt(math.log(2 / alpha) / (2 * n_samples)))
+
+
+def integrated_autocorrelation_time(x: np.ndarray, window_factor: Optional[float] = 5.0) -> float:
+    """Integrated autocorrelation time of a chain (at least 1), with Sokal's
+    automatic window: the smallest M >= window_factor * tau(M)"""
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    if n < 2 or not np.ptp(x) > 0:
+        return 1.0
+    n_fft = 2 ** int(np.ceil(np.log2(2 * n)))
+    f = np.fft.rfft(x - x.mean(), n=n_fft)
+    acf = np.fft.irfft(f * np.conjugate(f), n=n_fft)[:n]
+    taus = 2 * np.cumsum(acf / acf[0]) - 1
+    window = np.arange(n) >= window_factor * taus
+    m = int(np.argmax(window)) if window.any() else n - 1
+    return max(1.0, float(taus[m]))
+
+
+def autocorrelation_ess(samples: np.ndarray) -> float:
+    """Effective sample size of a chain of (n_samples, n_params) samples (the
+    smallest of the columns)"""
+    samples = np.asarray(samples, dtype=float).reshape(len(samples), -1)
+    tau = max([integrated_autocorrelation_time(column) for column in samples.T] or [1.0])
+    return len(samples) / tau
+
+
+def quantile_error_intervals(
+        samples: np.ndarray,
+        epsilon: float,
+        quantiles: Optional[List[float]] = [0.16, 0.5, 0.84]
+) -> np.ndarray:
+    """Half widths (in parameter units) of the quantile errors allowed by
+    epsilon, estimated from the selected samples
+
+    :param samples: (n_samples, n_params) array
+    :return: (len(quantiles), n_params) array of
+        max(|Q(q + epsilon) - Q(q)|, |Q(q) - Q(q - epsilon)|)
+    """
+    samples = np.asarray(samples, dtype=float)
+    levels = np.array(quantiles)
+    lower, center, upper = (
+        np.quantile(samples, np.clip(levels + shift, 0, 1), axis=0)
+        for shift in [-epsilon, 0, epsilon]
+    )
+    return np.maximum(upper - center, center - lower)
+
+
+class Downsampler:
+
+    def __init__(
+            self,
+            n_samples: Optional[int] = None,
+            fraction: Optional[float] = None,
+            ess: Optional[float] = None,
+            method: Optional[str] = "reservoir",
+            seed: Optional[int] = 0,
+            alpha: Optional[float] = DEFAULT_ALPHA
+    ):
+        """
+        :param n_samples: keep at most n_samples rows
+        :param fraction: keep this fraction of the rows
+        :param ess: keep enough rows for this effective sample size (of the
+            ess_total given to target_size/select_rows)
+        :param method: one of METHODS
+        :param seed: seed of the row selection
+        :param alpha: the quantile error bounds hold with probability 1 - alpha
+        """
+        targets = [t for t in [n_samples, fraction, ess] if t is not None]
+        if len(targets) != 1:
+            raise ValueError("Give exactly one of n_samples, fraction and ess")
+        if fraction is not None and not 0 < fraction <= 1:
+            raise ValueError(f"fraction {fraction} not in (0, 1]")
+        if method not in METHODS:
+            raise ValueError(f"method {method} not in {METHODS}")
+        self.n_samples = n_samples
+        self.fraction = fraction
+        self.ess = ess
+        self.method = method
+        self.seed = seed
+        self.alpha = alpha
+
+    def settings(self) -> Dict:
+        """The configuration (cached summaries are only reused if it matches)"""
+        return dict(n_samples=self.n_samples, fraction=self.fraction, ess=self.ess,
+                    method=self.method, seed=self.seed)
+
+    def target_size(self, n_total: int, ess_total: Optional[float] = None) -> int:
+        """Number of rows to keep out of n_total
+
+        :param ess_total: effective sample size of the n_total rows (eg from
+            autocorrelation_ess; default: independent samples, n_total)
+        """
+        if self.n_samples is not None:
+            size = self.n_samples
+        elif self.fraction is not None:
+            size = math.ceil(self.fraction * n_total)
+        else:
+            # each row is worth ess / n_total of an independent sample
+            size = math.ceil(self.ess * n_total / (n_total if ess_total is None else ess_total))
+        return int(min(max(size, 1), n_total))
+
+    def rng(self, key: str) -> np.random.Generator:
+        return np.random.default_rng([self.seed, zlib.crc32(os.path.basename(key).encode())])
+
+    def select_rows(self, n_total: int, key: str,
+                    ess_total: Optional[float] = None) -> Optional[np.ndarray]:
+        """Sorted indices of the rows to read (None: all of them)
+
+        :param key: file name the selection is seeded by
+        :param ess_total: as for target_size
+        """
+        size = self.target_size(n_total, ess_total)
+        if size >= n_total:
+            return None
+        rng = self.rng(key)
+        if self.method == "reservoir":
+            return np.sort(rng.choice(n_total, size, replace=False))
+        edges = np.linspace(0, n_total, size + 1)
+        starts = np.ceil(edges[:-1]).astype(int)
+        stops = np.ceil(edges[1:]).astype(int)
+        return starts + (rng.random(size) * (stops - starts)).astype(int)
+
+    def report(self, n_total: int, ess_total: Optional[float] = None) -> Dict:
+        """dict(n_samples, n_selected, quantile_error) of a file with n_total rows
+        (quantile_error: DKW bound of the quantile level error, of the
+        effective number of selected samples, 0 if all rows are kept)"""
+        n_selected = self.target_size(n_total, ess_total)
+        n_effective = n_selected if ess_total is None else n_selected * ess_total / n_total
+        error = quantile_error_bound(n_effective, self.alpha) if n_selected < n_total else 0.0
+        return dict(n_samples=n_total, n_selected=n_selected, quantile_error=error)
@@ -0,0 +1,176 @@
+"""Cross-catalog index of events sorted by GPS time.
+
+Each event's GPS time comes from its summary (the median of the merger time
+samples) or, when the summary has none, from the UTC date/time in its name (see
+gps_time.gps_from_event_name). Events are then matched across catalogs by GPS
+coincidence rather than by naming conventions. A lookup is a binary search of
+the sorted GPS times (O(log n) plus the number of events in the window).
+
+Example usage:
+
+    index = EventIndex.from_catalog_files({
+        "IAS": "data/ias_catalog.json", "PyCBC": "data/pycbc_catalog.json",
+        "GWTC-1": "data/lvc_catalog.json",
+    })
+    index.query(1126259462.4, tolerance=1)
+    index.save_merged_catalog("data/merged_catalog.json")
+
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .gps_time import gps_from_event_name, gps_to_utc
+from .json_stream import iter_catalog_events
+from .lazy_import import lazy_import
+from .utils import dict_to_json
+
+pd = lazy_import("pandas")
+
+# summary GPS times below this (~1999) are offsets/placeholders, not GPS times
+MIN_GPS = 6e8
+DEFAULT_TOLERANCE = 1.0
+
+
+def get_event_gps(event_name: str, summary: Dict) -> Optional[Tuple[float, float]]:
+    """(GPS time, half width of its uncertainty) of an event, None if unknown"""
+    gps = summary.get('GPS')
+    if gps is not None and gps > MIN_GPS:
+        return float(gps), 0.0
+    return gps_from_event_name(summary.get('commonName') or event_name)
+
+
+class EventIndex:
+
+    def __init__(self, catalogs: Dict[str, Dict[str, Dict]]):
+        """
+        :param catalogs: {catalog: {event_name: summary}}
+        """
+        self.catalogs = catalogs
+        rows, self.unindexed = [], []
+        for catalog, summaries in catalogs.items():
+            for event_name, summary in summaries.items():
+                gps = get_event_gps(event_name, summary)
+                if gps is None:
+                    self.unindexed.append((catalog, event_name))
+                else:
+                    rows.append((*gps, catalog, event_name))
+        rows.sort(key=lambda row: row[0])
+        self.gps = np.array([row[0] for row in rows], dtype=float)
+        self.half_width = np.array([row[1] for row in rows], dtype=float)
+        self.catalog = [row[2] for row in rows]
+        self.event_name = [row[3] for row in rows]
+        self.max_half_width = self.half_width.max() if len(rows) else 0.0
+
+    @classmethod
+    def from_catalog_files(cls, catalog_fnames: Dict[str, str]):
+        """:param catalog_fnames: {catalog: catalog json (as written by generate)}"""
+        return cls({catalog: dict(iter_catalog_events(fname))
+                    for catalog, fname in catalog_fnames.items()})
+
+    def __len__(self):
+        return len(self.gps)
+
+    def _query_indices(self, gps: float, tolerance: float, half_width: float) -> List[int]:
+        reach = tolerance + half_width + self.max_half_width
+        lo = np.searchsorted(self.gps, gps - reach, side='left')
+        hi = np.searchsorted(self.gps, gps + reach, side='right')
+        return [
+            i for i in range(lo, hi)
+            if abs(self.gps[i] - gps) <= tolerance + half_width + self.half_width[i]
+        ]
+
+    def query(
+            self,
+            gps: float,
+            tolerance: Optional[float] = DEFAULT_TOLERANCE,
+            half_width: Optional[float] = 0.0
+    ) -> List[Tuple[str, str, float]]:
+        """Events coincident with gps
+
+        :param tolerance: max difference [s] between the GPS times (on top of
+            their uncertainties)
+        :param half_width: uncertainty [s] of gps
+        :return: list of (catalog, event_name, event GPS) sorted by GPS
+        """
+        return [(self.catalog[i], self.event_name[i], float(self.gps[i]))
+                for i in self._query_indices(gps, tolerance, half_width)]
+
+    def match_events(self, tolerance: Optional[float] = DEFAULT_TOLERANCE) -> List[Dict[str, int]]:
+        """Group coincident events, with at most one event per catalog per group.
+
+        Events with the most precise GPS times seed the groups, which then take
+        the closest coincident event of every other catalog.
+
+        :return: list of {catalog: index} (sorted by GPS)
+        """
+        group_of = np.full(len(self), -1)
+        groups = []
+        for i in np.lexsort((self.gps, self.half_width)):
+            if group_of[i] >= 0:
+                continue
+            group = {self.catalog[i]: i}
+            group_of[i] = len(groups)
+            candidates = sorted(
+                self._query_indices(self.gps[i], tolerance, self.half_width[i]),
+                key=lambda j: (self.half_width[j], abs(self.gps[j] - self.gps[i]))
+            )
+            for j in candidates:
+                if group_of[j] < 0 and self.catalog[j] not in group:
+                    group[self.catalog[j]] = j
+                    group_of[j] = len(groups)
+            groups.append(group)
+        return sorted(groups, key=lambda g: self.gps[self._seed(g)])
+
+    def _seed(self, group: Dict[str, int]) -> int:
+        """The event of a group with the most precise GPS time"""
+        return min(group.values(), key=lambda i: self.half_width[i])
+
+    def get_merged_name(self, group: Dict[str, int]) -> str:
+        """GWYYMMDD_hhmmss of the group's GPS time (GWYYMMDD if only the date
+        is known)"""
+        seed = self._seed(group)
+        utc = gps_to_utc(self.gps[seed])
+        if self.half_width[seed] >= 3600:
+            return f"GW{utc:%y%m%d}"
+        return f"GW{utc:%y%m%d_%H%M%S}"
+
+    def merged_catalog(self, tolerance: Optional[float] = DEFAULT_TOLERANCE) -> Dict[str, Dict]:
+        """{merged name: dict(GPS, GPS_uncertainty, events={catalog: event_name},
+        summaries={catalog: summary})} of every matched group"""
+        merged = {}
+        for group in self.match_events(tolerance):
+            seed = self._seed(group)
+            events = {self.catalog[i]: self.event_name[i] for i in group.values()}
+            name = self.get_merged_name(group)
+            if name in merged:
+                # two date-only groups on the same day
+                name = f"{name}_{sum(n.startswith(name) for n in merged)}"
+            merged[name] = dict(
+                GPS=float(self.gps[seed]),
+                GPS_uncertainty=float(self.half_width[seed]),
+                events=events,
+                summaries={c: self.catalogs[c][e] for c, e in events.items()},
+            )
+        return merged
+
+    def save_merged_catalog(self, json_fname: str,
+                            tolerance: Optional[float] = DEFAULT_TOLERANCE):
+        dict_to_json(json_fname=json_fname,
+                     data_dict=dict(events=self.merged_catalog(tolerance)))
+
+    def to_dataframe(self, parameters: Optional[List[str]] = None,
+                     tolerance: Optional[float] = DEFAULT_TOLERANCE):
+        """Merged table with a row per matched group: the GPS time, the event
+        name in each catalog and the "<catalog>:<parameter>" summary values"""
+        rows = {}
+        for name, entry in self.merged_catalog(tolerance).items():
+            row = dict(GPS=entry['GPS'])
+            for catalog, event_name in entry['events'].items():
+                row[catalog] = event_name
+                for parameter in parameters or []:
+                    row[f"{catalog}:{parameter}"] = entry['summaries'][catalog].get(parameter)
+            rows[name] = row
+        columns = ["GPS", *self.catalogs.keys()]
+        columns += [f"{c}:{p}" for c in self.catalogs for p in parameters or []]
+        return pd.DataFrame.from_dict(rows, orient='index').reindex(columns=columns)
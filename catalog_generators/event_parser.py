@@ -1,20 +1,30 @@
+from __future__ import annotations
+
 import abc
 from typing import Dict, List
 
-import pandas as pd
-from bilby.gw.conversion import luminosity_distance_to_redshift
-
 from . import utils
+from .compact_samples import compact_dataframe
+from .cosmology import luminosity_distance_to_redshift
 from .event_keys import GWOSC_KEYS
+from .lazy_import import lazy_import
+
+pd = lazy_import("pandas")
 
 
 class EventParser:
 
-    def __init__(self, datasource, catalog, samples):
+    def __init__(self, datasource, catalog, samples, compact=False):
+        """
+        :param compact: hold the standardised samples in compact form (float32,
+            constant columns not stored, see compact_samples)
+        """
         self.name = utils.get_event_name(datasource)
         self.datasource = datasource
         self.catalog = catalog
         self.samples = self.standardise_samples(samples)
+        if compact:
+            self.samples = compact_dataframe(self.samples)
 
     @staticmethod
     @abc.abstractmethod
@@ -33,15 +43,13 @@ class EventParser:
         return samples
 
     def summarise_event(self) -> Dict:
-        summary = {}
-        for param in self.samples.columns:
-            summary[f"{param}_lower"], summary[f"{param}_upper"], summary[param] = \
-                utils.summarise_samples(self.samples[param])
-
-        for param_type in ["_lower", "_upper", ""]:
-            summary[f'redshift{param_type}'] = \
-                float(luminosity_distance_to_redshift(
-                    summary[f'luminosity_distance{param_type}']))
+        summary = utils.summarise_dataframe(self.samples)
+
+        param_types = ["_lower", "_upper", ""]
+        redshifts = luminosity_distance_to_redshift(
+            [summary[f'luminosity_distance{t}'] for t in param_types])
+        for param_type, redshift in zip(param_types, redshifts):
+            summary[f'redshift{param_type}'] = float(redshift)
             for key in ['mass_1', 'mass_2', 'chirp_mass', 'total_mass']:
                 summary[f'{key}_source{param_type}'] = \
                     summary[f"{key}{param_type}"] / (
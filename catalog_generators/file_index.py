@@ -0,0 +1,155 @@
+"""Sidecar index of the posterior files of every catalog.
+
+Scanning the data dirs once records, for each posterior file, its catalog,
+event name, GPS time (and its uncertainty, from the event name), format,
+dataset, number of samples, parameters and their dtypes, and its size/mtime
+fingerprint, in a single compact json. "What do we have" (and how big is
+it) is then answered without globbing the data dirs or opening any posterior
+file. Rescans only open the files that are new or changed since the last scan.
+
+Example usage:
+
+    index = FileIndex.load("data/file_index.json")
+    index.scan({"IAS": "data/ias_search", "GWTC-1": "data/lvc_search/gwtc1"})
+    index.save()
+    index.summary()  # {catalog: dict(n_files, n_samples, size)}
+    index.to_dataframe()
+
+"""
+from __future__ import annotations
+
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from . import profiling
+from .atomic_file import atomic_write
+from .catalog_generator import get_catalog_generator
+from .gps_time import gps_from_event_name
+from .lazy_import import lazy_import
+from .manifest import file_fingerprint
+from .parallel import parallel_map
+
+pd = lazy_import("pandas")
+
+INDEX_VERSION = 1
+DEFAULT_INDEX_FNAME = "file_index.json"
+
+
+def describe_file(job: Tuple[str, str]) -> Dict:
+    """Index entry of a (catalog, file), with the error instead of the sample
+    description if the file cannot be read"""
+    catalog, file = job
+    generator = get_catalog_generator(catalog)
+    event_name = generator.get_event_name(file)
+    gps, gps_uncertainty = gps_from_event_name(event_name) or (None, None)
+    entry = dict(catalog=catalog, event_name=event_name, gps=gps,
+                 gps_uncertainty=gps_uncertainty, **file_fingerprint(file, with_hash=False))
+    try:
+        entry.update(generator.describe_event_file(file))
+    except Exception as e:
+        entry['error'] = f"{type(e).__name__}: {e}"
+    profiling.count("files_described")
+    return entry
+
+
+class FileIndex:
+
+    def __init__(self, fname: str, entries: Optional[Dict[str, Dict]] = None):
+        """
+        :param entries: {absolute path: entry}
+        """
+        self.fname = fname
+        self.entries = entries if entries is not None else {}
+
+    @classmethod
+    def load(cls, fname: str):
+        """The index saved in fname (empty if there is none or it was written
+        by another version)"""
+        if not os.path.isfile(fname):
+            return cls(fname)
+        with open(fname, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != INDEX_VERSION:
+            return cls(fname)
+        return cls(fname, data['files'])
+
+    def is_current(self, path: str) -> bool:
+        entry = self.entries.get(path)
+        if entry is None:
+            return False
+        try:
+            fingerprint = file_fingerprint(path, with_hash=False)
+        except OSError:
+            return False
+        return fingerprint['size'] == entry['size'] and fingerprint['mtime'] == entry['mtime']
+
+    def scan(
+            self,
+            data_dirs: Dict[str, str],
+            n_workers: Optional[int] = 1,
+            executor: Optional[str] = "thread"
+    ) -> List[str]:
+        """Index the posterior files of the catalogs (the entries of files that
+        are gone are dropped)
+
+        :param data_dirs: {catalog: data dir}
+        :return: the files that were (re)described
+        """
+        files = {}
+        for catalog, data_dir in data_dirs.items():
+            for file in get_catalog_generator(catalog)(data_dir).get_event_files():
+                files[os.path.abspath(file)] = catalog
+        self.entries = {
+            path: entry for path, entry in self.entries.items()
+            if entry['catalog'] not in data_dirs or path in files
+        }
+        stale = [path for path in files if not self.is_current(path)]
+        if not stale:
+            return stale
+        entries = parallel_map(describe_file, [(files[p], p) for p in stale],
+                               n_workers=n_workers, executor=executor,
+                               desc="Scanning posterior files")
+        self.entries.update(zip(stale, entries))
+        return stale
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.fname)), exist_ok=True)
+        with atomic_write(self.fname) as f:
+            json.dump(dict(version=INDEX_VERSION, files=self.entries), f,
+                      separators=(",", ":"), sort_keys=True)
+
+    def files(self, catalog: Optional[str] = None) -> List[Tuple[str, Dict]]:
+        """(path, entry) of the indexed files (of one catalog), sorted by path"""
+        return sorted((path, entry) for path, entry in self.entries.items()
+                      if catalog is None or entry['catalog'] == catalog)
+
+    def get_current_entry(self, path: str) -> Optional[Dict]:
+        """Entry of a readable file unchanged since it was indexed (None
+        otherwise)"""
+        path = os.path.abspath(path)
+        entry = self.entries.get(path)
+        if entry is None or 'error' in entry or not self.is_current(path):
+            return None
+        return entry
+
+    def summary(self) -> Dict[str, Dict]:
+        """{catalog: dict(n_files, n_samples, size, n_errors)}"""
+        summary = {}
+        for entry in self.entries.values():
+            totals = summary.setdefault(
+                entry['catalog'], dict(n_files=0, n_samples=0, size=0, n_errors=0))
+            totals['n_files'] += 1
+            totals['n_samples'] += entry.get('n_samples', 0)
+            totals['size'] += entry['size']
+            totals['n_errors'] += 'error' in entry
+        return summary
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """Table with a row per file (the parameters as a list)"""
+        rows = []
+        for path, entry in self.files():
+            row = dict(path=path, **entry)
+            row['parameters'] = list(row.pop('columns', {}))
+            rows.append(row)
+        return pd.DataFrame(rows)
@@ -0,0 +1,79 @@
+"""GPS <-> UTC conversions and GPS times estimated from event names.
+
+Example usage:
+
+    utc_to_gps(datetime.datetime(2015, 9, 14, 9, 50, 45))  # 1126259462.0
+    gps_from_event_name("GW190521_074359")  # (1242459857.5, 0.5)
+
+"""
+import bisect
+import datetime
+import re
+from typing import Optional, Tuple
+
+GPS_EPOCH = datetime.datetime(1980, 1, 6)
+SECONDS_PER_DAY = 24 * 3600
+
+# (UTC datetime from which it applies, GPS - UTC offset in s)
+LEAP_SECONDS = [
+    (datetime.datetime(1981, 7, 1), 1),
+    (datetime.datetime(1982, 7, 1), 2),
+    (datetime.datetime(1983, 7, 1), 3),
+    (datetime.datetime(1985, 7, 1), 4),
+    (datetime.datetime(1988, 1, 1), 5),
+    (datetime.datetime(1990, 1, 1), 6),
+    (datetime.datetime(1991, 1, 1), 7),
+    (datetime.datetime(1992, 7, 1), 8),
+    (datetime.datetime(1993, 7, 1), 9),
+    (datetime.datetime(1994, 7, 1), 10),
+    (datetime.datetime(1996, 1, 1), 11),
+    (datetime.datetime(1997, 7, 1), 12),
+    (datetime.datetime(1999, 1, 1), 13),
+    (datetime.datetime(2006, 1, 1), 14),
+    (datetime.datetime(2009, 1, 1), 15),
+    (datetime.datetime(2012, 7, 1), 16),
+    (datetime.datetime(2015, 7, 1), 17),
+    (datetime.datetime(2017, 1, 1), 18),
+]
+
+# event names with a time of day, eg GW190521_074359 (GWTC-2) or
+# GW150914_09H_50M_45UTC (PyCBC), and with only a date, eg GW150914
+_NAME_WITH_TIME = re.compile(r"GW(\d{6})_(\d{2})H?_?(\d{2})M?_?(\d{2})(?:UTC)?")
+_NAME_WITH_DATE = re.compile(r"GW(\d{6})")
+
+
+def _leap_seconds(utc: datetime.datetime) -> int:
+    i = bisect.bisect_right([start for start, _ in LEAP_SECONDS], utc)
+    return LEAP_SECONDS[i - 1][1] if i else 0
+
+
+def utc_to_gps(utc: datetime.datetime) -> float:
+    """GPS time of a (naive) UTC datetime"""
+    return (utc - GPS_EPOCH).total_seconds() + _leap_seconds(utc)
+
+
+def gps_to_utc(gps: float) -> datetime.datetime:
+    """UTC datetime of a GPS time"""
+    utc = GPS_EPOCH + datetime.timedelta(seconds=gps)
+    # the offset at utc - offset (the offset can only grow by 1 s)
+    return utc - datetime.timedelta(seconds=_leap_seconds(utc - datetime.timedelta(
+        seconds=_leap_seconds(utc))))
+
+
+def gps_from_event_name(event_name: str) -> Optional[Tuple[float, float]]:
+    """GPS time estimated from the UTC date (and time) in an event name
+
+    :return: (center, half width) of the GPS interval the event is in (names
+        with a time are accurate to a second, names with only a date to a day),
+        or None if the name has no date
+    """
+    match = _NAME_WITH_TIME.search(event_name)
+    if match:
+        date, hour, minute, second = match.groups()
+        utc = datetime.datetime.strptime(f"{date}{hour}{minute}{second}", "%y%m%d%H%M%S")
+        return utc_to_gps(utc) + 0.5, 0.5
+    match = _NAME_WITH_DATE.search(event_name)
+    if match:
+        utc = datetime.datetime.strptime(match.group(1), "%y%m%d")
+        return utc_to_gps(utc) + SECONDS_PER_DAY / 2, SECONDS_PER_DAY / 2
+    return None
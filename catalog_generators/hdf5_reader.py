@@ -0,0 +1,216 @@
+"""Read only the requested columns (and rows) of a posterior HDF5 file.
+
+Handles the layouts used by the catalogs:
+ - a group with one dataset per parameter (PyCBC "samples/<param>",
+   bilby "posterior/<param>")
+ - a single compound dataset with one field per parameter
+   (LVC "Overall_posterior", pesummary "<label>/posterior_samples")
+ - a group with a 2D "samples" dataset and its "parameter_names"
+   (older pesummary "<label>/posterior_samples")
+
+Files can also be read straight out of zip archives (see zip_reader), eg
+fname="pesummary_samples.zip::GW150914.h5".
+
+Each read opens (and closes) the file, unless it is done in a keep_open block
+of the file, where all the reads share one open file (eg the blocks of a
+chunked read).
+
+Example usage:
+
+    columns = read_hdf5_columns(
+        "GW150914_GWTC-1.hdf5", "Overall_posterior",
+        columns=["m1_detector_frame_Msun", "luminosity_distance_Mpc"],
+        rows=slice(None, None, 10)  # thin by 10
+    )
+
+    with keep_open(fname):  # opened once for all the blocks
+        for start in range(0, n_rows, 1000):
+            block = read_hdf5_columns(fname, path, columns, slice(start, start + 1000))
+
+"""
+from __future__ import annotations
+
+import contextlib
+import threading
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from . import profiling
+from .lazy_import import lazy_import
+from .zip_reader import is_zip_member, open_zip_member
+
+h5py = lazy_import("h5py")
+
+RowSelection = Optional[Union[slice, np.ndarray, List[int]]]
+
+# rows of an index selection read at a time (see _split_rows)
+READ_BLOCK_ROWS = 2 ** 16
+
+# {fname: h5py.File} of the keep_open blocks of each thread
+_open_files = threading.local()
+
+
+def read_hdf5_columns(
+        fname,
+        path: str,
+        columns: List[str],
+        rows: RowSelection = None
+) -> Dict[str, np.ndarray]:
+    """Read columns from the group/compound dataset at path.
+
+    Only the selected datasets/fields and rows are read, and the file is closed
+    before returning.
+
+    :param fname: filename, zip member ("<archive>.zip::<member>") or file-like object
+    :param path: path of the group or compound dataset
+    :param columns: parameter names to read
+    :param rows: slice (steps can be used to thin) or strictly increasing indices
+    :return: dict of {column: 1D array}
+    """
+    with profiling.timer("hdf5_read"), open_hdf5(fname) as h5file:
+        return read_columns(h5file[path], columns, rows)
+
+
+def get_hdf5_n_rows(fname, path: str) -> int:
+    """Number of samples at path (without reading any samples)"""
+    with open_hdf5(fname) as h5file:
+        return count_rows(h5file[path])
+
+
+def get_hdf5_columns(fname, path: str) -> List[str]:
+    """Parameter names available at path (without reading any samples)"""
+    with open_hdf5(fname) as h5file:
+        return list_columns(h5file[path])
+
+
+def describe_hdf5(fname, path: str) -> Dict:
+    """dict(format, dataset, n_samples, columns={name: dtype}) of the samples
+    at path (without reading any samples)"""
+    with open_hdf5(fname) as h5file:
+        return describe_samples(h5file[path])
+
+
+@contextlib.contextmanager
+def open_hdf5(fname):
+    """Open a filename, zip member ("<archive>.zip::<member>") or file-like
+    object as a read-only h5py.File (the one of its keep_open block if any)"""
+    files = _get_open_files()
+    if isinstance(fname, str) and fname in files:
+        yield files[fname]
+    elif isinstance(fname, str) and is_zip_member(fname):
+        with open_zip_member(fname) as fileobj, h5py.File(fileobj, mode='r') as h5file:
+            yield h5file
+    else:
+        with h5py.File(fname, mode='r') as h5file:
+            yield h5file
+
+
+@contextlib.contextmanager
+def keep_open(fname: str):
+    """Open fname once for all its reads (by open_hdf5) in the block of this
+    thread, and close it at the end of the block.
+    """
+    files = _get_open_files()
+    if fname in files:
+        yield files[fname]
+        return
+    with contextlib.ExitStack() as stack:
+        if is_zip_member(fname):
+            fname_or_obj = stack.enter_context(open_zip_member(fname))
+        else:
+            fname_or_obj = fname
+        files[fname] = stack.enter_context(h5py.File(fname_or_obj, mode='r'))
+        try:
+            yield files[fname]
+        finally:
+            del files[fname]
+
+
+def _get_open_files() -> Dict:
+    if not hasattr(_open_files, "files"):
+        _open_files.files = {}
+    return _open_files.files
+
+
+def read_columns(obj, columns: List[str], rows: RowSelection = None) -> Dict[str, np.ndarray]:
+    """read_hdf5_columns for an open h5py group/dataset"""
+    if rows is None or isinstance(rows, slice) or not len(rows):
+        return _read_slice(obj, columns, slice(None) if rows is None else rows)
+    blocks = [
+        {c: values[take] for c, values in _read_slice(obj, columns, read).items()}
+        for read, take in _split_rows(rows)
+    ]
+    return {c: np.concatenate([block[c] for block in blocks]) for c in columns}
+
+
+def _read_slice(obj, columns: List[str], rows) -> Dict[str, np.ndarray]:
+    if isinstance(obj, h5py.Dataset):
+        # one read, so the compound chunks are only decompressed once
+        data = obj.fields(list(columns))[rows]
+        return {c: np.ascontiguousarray(data[c]) for c in columns}
+    if _is_2d_samples_group(obj):
+        names = _decode(obj["parameter_names"][()])
+        samples = obj["samples"][rows]
+        return {c: np.ascontiguousarray(samples[:, names.index(c)]) for c in columns}
+    return {c: obj[c][rows] for c in columns}
+
+
+def _split_rows(rows) -> List[Tuple[slice, np.ndarray]]:
+    """[(slice to read, selection of the read rows)] of strictly increasing
+    row indices
+
+    h5py point selections of many indices are slower than reading the
+    (decompressed anyway) chunks they span, so the indices are read in blocks
+    of READ_BLOCK_ROWS rows: each block with selected rows is read as the slice
+    from its first to its last index and then indexed in memory.
+    """
+    rows = np.asarray(rows)
+    if rows.ndim != 1 or not np.issubdtype(rows.dtype, np.integer):
+        raise ValueError(f"Row indices must be a 1D integer array, not {rows.dtype} {rows.shape}")
+    if rows[0] < 0 or np.any(np.diff(rows) <= 0):
+        raise ValueError("Row indices must be non-negative and strictly increasing")
+    splits = []
+    for block in np.split(rows, np.flatnonzero(np.diff(rows // READ_BLOCK_ROWS)) + 1):
+        start = int(block[0])
+        splits.append((slice(start, int(block[-1]) + 1), block - start))
+    return splits
+
+
+def count_rows(obj) -> int:
+    """get_hdf5_n_rows for an open h5py group/dataset"""
+    if isinstance(obj, h5py.Dataset):
+        return len(obj)
+    if _is_2d_samples_group(obj):
+        return len(obj["samples"])
+    return len(obj[next(iter(obj.keys()))])
+
+
+def list_columns(obj) -> List[str]:
+    """get_hdf5_columns for an open h5py group/dataset"""
+    if isinstance(obj, h5py.Dataset):
+        return list(obj.dtype.names)
+    if _is_2d_samples_group(obj):
+        return _decode(obj["parameter_names"][()])
+    return list(obj.keys())
+
+
+def describe_samples(obj) -> Dict:
+    """describe_hdf5 for an open h5py group/dataset"""
+    if isinstance(obj, h5py.Dataset):
+        dtypes = {name: obj.dtype.fields[name][0] for name in obj.dtype.names}
+    elif _is_2d_samples_group(obj):
+        dtype = obj["samples"].dtype
+        dtypes = {name: dtype for name in _decode(obj["parameter_names"][()])}
+    else:
+        dtypes = {name: obj[name].dtype for name in obj.keys()}
+    return dict(format="hdf5", dataset=obj.name, n_samples=count_rows(obj),
+                columns={name: dtype.str for name, dtype in dtypes.items()})
+
+
+def _is_2d_samples_group(group) -> bool:
+    return "parameter_names" in group and "samples" in group
+
+
+def _decode(names) -> List[str]:
+    return [n.decode() if isinstance(n, bytes) else str(n) for n in names]
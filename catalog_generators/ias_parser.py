@@ -1,20 +1,18 @@
-import glob
+from __future__ import annotations
+
+import contextlib
 import os
 
 import numpy as np
-import pandas as pd
-from bilby.gw.conversion import (
-    chirp_mass_and_mass_ratio_to_total_mass,
-    luminosity_distance_to_redshift,
-    total_mass_and_mass_ratio_to_component_masses,
-    symmetric_mass_ratio_to_mass_ratio
-)
-from tqdm import tqdm
-
-from .event_keys import GWOSC_KEYS
-from .utils import dict_to_json, summarise_samples
+
+from . import gwosc_conversion as conversion
+from .catalog_generator import CatalogGenerator, register_catalog
+from .lazy_import import lazy_import
+
+pd = lazy_import("pandas")
 
 DATA_DIR = "../data/ias_search/"
+PARSER_VERSION = 1
 
 # Parameters from IAS Github repo https://github.com/jroulet/O2_samples/
 SEARCH_PARAMS = {
@@ -31,6 +29,21 @@ SEARCH_PARAMS = {
     "DL": "luminosity distance",
 }
 
+# Parameters needed by convert_df_to_gwosc_df and the catalog summary
+SUMMARY_PARAMS = ["mchirp", "eta", "s1z", "s2z", "RA", "DEC", "tc", "DL"]
+
+# {GWOSC name: IAS name}
+ALIASES = {
+    "GPS": "tc",
+    "chirp_mass": "mchirp",
+    "symmetric_mass_ratio": "eta",
+    "luminosity_distance": "DL",
+    "ra": "RA",
+    "dec": "DEC",
+}
+DERIVED_PARAMS = ["mass_ratio", "total_mass", "mass_1", "mass_2", "chi_eff"]
+DERIVED_INPUTS = ["symmetric_mass_ratio", "chirp_mass", "s1z", "s2z"]
+
 GPS_TIME = {
     'GW151216': 1134293073.164,
     'GW170121': 1169069154.565,
@@ -58,98 +71,107 @@ def main():
                          out_catalog_fname="../data/ias_catalog.json")
 
 
-def generate_ias_catalog(data_dir, out_catalog_fname):
-    event_samples = load_event_samples_to_dataframes(data_dir)
-    event_samples = make_events_gwosc_compatible(event_samples)
-    event_summary = summarise_all_events(event_samples)
-    dict_to_json(
-        json_fname=out_catalog_fname,
-        data_dict=dict(events=event_summary)
-    )
+def generate_ias_catalog(data_dir, out_catalog_fname, n_workers=1, incremental=True):
+    IasCatalog(data_dir, n_workers).generate(out_catalog_fname, incremental)
     print("Completed catalog generation.")
 
 
-def summarise_all_events(events_samples_dict):
-    summary_dict = {}
-    for event_name, event_df in events_samples_dict.items():
-        event_summary_dict = summarise_event_df(event_df)
-        event_summary_dict['commonName'] = event_name
-        event_summary_dict['GPS'] = GPS_TIME[event_name]
-        summary_dict[event_name] = event_summary_dict
-    return summary_dict
+def load_event_samples_to_dataframes(data_dir, n_workers=1, files=None,
+                                     parameters=None, rows=None):
+    """Load IAS npy files into dict of df (sorted by filename)"""
+    return IasCatalog(data_dir, n_workers).load_catalog_event_samples(
+        files, parameters, rows)
+
 
+def make_events_gwosc_compatible(events_df_container):
+    return IasCatalog().make_events_gwosc_compatible(events_df_container)
 
-def load_event_samples_to_dataframes(data_dir):
-    """Load IAS npy files into dict of df"""
-    events_samples_dict = {}
-    files = glob.glob(os.path.join(data_dir, "*.npy"))
-    for file in tqdm(files, desc="Reading IAS Posteriors", total=len(files)):
-        event_name = os.path.basename(file).replace(".npy", "")
-        event_df = pd.DataFrame(dict(zip(
-            list(SEARCH_PARAMS.keys()),
-            np.load(file).T
-        )))
-        events_samples_dict[event_name] = event_df
-    return events_samples_dict
 
+def get_event_name(file):
+    return os.path.basename(file).replace(".npy", "")
 
-def make_events_gwosc_compatible(events_df_container):
-    for event_name in events_df_container.keys():
-        events_df_container[event_name] = convert_df_to_gwosc_df(
-            events_df_container[event_name])
-    return events_df_container
+
+def read_event_file(file, parameters=None, rows=None):
+    """Load one IAS npy file (memory-mapped, only parameters/rows are copied)
+    :return: event name, df of samples
+    """
+    event_name = get_event_name(file)
+    parameters = list(SEARCH_PARAMS.keys()) if parameters is None else parameters
+    columns = [list(SEARCH_PARAMS.keys()).index(p) for p in parameters]
+    samples = np.load(file, mmap_mode='r')
+    samples = samples[slice(None) if rows is None else rows]
+    event_df = pd.DataFrame(dict(zip(
+        parameters,
+        np.array(samples[:, columns].T)
+    )))
+    return event_name, event_df
+
+
+def count_event_samples(file):
+    return len(np.load(file, mmap_mode='r'))
+
+
+def describe_event_file(file):
+    samples = np.load(file, mmap_mode='r')
+    return dict(format="npy", dataset=None, n_samples=len(samples),
+                columns={p: samples.dtype.str for p in list(SEARCH_PARAMS.keys())[:samples.shape[1]]})
 
 
 def convert_df_to_gwosc_df(df: pd.DataFrame) -> pd.DataFrame:
-    converted_df = df.copy()
-    # rename
-    converted_df['GPS'] = converted_df['tc']
-    converted_df['chirp_mass'] = converted_df['mchirp']
-    converted_df['symmetric_mass_ratio'] = converted_df['eta']
-    converted_df['luminosity_distance'] = converted_df['DL']
-    converted_df['ra'] = converted_df['RA']
-    converted_df['dec'] = converted_df['DEC']
+    """Add the GWOSC parameters (without copying the samples, see gwosc_conversion)"""
+    columns = conversion.get_columns(df, ALIASES)
+    derived = conversion.derive_columns(
+        "ias", DERIVED_PARAMS, columns, DERIVED_INPUTS, derive_gwosc_columns)
+    return conversion.to_dataframe({**columns, **derived})
+
+
+def derive_gwosc_columns(columns, derived):
     # re-parameterisation
-    converted_df['mass_ratio']= \
-        symmetric_mass_ratio_to_mass_ratio(converted_df['symmetric_mass_ratio'])
-
-    converted_df['total_mass'] = \
-        chirp_mass_and_mass_ratio_to_total_mass(
-            converted_df['chirp_mass'],
-            converted_df['mass_ratio']
-        )
-    converted_df['mass_1'], converted_df['mass_2'] = \
-        total_mass_and_mass_ratio_to_component_masses(
-            converted_df['mass_ratio'],
-            converted_df['total_mass']
-        )
-    converted_df['chi_eff'] = (converted_df['s1z'] +
-                               converted_df['s2z'] *
-                               converted_df['mass_ratio']) / \
-                              (1 + converted_df['mass_ratio'])
-
-    return converted_df
-
-
-def summarise_event_df(event_df):
-    summary = {}
-    for param in event_df.columns:
-        summary[f"{param}_lower"], summary[f"{param}_upper"], summary[param] = \
-            summarise_samples(event_df[param])
-
-    for param_type in ["_lower", "_upper", ""]:
-        summary[f'redshift{param_type}'] = \
-            float(luminosity_distance_to_redshift(
-                summary[f'luminosity_distance{param_type}']))
-        for key in ['mass_1', 'mass_2', 'chirp_mass', 'total_mass']:
-            summary[f'{key}_source{param_type}'] = \
-                summary[f"{key}{param_type}"] / (1 + summary[f'redshift{param_type}'])
-
-    summary = {k: summary.get(k, None) for k in GWOSC_KEYS}
-    summary['version'] = 1
-    summary['reference'] = "https://github.com/jroulet/O2_samples/"
-    summary['catalog.shortName'] = "IAS"
-    return summary
+    conversion.symmetric_mass_ratio_to_mass_ratio(
+        columns['symmetric_mass_ratio'], out=derived['mass_ratio'])
+    conversion.chirp_mass_and_mass_ratio_to_total_mass(
+        columns['chirp_mass'], derived['mass_ratio'], out=derived['total_mass'])
+    conversion.total_mass_and_mass_ratio_to_component_masses(
+        derived['mass_ratio'], derived['total_mass'],
+        out_1=derived['mass_1'], out_2=derived['mass_2'])
+    conversion.aligned_spins_to_chi_eff(
+        columns['s1z'], columns['s2z'], derived['mass_ratio'], out=derived['chi_eff'])
+
+
+@register_catalog
+class IasCatalog(CatalogGenerator):
+    name = "IAS"
+    short_name = "IAS"
+    reference = "https://github.com/jroulet/O2_samples/"
+    default_data_dir = DATA_DIR
+    data_subdir = "ias_search"
+    file_pattern = "*.npy"
+    # np.load releases the GIL
+    executor = "thread"
+    parser_version = PARSER_VERSION
+    search_params = SEARCH_PARAMS
+    summary_params = SUMMARY_PARAMS
+    ess_params = ["mchirp", "DL"]
+
+    get_event_name = staticmethod(get_event_name)
+    read_event_file = staticmethod(read_event_file)
+    count_event_samples = staticmethod(count_event_samples)
+    describe_event_file = staticmethod(describe_event_file)
+    # the npy files are memory-mapped, so the blocks of a chunked read only map
+    # the file again (without reading it)
+    open_event_file = staticmethod(contextlib.nullcontext)
+    convert_samples = staticmethod(convert_df_to_gwosc_df)
+
+    def to_gwosc_summary(self, event_name, summary):
+        summary = super().to_gwosc_summary(event_name, summary)
+        # the IAS samples only have the time relative to the trigger
+        summary['GPS'] = GPS_TIME.get(event_name)
+        return summary
+
+    def bootstrap_standard_errors(self, event_name, samples):
+        errors = super().bootstrap_standard_errors(event_name, samples)
+        errors['GPS'] = None
+        return errors
 
 
 if __name__ == "__main__":
@@ -0,0 +1,240 @@
+"""Stream catalog events to and from json without holding the whole document.
+
+Writer modes:
+ - "pretty": byte-identical to json.dump(dict(events=...), indent=2,
+   sort_keys=True) (ie utils.dict_to_json). The events are sorted by name, so
+   each finished event is encoded straight away and spooled to a temporary
+   file, and the document is assembled in sorted order on close (only the
+   spool offsets are kept in memory).
+ - "compact": {"events": {...}} without whitespace, in the order written.
+ - "ndjson": one {"event_name": ..., "summary": {...}} line per event.
+
+The readers parse one event at a time with json.JSONDecoder.raw_decode, so
+memory is bounded by the largest event rather than the catalog. They tell
+ndjson catalogs from json documents by their first key, whatever the file
+extension.
+
+Example usage:
+
+    with CatalogWriter("catalog.json") as writer:
+        for event_name, summary in summaries:
+            writer.write_event(event_name, summary)
+
+    for event_name, summary in iter_catalog_events("catalog.json"):
+        ...
+    df = read_catalog_dataframe("catalog.json", columns=["GPS", "mass_1_source"])
+
+"""
+import json
+import os
+import re
+import tempfile
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .atomic_file import AtomicFile
+from .lazy_import import lazy_import
+
+pd = lazy_import("pandas")
+
+MODES = ["pretty", "compact", "ndjson"]
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl")
+READ_CHUNK_SIZE = 2 ** 16
+
+_EVENT_INDENT = "\n    "
+# start of an ndjson line (the keys are sorted, the documents start with "events")
+_NDJSON_START = re.compile(r'\s*\{\s*"event_name"\s*:')
+
+
+def get_catalog_mode(fname: str) -> str:
+    """"ndjson" for .ndjson/.jsonl files, else "pretty\""""
+    return "ndjson" if fname.endswith(NDJSON_EXTENSIONS) else "pretty"
+
+
+class CatalogWriter:
+
+    def __init__(self, fname: str, mode: Optional[str] = None):
+        """
+        :param mode: one of MODES (default: get_catalog_mode(fname))
+        """
+        self.fname = fname
+        self.mode = get_catalog_mode(fname) if mode is None else mode
+        if self.mode not in MODES:
+            raise ValueError(f"mode {self.mode} not in {MODES}")
+        self.n_events = 0
+        # written to a temporary file that replaces fname once complete
+        self._output = AtomicFile(fname)
+        self._file = self._output.file
+        if self.mode == "pretty":
+            self._spool = tempfile.TemporaryFile(dir=os.path.dirname(fname) or None)
+            # {event_name: (offset, length)} of the encoded events in the spool
+            self._spooled = {}
+        elif self.mode == "compact":
+            self._file.write('{"events":{')
+
+    def write_event(self, event_name: str, summary: Dict):
+        if self.mode == "pretty":
+            encoded = json.dumps(summary, indent=2, sort_keys=True)
+            encoded = encoded.replace("\n", _EVENT_INDENT).encode()
+            self._spooled[event_name] = (self._spool.tell(), len(encoded))
+            self._spool.write(encoded)
+        elif self.mode == "compact":
+            separator = "," if self.n_events else ""
+            encoded = json.dumps(summary, sort_keys=True, separators=(",", ":"))
+            self._file.write(f"{separator}{json.dumps(event_name)}:{encoded}")
+        else:
+            self._file.write(json.dumps(
+                dict(event_name=event_name, summary=summary), sort_keys=True) + "\n")
+        self.n_events += 1
+
+    def close(self):
+        if self._file.closed:
+            return
+        if self.mode == "pretty":
+            self._write_sorted_spool()
+        elif self.mode == "compact":
+            self._file.write("}}")
+        self._output.commit()
+
+    def abort(self):
+        """Discard the events written so far (fname is left untouched)"""
+        if self._file.closed:
+            return
+        if self.mode == "pretty":
+            self._spool.close()
+        self._output.discard()
+
+    def _write_sorted_spool(self):
+        self._spool.flush()
+        if not self._spooled:
+            self._file.write('{\n  "events": {}\n}')
+        else:
+            self._file.write('{\n  "events": {')
+            for i, event_name in enumerate(sorted(self._spooled)):
+                offset, length = self._spooled[event_name]
+                self._spool.seek(offset)
+                separator = "," if i else ""
+                self._file.write(f"{separator}{_EVENT_INDENT}{json.dumps(event_name)}: ")
+                self._file.write(self._spool.read(length).decode())
+            self._file.write('\n  }\n}')
+        self._spool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+
+def write_catalog(fname: str, summaries: Dict[str, Dict], mode: Optional[str] = None):
+    with CatalogWriter(fname, mode) as writer:
+        for event_name, summary in summaries.items():
+            writer.write_event(event_name, summary)
+
+
+def iter_catalog_events(fname: str, chunk_size: Optional[int] = READ_CHUNK_SIZE
+                        ) -> Iterator[Tuple[str, Dict]]:
+    """Yield the (event_name, summary) of a catalog written in any mode"""
+    with open(fname, 'r') as f:
+        if _is_ndjson(f):
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry['event_name'], entry['summary']
+        else:
+            yield from _JsonEventStream(f, chunk_size).events()
+
+
+def _is_ndjson(f) -> bool:
+    """True if f starts with an ndjson line or is blank (an ndjson catalog
+    without events), else it is a json document (f is rewound)"""
+    head = f.read(READ_CHUNK_SIZE)
+    f.seek(0)
+    return not head.strip() or _NDJSON_START.match(head) is not None
+
+
+def read_catalog_dataframe(fname: str, columns: Optional[List[str]] = None):
+    """df with a row per event (indexed by event name)
+
+    :param columns: only keep these summary keys (default: all)
+    """
+    rows = {}
+    for event_name, summary in iter_catalog_events(fname):
+        if columns is not None:
+            summary = {c: summary.get(c) for c in columns}
+        rows[event_name] = summary
+    return pd.DataFrame.from_dict(rows, orient='index', columns=columns)
+
+
+class _JsonEventStream:
+    """Incremental parser of the entries of the "events" object of a document"""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _read_more(self) -> bool:
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def _peek(self) -> str:
+        """Next non-whitespace character ('' at the end of the file)"""
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position].isspace():
+                self.position += 1
+            if self.position < len(self.buffer) or not self._read_more():
+                return self.buffer[self.position:self.position + 1]
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise ValueError(f"Expected {char!r} at {self._peek()!r} in {self.f.name}")
+        self.position += 1
+
+    def _decode(self):
+        """Decode the next json value (reading more of the file as needed)"""
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                # a number could continue in the next chunk
+                if end < len(self.buffer) or self.eof:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read_more()
+
+    def _keys(self) -> Iterator[str]:
+        """Keys of the object starting at the current position (the caller
+        decodes each value before the next key is parsed)"""
+        self._expect("{")
+        first = True
+        while self._peek() != "}":
+            if not first:
+                self._expect(",")
+            first = False
+            key = self._decode()
+            self._expect(":")
+            yield key
+        self._expect("}")
+
+    def events(self) -> Iterator[Tuple[str, Dict]]:
+        for key in self._keys():
+            if key != "events":
+                self._decode()
+                continue
+            for event_name in self._keys():
+                yield event_name, self._decode()
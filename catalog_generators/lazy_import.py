@@ -0,0 +1,55 @@
+"""Defer importing heavy dependencies until they are first used.
+
+Importing bilby, pandas and h5py takes seconds, which every CLI invocation and
+(spawned) worker process would otherwise pay even when the code path never
+needs them. Modules bind a LazyModule instead and the real import happens on
+the first attribute access.
+
+Example usage:
+
+    pd = lazy_import("pandas")
+    conversion = lazy_import("bilby.gw.conversion")
+
+    df = pd.DataFrame(...)  # pandas is imported here
+
+Note: annotations using a lazy module (eg -> pd.DataFrame) need
+`from __future__ import annotations` so they are not evaluated at import.
+"""
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Module proxy that imports the real module on first attribute access"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_lazy_module'] = None
+
+    def _load(self) -> types.ModuleType:
+        module = self.__dict__['_lazy_module']
+        if module is None:
+            module = importlib.import_module(self.__name__)
+            self.__dict__['_lazy_module'] = module
+        return module
+
+    def __getattr__(self, attr: str):
+        value = getattr(self._load(), attr)
+        # later accesses skip __getattr__
+        self.__dict__[attr] = value
+        return value
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__['_lazy_module'] is not None else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """The module if it is already imported, else a LazyModule for it"""
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
@@ -1,20 +1,19 @@
-import glob
-import os
+from __future__ import annotations
 
-import h5py
-import pandas as pd
-from bilby.gw.conversion import (
-    luminosity_distance_to_redshift
-)
-from tqdm import tqdm
+import os
+from typing import List
 
+from . import gwosc_conversion as conversion
 from . import utils
-from .catalog_generator import CatalogGenerator
-from .event_keys import GWOSC_KEYS, REQUIRED_PARAMETERS
+from .catalog_generator import CatalogGenerator, register_catalog
 from .event_parser import EventParser
-from .utils import dict_to_json, summarise_samples
+from .hdf5_reader import describe_hdf5, get_hdf5_n_rows, read_hdf5_columns
+from .lazy_import import lazy_import
+
+pd = lazy_import("pandas")
 
 DATA_DIR = "../data/lvc_search/gwtc1"
+PARSER_VERSION = 1
 
 SEARCH_PARAMS = {
     "luminosity_distance_Mpc": "luminosity distance [Mpc]",
@@ -29,91 +28,93 @@ SEARCH_PARAMS = {
     "costilt2": "cosine of the zenith angle between the spin and the orbital angular momentum vector of system."
 }
 
+# Parameters needed by convert_df_to_gwosc_df and the catalog summary
+SUMMARY_PARAMS = ["luminosity_distance_Mpc", "m1_detector_frame_Msun",
+                  "m2_detector_frame_Msun", "right_ascension", "declination"]
+
+# {GWOSC name: LVC name}
+ALIASES = {
+    "mass_1": "m1_detector_frame_Msun",
+    "mass_2": "m2_detector_frame_Msun",
+    "luminosity_distance": "luminosity_distance_Mpc",
+    "ra": "right_ascension",
+    "dec": "declination",
+}
+DERIVED_PARAMS = ["mass_ratio", "total_mass", "chirp_mass"]
+
 
 def main():
     generate_lvc_catalog(data_dir=DATA_DIR,
                          out_catalog_fname="../data/lvc_catalog_new.json")
 
 
-def generate_lvc_catalog(data_dir, out_catalog_fname):
-    event_samples = load_event_samples_to_dataframes(data_dir)
-    event_samples = make_events_gwosc_compatible(event_samples)
-    event_summary = summarise_all_events(event_samples)
-    dict_to_json(
-        json_fname=out_catalog_fname,
-        data_dict=dict(events=event_summary)
-    )
+def generate_lvc_catalog(data_dir, out_catalog_fname, n_workers=1, incremental=True):
+    LvcGwtc1Catalog(data_dir, n_workers).generate(out_catalog_fname, incremental)
     print("Completed catalog generation.")
 
 
-def summarise_all_events(events_samples_dict):
-    summary_dict = {}
-    for event_name, event_df in events_samples_dict.items():
-        event_summary_dict = summarise_event_df(event_df)
-        event_summary_dict['commonName'] = event_name
-        summary_dict[event_name] = event_summary_dict
-    return summary_dict
+def load_event_samples_to_dataframes(data_dir, n_workers=1, files=None,
+                                     parameters=None, rows=None):
+    """Load LVS posterior files into dict of df (sorted by filename)"""
+    return LvcGwtc1Catalog(data_dir, n_workers).load_catalog_event_samples(
+        files, parameters, rows)
 
 
-def load_event_samples_to_dataframes(data_dir):
-    """Load LVS posterior files into dict of df"""
-    events_samples_dict = {}
-    files = glob.glob(os.path.join(data_dir, "*.h*5"))
-    for file in tqdm(files, desc="Reading LVC Posteriors", total=len(files)):
-        event_name = os.path.basename(file).split(".h")[0]
-        event_name = event_name.split("_")[0]
-        event_hdf = h5py.File(file, mode='r')
-        event_dict = {k: event_hdf[f"Overall_posterior"][k][()] for k in
-                      SEARCH_PARAMS.keys()}
-        event_df = pd.DataFrame(event_dict)
-        events_samples_dict[event_name] = event_df
-    return events_samples_dict
+def make_events_gwosc_compatible(events_df_container):
+    return LvcGwtc1Catalog().make_events_gwosc_compatible(events_df_container)
 
 
-def make_events_gwosc_compatible(events_df_container):
-    for event_name in events_df_container.keys():
-        events_df_container[event_name] = convert_df_to_gwosc_df(
-            events_df_container[event_name])
-    return events_df_container
+def get_event_name(file):
+    event_name = os.path.basename(file).split(".h")[0]
+    return event_name.split("_")[0]
 
 
-def convert_df_to_gwosc_df(df: pd.DataFrame) -> pd.DataFrame:
-    converted_df = df.copy()
-    # rename
-    converted_df['mass_1'] = converted_df['m1_detector_frame_Msun']
-    converted_df['mass_2'] = converted_df['m2_detector_frame_Msun']
-    converted_df['mass_ratio'] = converted_df['mass_2'] / converted_df['mass_1']
-    converted_df['ra'] = converted_df['right_ascension']
-    converted_df['dec'] = converted_df['declination']
-    return converted_df
-
-
-def summarise_event_df(event_df):
-    summary = {}
-    for param in event_df.columns:
-        summary[f"{param}_lower"], summary[f"{param}_upper"], summary[param] = \
-            summarise_samples(event_df[param])
-
-    for param_type in ["_lower", "_upper", ""]:
-        summary[f'redshift{param_type}'] = \
-            float(luminosity_distance_to_redshift(
-                summary[f'luminosity_distance{param_type}']))
-        for key in ['mass_1', 'mass_2', 'chirp_mass', 'total_mass']:
-            summary[f'{key}_source{param_type}'] = \
-                summary[f"{key}{param_type}"] / (1 + summary[f'redshift{param_type}'])
-
-    summary = {k: summary.get(k, None) for k in GWOSC_KEYS}
-    summary['version'] = 1
-    # summary['reference'] = "https://github.com/jroulet/O2_samples/"
-    # summary['catalog.shortName'] = "IAS"
-    return summary
+def read_event_file(file, parameters=None, rows=None):
+    """Load (only the parameters/rows of) one LVC posterior file
+    :return: event name, df of samples
+    """
+    event_name = get_event_name(file)
+    parameters = list(SEARCH_PARAMS.keys()) if parameters is None else parameters
+    event_dict = read_hdf5_columns(file, "Overall_posterior", parameters, rows)
+    event_df = pd.DataFrame(event_dict)
+    return event_name, event_df
 
 
-class LvcGwtc1Catalog(CatalogGenerator):
-    pass
+def count_event_samples(file):
+    return get_hdf5_n_rows(file, "Overall_posterior")
 
 
-from typing import List
+def describe_event_file(file):
+    return describe_hdf5(file, "Overall_posterior")
+
+
+def convert_df_to_gwosc_df(df: pd.DataFrame) -> pd.DataFrame:
+    """Add the GWOSC parameters (without copying the samples, see gwosc_conversion)"""
+    columns = conversion.get_columns(df, ALIASES)
+    derived = conversion.derive_columns(
+        "component_masses", DERIVED_PARAMS, columns, ["mass_1", "mass_2"],
+        conversion.derive_component_mass_columns)
+    return conversion.to_dataframe({**columns, **derived})
+
+
+@register_catalog
+class LvcGwtc1Catalog(CatalogGenerator):
+    name = "GWTC-1"
+    short_name = "GWTC-1-confident"
+    reference = "https://dcc.ligo.org/LIGO-P1800370/public"
+    default_data_dir = DATA_DIR
+    data_subdir = "lvc_search/gwtc1"
+    file_pattern = "*.h*5"
+    parser_version = PARSER_VERSION
+    search_params = SEARCH_PARAMS
+    summary_params = SUMMARY_PARAMS
+    ess_params = ["m1_detector_frame_Msun", "luminosity_distance_Mpc"]
+
+    get_event_name = staticmethod(get_event_name)
+    read_event_file = staticmethod(read_event_file)
+    count_event_samples = staticmethod(count_event_samples)
+    describe_event_file = staticmethod(describe_event_file)
+    convert_samples = staticmethod(convert_df_to_gwosc_df)
 
 
 class LvcGwtc1EventParser(EventParser):
@@ -123,14 +124,14 @@ class LvcGwtc1EventParser(EventParser):
         return list(SEARCH_PARAMS.keys())
 
     @classmethod
-    def load_event_samples(cls, sample_filename: str) -> EventParser:
-        event_hdf = h5py.File(sample_filename, mode='r')
-        event_dict = {k: event_hdf[f"Overall_posterior"][k][()] for k in
-                      LvcGwtc1EventParser.get_search_parameters()}
+    def load_event_samples(cls, sample_filename: str, compact: bool = False) -> EventParser:
+        event_dict = read_hdf5_columns(
+            sample_filename, "Overall_posterior", cls.get_search_parameters())
         return cls(
             samples=pd.DataFrame(event_dict),
             datasource=sample_filename,
             catalog="LVC-GWTC1",
+            compact=compact,
         )
 
     @staticmethod
@@ -0,0 +1,154 @@
+"""Manifest of processed posterior files, used for incremental catalog rebuilds.
+
+The manifest lives next to the catalog JSON and maps each input file's
+size/mtime/sha256 to its event summary. Files that have not changed since the
+last run (and were processed by the same parser version and settings, eg the
+summary version or the down-sampling) reuse their cached summary instead of
+being loaded and summarised again.
+
+Example usage:
+
+    manifest = CatalogManifest.load("ias_catalog.json", parser_version=1)
+    stale_files = manifest.stale_files(files)
+    ... summarise stale_files ...
+    manifest.update(stale_files, get_event_name, summaries)
+    manifest.save()
+
+"""
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .atomic_file import atomic_write
+from .zip_reader import get_zip_member_info, is_zip_member, split_zip_member
+
+HASH_CHUNK_SIZE = 2 ** 20
+
+
+def get_manifest_fname(out_catalog_fname: str) -> str:
+    return os.path.splitext(out_catalog_fname)[0] + ".manifest.json"
+
+
+def file_hash(fname: str) -> str:
+    """sha256 of the file contents (the CRC32 of the zip directory for zip members)"""
+    if is_zip_member(fname):
+        return f"crc32:{get_zip_member_info(fname).CRC:08x}"
+    sha = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def file_fingerprint(fname: str, with_hash: Optional[bool] = True) -> Dict:
+    if is_zip_member(fname):
+        archive, _ = split_zip_member(fname)
+        size, mtime = get_zip_member_info(fname).file_size, os.stat(archive).st_mtime_ns
+    else:
+        stat = os.stat(fname)
+        size, mtime = stat.st_size, stat.st_mtime_ns
+    fingerprint = dict(size=size, mtime=mtime)
+    if with_hash:
+        fingerprint['sha256'] = file_hash(fname)
+    return fingerprint
+
+
+def load_cached_summaries(out_catalog_fname: str) -> Dict[str, Dict]:
+    """{event_name: summary} cached in the manifest of out_catalog_fname"""
+    with open(get_manifest_fname(out_catalog_fname), 'r') as f:
+        entries = json.load(f)['files']
+    return {e['event_name']: e['summary'] for e in entries.values()}
+
+
+class CatalogManifest:
+
+    def __init__(self, fname: str, parser_version: int, entries: Optional[Dict] = None,
+                 settings: Optional[Dict] = None):
+        self.fname = fname
+        self.parser_version = parser_version
+        self.entries = entries if entries is not None else {}
+        self.settings = settings
+        # {abspath: fingerprint} of the stale files, taken before they are read
+        self.fingerprints = {}
+
+    @classmethod
+    def load(cls, out_catalog_fname: str, parser_version: int,
+             reset: Optional[bool] = False, settings: Optional[Dict] = None):
+        """Load the manifest stored next to out_catalog_fname.
+
+        An empty manifest is returned if there is none, if reset is True or if
+        it was written by a different parser version or with other settings.
+
+        :param settings: json-able options that change the summaries
+        """
+        fname = get_manifest_fname(out_catalog_fname)
+        if reset or not os.path.isfile(fname):
+            return cls(fname, parser_version, settings=settings)
+        with open(fname, 'r') as f:
+            data = json.load(f)
+        if data.get('parser_version') != parser_version or data.get('settings') != settings:
+            return cls(fname, parser_version, settings=settings)
+        return cls(fname, parser_version, data['files'], settings)
+
+    def is_current(self, fname: str) -> bool:
+        """True if fname is unchanged since its summary was cached.
+
+        The hash is only computed when the size or mtime changed.
+        """
+        entry = self.entries.get(os.path.abspath(fname))
+        if entry is None:
+            return False
+        fingerprint = file_fingerprint(fname, with_hash=False)
+        if fingerprint['size'] != entry['size']:
+            return False
+        if fingerprint['mtime'] == entry['mtime']:
+            return True
+        if file_hash(fname) == entry['sha256']:
+            entry['mtime'] = fingerprint['mtime']
+            return True
+        return False
+
+    def stale_files(self, files: List[str]) -> List[str]:
+        """Files that are new or have changed.
+
+        Their fingerprints are taken now, before they are read, so a file that
+        changes while it is summarised is stale again on the next run.
+        """
+        stale_files = [f for f in files if not self.is_current(f)]
+        for fname in stale_files:
+            self.fingerprints[os.path.abspath(fname)] = file_fingerprint(fname)
+        return stale_files
+
+    def update(self, files: List[str], get_event_name: Callable,
+               summaries: Dict[str, Dict]):
+        """Cache the summaries of the newly processed files (with the
+        fingerprints taken by stale_files)"""
+        for fname in files:
+            event_name = get_event_name(fname)
+            path = os.path.abspath(fname)
+            fingerprint = self.fingerprints.pop(path, None) or file_fingerprint(fname)
+            self.entries[path] = dict(
+                event_name=event_name,
+                summary=summaries[event_name],
+                **fingerprint
+            )
+
+    def get_summary(self, fname: str) -> Tuple[str, Dict]:
+        """event name, cached summary of fname"""
+        entry = self.entries[os.path.abspath(fname)]
+        return entry['event_name'], entry['summary']
+
+    def summaries(self, files: List[str]) -> Dict[str, Dict]:
+        """{event_name: summary} for files (entries of other files are dropped)"""
+        paths = [os.path.abspath(f) for f in files]
+        self.entries = {p: self.entries[p] for p in paths}
+        return {e['event_name']: e['summary'] for e in self.entries.values()}
+
+    def save(self):
+        with atomic_write(self.fname) as f:
+            json.dump(
+                dict(parser_version=self.parser_version, settings=self.settings,
+                     files=self.entries),
+                f, indent=2, sort_keys=True
+            )
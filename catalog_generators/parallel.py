@@ -0,0 +1,105 @@
+"""Map a function over many inputs with a pool of workers.
+
+Example usage:
+
+    results = parallel_map(read_file, files, n_workers=4, executor="process")
+
+    for i, result in parallel_imap(read_file, files, n_workers=4):
+        ...  # results in the order they finish
+
+"""
+import functools
+import os
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed
+)
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from tqdm import tqdm
+
+from . import profiling
+
+EXECUTORS = ["serial", "thread", "process"]
+
+
+def get_n_workers(n_workers: Optional[int]) -> int:
+    """None or a non-positive number means use all available cores"""
+    if n_workers is None or n_workers <= 0:
+        return os.cpu_count() or 1
+    return n_workers
+
+
+def parallel_map(
+        func: Callable,
+        items: Iterable,
+        n_workers: Optional[int] = 1,
+        executor: Optional[Union[str, Executor]] = "thread",
+        desc: Optional[str] = None
+) -> List:
+    """Apply func to every item using a pool of workers.
+
+    :param func: function applied to each item (must be picklable for the
+        "process" executor, i.e. defined at module level)
+    :param items: inputs to func
+    :param n_workers: number of workers (None/0 uses all cores)
+    :param executor: one of "serial", "thread" (good for GIL-releasing IO like
+        np.load) or "process" (good for CPU bound work like HDF5 decompression),
+        or an existing concurrent.futures.Executor (which is not shut down)
+    :param desc: progress bar label
+    :return: list of results in the same order as items
+    """
+    items = list(items)
+    results = [None] * len(items)
+    for i, result in parallel_imap(func, items, n_workers, executor, desc):
+        results[i] = result
+    return results
+
+
+def parallel_imap(
+        func: Callable,
+        items: Iterable,
+        n_workers: Optional[int] = 1,
+        executor: Optional[Union[str, Executor]] = "thread",
+        desc: Optional[str] = None
+) -> Iterator[Tuple[int, Any]]:
+    """parallel_map yielding (index of the item, result) as each item finishes"""
+    items = list(items)
+    profile = profiling.get_profile()
+    if profile is None:
+        yield from _imap(func, items, n_workers, executor, desc)
+        return
+    # profile the workers too and merge their reports into the profile
+    options = dict(cprofile=profile.cprofile, cprofile_top=profile.cprofile_top)
+    func = functools.partial(profiling.call_with_profile, func, options)
+    for i, (result, report) in _imap(func, items, n_workers, executor, desc):
+        if report is not None:
+            profile.merge(report)
+        yield i, result
+
+
+def _imap(func, items, n_workers, executor, desc) -> Iterator[Tuple[int, Any]]:
+    if isinstance(executor, Executor):
+        yield from _imap_with_pool(executor, func, items, desc)
+        return
+    if executor not in EXECUTORS:
+        raise ValueError(f"executor {executor} not in {EXECUTORS}")
+    n_workers = min(get_n_workers(n_workers), max(len(items), 1))
+
+    if executor == "serial" or n_workers == 1:
+        for i, item in enumerate(tqdm(items, desc=desc, total=len(items))):
+            yield i, func(item)
+        return
+
+    pool_class = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+    with pool_class(max_workers=n_workers) as pool:
+        yield from _imap_with_pool(pool, func, items, desc)
+
+
+def _imap_with_pool(pool: Executor, func: Callable, items: List,
+                    desc: str) -> Iterator[Tuple[int, Any]]:
+    futures = {pool.submit(func, item): i for i, item in enumerate(items)}
+    for future in tqdm(as_completed(futures), desc=desc, total=len(items)):
+        yield futures[future], future.result()
@@ -0,0 +1,196 @@
+"""Opt-in timers, counters and per-event cProfile capture.
+
+The pipeline stages (reading, converting, summarising, redshift conversion and
+json writing) are wrapped in timer() blocks and count() calls. While profiling
+is disabled (the default) timer() returns a shared no-op context manager and
+count() returns straight away, so the instrumentation costs next to nothing.
+
+Work done in worker processes is profiled in the worker and merged back by
+parallel.parallel_map.
+
+Example usage:
+
+    enable_profiling(cprofile=True)
+    generate_ias_catalog(data_dir, "ias_catalog.json")
+    save_profile_report("ias_profile.json")
+
+"""
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+from typing import Dict, Optional
+
+_PROFILE = None
+
+
+class Profile:
+    """Accumulated timers, counters and cProfile stats"""
+
+    def __init__(self, cprofile: Optional[bool] = False, cprofile_top: Optional[int] = 20):
+        """
+        :param cprofile: capture cProfile stats of every profile_event block
+        :param cprofile_top: number of functions kept (by cumulative time)
+        """
+        self.cprofile = cprofile
+        self.cprofile_top = cprofile_top
+        self.pid = os.getpid()
+        self.timers = {}
+        self.counters = {}
+        self.events = {}
+        self._lock = threading.Lock()
+
+    def add_time(self, name: str, seconds: float, calls: Optional[int] = 1):
+        with self._lock:
+            timer = self.timers.setdefault(name, dict(calls=0, seconds=0.0))
+            timer['calls'] += calls
+            timer['seconds'] += seconds
+
+    def add_count(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def add_event_stats(self, name: str, profiler: cProfile.Profile):
+        stats = pstats.Stats(profiler).sort_stats(pstats.SortKey.CUMULATIVE)
+        functions = []
+        for func in stats.fcn_list[:self.cprofile_top]:
+            _, ncalls, tottime, cumtime, _ = stats.stats[func]
+            functions.append(dict(
+                function=pstats.func_std_string(func),
+                ncalls=ncalls, tottime=tottime, cumtime=cumtime
+            ))
+        with self._lock:
+            self.events[name] = functions
+
+    def merge(self, report: Dict):
+        """Add a report (eg of a worker process) to this profile"""
+        for name, timer in report['timers'].items():
+            self.add_time(name, timer['seconds'], timer['calls'])
+        for name, value in report['counters'].items():
+            self.add_count(name, value)
+        with self._lock:
+            self.events.update(report['events'])
+
+    def report(self) -> Dict:
+        with self._lock:
+            return dict(
+                timers={k: dict(v) for k, v in self.timers.items()},
+                counters=dict(self.counters),
+                events=dict(self.events),
+            )
+
+
+class _Timer:
+    __slots__ = ["profile", "name", "start"]
+
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profile.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _EventProfiler:
+    __slots__ = ["profile", "name", "profiler"]
+
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+        self.profiler = cProfile.Profile()
+
+    def __enter__(self):
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.disable()
+        self.profile.add_event_stats(self.name, self.profiler)
+        return False
+
+
+class _NullContext:
+    __slots__ = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_CONTEXT = _NullContext()
+
+
+def enable_profiling(cprofile: Optional[bool] = False, cprofile_top: Optional[int] = 20):
+    """Start collecting a new profile (see Profile)"""
+    global _PROFILE
+    _PROFILE = Profile(cprofile, cprofile_top)
+
+
+def disable_profiling() -> Optional[Dict]:
+    """Stop profiling
+    :return: the report of the collected profile (None if not profiling)
+    """
+    global _PROFILE
+    profile, _PROFILE = _PROFILE, None
+    return None if profile is None else profile.report()
+
+
+def get_profile() -> Optional[Profile]:
+    """The active Profile (None if profiling is disabled)"""
+    return _PROFILE
+
+
+def timer(name: str):
+    """Context manager adding the time spent in the block to timer name"""
+    if _PROFILE is None:
+        return _NULL_CONTEXT
+    return _Timer(_PROFILE, name)
+
+
+def count(name: str, value: float = 1):
+    """Add value to counter name"""
+    if _PROFILE is not None:
+        _PROFILE.add_count(name, value)
+
+
+def profile_event(name: str):
+    """Context manager capturing the cProfile stats of the block (if enabled
+    with cprofile=True) under name"""
+    if _PROFILE is None or not _PROFILE.cprofile:
+        return _NULL_CONTEXT
+    return _EventProfiler(_PROFILE, name)
+
+
+def get_profile_report() -> Optional[Dict]:
+    return None if _PROFILE is None else _PROFILE.report()
+
+
+def save_profile_report(fname: str):
+    with open(fname, 'w') as f:
+        json.dump(get_profile_report(), f, indent=2, sort_keys=True)
+
+
+def call_with_profile(func, options: Dict, item):
+    """Run func(item) in a worker and return (result, profile report).
+
+    In the process that enabled profiling func is only timed by the active
+    profile (so no report is returned); in other processes a fresh profile
+    with the same options is collected.
+    """
+    if _PROFILE is not None and _PROFILE.pid == os.getpid():
+        return func(item), None
+    enable_profiling(**options)
+    try:
+        result = func(item)
+    finally:
+        report = disable_profiling()
+    return result, report
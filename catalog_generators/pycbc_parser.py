@@ -7,21 +7,19 @@ Example usage:
 
 """
 
-import glob
+from __future__ import annotations
+
 import os
 
-import h5py
-import pandas as pd
-from bilby.gw.conversion import (
-    component_masses_to_chirp_mass,
-    luminosity_distance_to_redshift
-)
-from tqdm import tqdm
+from . import gwosc_conversion as conversion
+from .catalog_generator import CatalogGenerator, register_catalog
+from .hdf5_reader import describe_hdf5, get_hdf5_n_rows, read_hdf5_columns
+from .lazy_import import lazy_import
 
-from .event_keys import GWOSC_KEYS
-from .utils import dict_to_json, summarise_samples
+pd = lazy_import("pandas")
 
 DATA_DIR = "../data/pycbc_search/"
+PARSER_VERSION = 1
 
 SEARCH_PARAMS = {
     "mass1": "The source-frame mass of the larger object, in solar masses",
@@ -47,91 +45,101 @@ SEARCH_PARAMS = {
     "logjacobian": "The natural log of the Jacobian between the parameter space and the sampling parameter-space that was used",
 }
 
+# Parameters needed by convert_df_to_gwosc_df and the catalog summary
+SUMMARY_PARAMS = ["mass1", "mass2", "chi_eff", "tc", "distance", "redshift"]
+
+# {GWOSC name: PyCBC name}
+ALIASES = {
+    "GPS": "tc",
+    "mass_1": "mass1",
+    "mass_2": "mass2",
+    "luminosity_distance": "distance",
+}
+DETECTOR_FRAME_PARAMS = ["mass_1", "mass_2", "chirp_mass", "total_mass"]
+DERIVED_PARAMS = ["total_mass", "chirp_mass"] + [f"{key}_source" for key in DETECTOR_FRAME_PARAMS]
+
 
 def main():
     generate_pycbc_catalog(data_dir=DATA_DIR,
                            out_catalog_fname="../data/pycbc_catalog.json")
 
 
-def generate_pycbc_catalog(data_dir, out_catalog_fname):
-    event_samples = load_event_samples_to_dataframes(data_dir)
-    event_samples = make_events_gwosc_compatible(event_samples)
-    event_summary = summarise_all_events(event_samples)
-    dict_to_json(
-        json_fname=out_catalog_fname,
-        data_dict=dict(events=event_summary)
-    )
+def generate_pycbc_catalog(data_dir, out_catalog_fname, n_workers=1, incremental=True):
+    PycbcCatalog(data_dir, n_workers).generate(out_catalog_fname, incremental)
     print("Completed catalog generation.")
 
 
-def summarise_all_events(events_samples_dict):
-    summary_dict = {}
-    for event_name, event_df in events_samples_dict.items():
-        event_summary_dict = summarise_event_df(event_df)
-        event_summary_dict['commonName'] = event_name
-        summary_dict[event_name] = event_summary_dict
-    return summary_dict
+def load_event_samples_to_dataframes(data_dir, n_workers=1, files=None,
+                                     parameters=None, rows=None):
+    """Load PyCBC hdf files into dict of df (sorted by filename)"""
+    return PycbcCatalog(data_dir, n_workers).load_catalog_event_samples(
+        files, parameters, rows)
 
 
-def load_event_samples_to_dataframes(data_dir):
-    """Load PyCBC hdf files into dict of df"""
-    events_samples_dict = {}
-    files = glob.glob(os.path.join(data_dir, "*.hdf"))
-    for file in tqdm(files, desc="Reading PyCBC Posteriors", total=len(files)):
-        event_name = os.path.basename(file).replace(".hdf", "")
-        event_name = event_name.replace("H1L1V1-EXTRACT_POSTERIOR_", "GW")
-        event_hdf = h5py.File(file, mode='r')
-        event_dict = {k: event_hdf[f"samples/{k}"][()] for k in SEARCH_PARAMS.keys()}
-        event_df = pd.DataFrame(event_dict)
-        events_samples_dict[event_name] = event_df
-    return events_samples_dict
+def make_events_gwosc_compatible(events_df_container):
+    return PycbcCatalog().make_events_gwosc_compatible(events_df_container)
 
 
-def make_events_gwosc_compatible(events_df_container):
-    for event_name in events_df_container.keys():
-        events_df_container[event_name] = convert_df_to_gwosc_df(
-            events_df_container[event_name])
-    return events_df_container
+def get_event_name(file):
+    event_name = os.path.basename(file).replace(".hdf", "")
+    return event_name.replace("H1L1V1-EXTRACT_POSTERIOR_", "GW")
+
+
+def read_event_file(file, parameters=None, rows=None):
+    """Load (only the parameters/rows of) one PyCBC hdf file
+    :return: event name, df of samples
+    """
+    event_name = get_event_name(file)
+    parameters = list(SEARCH_PARAMS.keys()) if parameters is None else parameters
+    event_dict = read_hdf5_columns(file, "samples", parameters, rows)
+    event_df = pd.DataFrame(event_dict)
+    return event_name, event_df
+
+
+def count_event_samples(file):
+    return get_hdf5_n_rows(file, "samples")
+
+
+def describe_event_file(file):
+    return describe_hdf5(file, "samples")
 
 
 def convert_df_to_gwosc_df(df: pd.DataFrame) -> pd.DataFrame:
-    converted_df = df.copy()
-    # rename
-    converted_df['GPS'] = converted_df['tc']
-    converted_df['mass_1'] = converted_df['mass1']
-    converted_df['mass_2'] = converted_df['mass2']
-    converted_df['total_mass'] = converted_df['mass_1'] + converted_df['mass_2']
-    converted_df['luminosity_distance'] = converted_df['distance']
+    """Add the GWOSC parameters (without copying the samples, see gwosc_conversion)"""
+    columns = conversion.get_columns(df, ALIASES)
+    derived = conversion.derive_columns(
+        "pycbc", DERIVED_PARAMS, columns, ["mass_1", "mass_2", "redshift"],
+        derive_gwosc_columns)
+    return conversion.to_dataframe({**columns, **derived})
+
 
+def derive_gwosc_columns(columns, derived):
     # re-parameterisation
-    converted_df['chirp_mass'] = component_masses_to_chirp_mass(
-        mass_1=converted_df['mass_1'],
-        mass_2=converted_df['mass_2']
-    )
-
-    for key in ['mass_1', 'mass_2', 'chirp_mass', 'total_mass']:
-        converted_df[f'{key}_source'] = \
-            converted_df[key] / (1 + converted_df[f'redshift'])
-
-    return converted_df
-
-
-def summarise_event_df(event_df):
-    summary = {}
-    for param in event_df.columns:
-        summary[f"{param}_lower"], summary[f"{param}_upper"], summary[param] = \
-            summarise_samples(event_df[param])
-
-    for param_type in ["_lower", "_upper", ""]:
-        summary[f'redshift{param_type}'] = \
-            float(luminosity_distance_to_redshift(
-                summary[f'luminosity_distance{param_type}']))
-
-    summary = {k: summary.get(k, None) for k in GWOSC_KEYS}
-    summary['version'] = 1
-    summary['reference'] = "https://github.com/gwastro/2-ogc"
-    summary['catalog.shortName'] = "PyCBC"
-    return summary
+    conversion.derive_component_mass_columns(columns, derived)
+    columns = {**columns, **derived}
+    for key in DETECTOR_FRAME_PARAMS:
+        conversion.detector_to_source_frame(
+            columns[key], columns['redshift'], out=derived[f'{key}_source'])
+
+
+@register_catalog
+class PycbcCatalog(CatalogGenerator):
+    name = "PyCBC"
+    short_name = "PyCBC"
+    reference = "https://github.com/gwastro/2-ogc"
+    default_data_dir = DATA_DIR
+    data_subdir = "pycbc_search"
+    file_pattern = "*.hdf"
+    parser_version = PARSER_VERSION
+    search_params = SEARCH_PARAMS
+    summary_params = SUMMARY_PARAMS
+    ess_params = ["mass1", "distance", "loglikelihood"]
+
+    get_event_name = staticmethod(get_event_name)
+    read_event_file = staticmethod(read_event_file)
+    count_event_samples = staticmethod(count_event_samples)
+    describe_event_file = staticmethod(describe_event_file)
+    convert_samples = staticmethod(convert_df_to_gwosc_df)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+"""Consolidated columnar store of standardised (GWOSC-compatible) samples.
+
+All catalogs are written into one HDF5 file laid out as
+/<catalog>/<event>/<column>, with one typed, contiguous and uncompressed
+dataset per column. Reads can project columns and are memory-mapped straight
+from the file (zero-copy), so cross-catalog comparisons never touch the
+vendor-specific layouts again.
+
+Example usage:
+
+    store = SampleStore("data/samples.h5")
+    export_parser_samples(store, "IAS", ias_parser, "data/ias_search")
+    df = store.read_event("IAS", "GW150914", columns=["mass_1", "mass_2"])
+
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .lazy_import import lazy_import
+
+h5py = lazy_import("h5py")
+pd = lazy_import("pandas")
+
+COLUMN_ORDER_ATTR = "columns"
+
+
+class SampleStore:
+
+    def __init__(self, fname: str):
+        self.fname = fname
+
+    def write_event(self, catalog: str, event: str, samples: pd.DataFrame):
+        self.write_catalog(catalog, {event: samples})
+
+    def write_catalog(self, catalog: str, events: Dict[str, pd.DataFrame]):
+        """Write (or overwrite) the samples of each event of a catalog.
+
+        Note: HDF5 does not reclaim the space of overwritten events.
+        """
+        with h5py.File(self.fname, mode='a') as store:
+            for event, samples in events.items():
+                key = f"{catalog}/{event}"
+                if key in store:
+                    del store[key]
+                group = store.create_group(key)
+                for column in samples.columns:
+                    group.create_dataset(
+                        column, data=np.ascontiguousarray(samples[column].to_numpy()))
+                group.attrs[COLUMN_ORDER_ATTR] = [str(c) for c in samples.columns]
+
+    def catalogs(self) -> List[str]:
+        with h5py.File(self.fname, mode='r') as store:
+            return list(store.keys())
+
+    def events(self, catalog: str) -> List[str]:
+        with h5py.File(self.fname, mode='r') as store:
+            return list(store[catalog].keys())
+
+    def columns(self, catalog: str, event: str) -> List[str]:
+        with h5py.File(self.fname, mode='r') as store:
+            return list(store[f"{catalog}/{event}"].attrs[COLUMN_ORDER_ATTR])
+
+    def read_event(
+            self,
+            catalog: str,
+            event: str,
+            columns: Optional[List[str]] = None,
+            mmap: Optional[bool] = True
+    ) -> pd.DataFrame:
+        """Read the samples of one event.
+
+        :param columns: only read these columns (default: all)
+        :param mmap: memory-map the columns instead of reading them into memory
+            (the returned df is then backed by read-only views of the file)
+        """
+        arrays = {}
+        with h5py.File(self.fname, mode='r') as store:
+            group = store[f"{catalog}/{event}"]
+            if columns is None:
+                columns = list(group.attrs[COLUMN_ORDER_ATTR])
+            for column in columns:
+                dataset = group[column]
+                offset = dataset.id.get_offset()
+                if mmap and offset is not None and dataset.chunks is None:
+                    arrays[column] = np.memmap(
+                        self.fname, mode='r', dtype=dataset.dtype,
+                        shape=dataset.shape, offset=offset)
+                else:
+                    arrays[column] = dataset[()]
+        return pd.DataFrame(arrays, copy=False)
+
+    def read_catalog(
+            self, catalog: str, columns: Optional[List[str]] = None,
+            mmap: Optional[bool] = True
+    ) -> Dict[str, pd.DataFrame]:
+        return {event: self.read_event(catalog, event, columns, mmap)
+                for event in self.events(catalog)}
+
+
+def export_parser_samples(store: SampleStore, catalog: str, parser_module,
+                          data_dir: str, n_workers: Optional[int] = 1):
+    """Load a parser's posteriors, make them GWOSC compatible and store them.
+
+    :param parser_module: eg ias_parser (anything with
+        load_event_samples_to_dataframes and make_events_gwosc_compatible)
+    """
+    samples = parser_module.load_event_samples_to_dataframes(data_dir, n_workers)
+    samples = parser_module.make_events_gwosc_compatible(samples)
+    store.write_catalog(catalog, samples)
@@ -0,0 +1,166 @@
+"""Largest-first scheduling of work items under a memory budget.
+
+parallel_map hands the items to the workers in the order they come, so a large
+posterior near the end of the list runs alone while the other workers idle.
+The Scheduler instead starts the items by decreasing estimated work (the
+longest-processing-time rule, within 4/3 of the optimal wall time), and only
+starts an item once the estimated memory of the running items plus its own
+fits in the memory budget (an item larger than the whole budget runs alone).
+The number of workers then only caps the concurrency, the budget bounds the
+memory.
+
+Each item is timed in its worker, and the report compares the wall time to
+the ideal one, max(busy time / n_workers, longest item), with the items and
+busy time of every worker.
+
+Example usage:
+
+    scheduler = Scheduler(n_workers=8, executor="process", memory_budget=4 * 2 ** 30)
+    costs = [(os.path.getsize(f), estimate_memory(f)) for f in files]
+    for i, result in scheduler.imap(summarise_file, files, costs):
+        ...  # results in the order they finish
+    scheduler.report  # dict(wall_seconds, ideal_seconds, efficiency, workers, ...)
+
+"""
+import functools
+import math
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait
+)
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from tqdm import tqdm
+
+from . import profiling
+from .parallel import EXECUTORS, get_n_workers
+
+# (work, memory in bytes) estimates of an item
+Cost = Tuple[float, float]
+
+
+def timed_call(func: Callable, item) -> Tuple[Any, str, float]:
+    """func(item), the worker running it and the seconds it took"""
+    start = time.perf_counter()
+    result = func(item)
+    worker = f"{os.getpid()}:{threading.current_thread().name}"
+    return result, worker, time.perf_counter() - start
+
+
+def largest_first(costs: List[Cost]) -> List[int]:
+    """Indices of the items by decreasing work (in their order for equal work)"""
+    return sorted(range(len(costs)), key=lambda i: -costs[i][0])
+
+
+class Scheduler:
+
+    def __init__(
+            self,
+            n_workers: Optional[int] = 1,
+            executor: Optional[Union[str, Executor]] = "thread",
+            memory_budget: Optional[float] = None
+    ):
+        """
+        :param n_workers: max number of items run at once (None/0 uses all
+            cores)
+        :param executor: "serial", "thread", "process" or an existing
+            concurrent.futures.Executor (which is not shut down)
+        :param memory_budget: max bytes of the estimated memory of the items
+            run at once (None: no limit)
+        """
+        if not isinstance(executor, Executor) and executor not in EXECUTORS:
+            raise ValueError(f"executor {executor} not in {EXECUTORS}")
+        self.n_workers = 1 if executor == "serial" else get_n_workers(n_workers)
+        self.executor = executor
+        self.memory_budget = memory_budget
+        self.report = {}
+
+    def imap(
+            self,
+            func: Callable,
+            items: Iterable,
+            costs: List[Cost],
+            desc: Optional[str] = None
+    ) -> Iterator[Tuple[int, Any]]:
+        """Apply func to every item, largest first, yielding (index of the
+        item, result) as each item finishes
+
+        :param func: as for parallel.parallel_map
+        :param costs: (work, memory) estimate of each item
+        """
+        items = list(items)
+        call = functools.partial(timed_call, func)
+        profile = profiling.get_profile()
+        if profile is not None:
+            options = dict(cprofile=profile.cprofile, cprofile_top=profile.cprofile_top)
+            call = functools.partial(profiling.call_with_profile, call, options)
+        self.report = dict(n_workers=self.n_workers, memory_budget=self.memory_budget,
+                           peak_memory=0, workers={})
+        start = time.perf_counter()
+        for i, output in self._run(call, items, costs, desc):
+            if profile is not None:
+                output, worker_report = output
+                if worker_report is not None:
+                    profile.merge(worker_report)
+            result, worker, seconds = output
+            stats = self.report['workers'].setdefault(worker, dict(n_items=0, busy_seconds=0.0))
+            stats['n_items'] += 1
+            stats['busy_seconds'] += seconds
+            self.report['longest_item_seconds'] = max(
+                self.report.get('longest_item_seconds', 0.0), seconds)
+            yield i, result
+        self._finish_report(time.perf_counter() - start)
+
+    def _run(self, call, items, costs, desc) -> Iterator[Tuple[int, Any]]:
+        order = largest_first(costs)
+        if self.n_workers == 1 and not isinstance(self.executor, Executor):
+            for i in tqdm(order, desc=desc, total=len(items)):
+                self.report['peak_memory'] = max(self.report['peak_memory'], costs[i][1])
+                yield i, call(items[i])
+            return
+        if isinstance(self.executor, Executor):
+            yield from self._run_with_pool(self.executor, call, items, costs, order, desc)
+            return
+        pool_class = ThreadPoolExecutor if self.executor == "thread" else ProcessPoolExecutor
+        with pool_class(max_workers=min(self.n_workers, max(len(items), 1))) as pool:
+            yield from self._run_with_pool(pool, call, items, costs, order, desc)
+
+    def _run_with_pool(self, pool: Executor, call, items, costs, order,
+                       desc) -> Iterator[Tuple[int, Any]]:
+        budget = math.inf if self.memory_budget is None else self.memory_budget
+        pending = deque(order)
+        running = {}
+        memory = 0
+        with tqdm(desc=desc, total=len(items)) as progress:
+            while pending or running:
+                # start the next largest items while they fit (one at least)
+                while pending and len(running) < self.n_workers and (
+                        not running or memory + costs[pending[0]][1] <= budget):
+                    i = pending.popleft()
+                    running[pool.submit(call, items[i])] = i
+                    memory += costs[i][1]
+                    self.report['peak_memory'] = max(self.report['peak_memory'], memory)
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i = running.pop(future)
+                    memory -= costs[i][1]
+                    progress.update()
+                    yield i, future.result()
+
+    def _finish_report(self, wall_seconds: float):
+        workers = self.report['workers']
+        busy_seconds = sum(w['busy_seconds'] for w in workers.values())
+        ideal_seconds = max(busy_seconds / self.n_workers,
+                            self.report.pop('longest_item_seconds', 0.0))
+        for stats in workers.values():
+            stats['utilisation'] = stats['busy_seconds'] / wall_seconds if wall_seconds else 0.0
+        self.report.update(
+            wall_seconds=wall_seconds, busy_seconds=busy_seconds, ideal_seconds=ideal_seconds,
+            efficiency=ideal_seconds / wall_seconds if wall_seconds else 1.0)
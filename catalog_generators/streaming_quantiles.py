@@ -0,0 +1,154 @@
+"""Bounded-memory quantiles of samples streamed in blocks of rows.
+
+StreamingQuantiles summarises posteriors too large to hold in memory: blocks
+of rows are added one at a time and only a sketch of at most
+~(levels + 1) * 2 * sketch_size rows (per parameter) is kept, whatever the
+number of samples.
+
+The sketch is a hierarchy of compactors: rows enter level 0 with weight 1, and
+each level holding 2 * sketch_size rows of weight w sorts them (per column)
+and keeps every other one (alternating the offset) with weight 2 w in the
+next level. A compaction moves the rank of any value by at most w, so after
+all compactions the rank of every value is off by at most
+rank_error_bound(n_samples, sketch_size) * n_samples. Each reported quantile
+q therefore lies between the exact q - epsilon and q + epsilon quantiles (plus
+one sample for the interpolation), with epsilon = rank_error_bound(...) (eg
+~1e-3 for a million samples with the default sketch_size). Up to
+2 * sketch_size samples nothing is compacted and the summary is exactly that
+of summarise_dataframe.
+
+The compactions only depend on the order of the rows, not on how they are
+split into blocks.
+
+Example usage:
+
+    quantiles = StreamingQuantiles(["mass_1", "mass_2"])
+    for block in blocks:
+        quantiles.update(block)
+    summary = quantiles.summary()  # as summarise_dataframe
+
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .lazy_import import lazy_import
+from .utils import (
+    _interpolate_quantiles,
+    _quantile_positions,
+    summarise_samples_matrix,
+    summary_dict
+)
+
+pd = lazy_import("pandas")
+
+DEFAULT_SKETCH_SIZE = 4096
+
+
+def rank_error_bound(n_samples: int, sketch_size: Optional[int] = DEFAULT_SKETCH_SIZE) -> float:
+    """Max quantile level error of the summary of n_samples samples (0 if
+    nothing is compacted)"""
+    error, count, weight = 0, n_samples, 1
+    while count >= 2 * sketch_size:
+        n_compactions = count // (2 * sketch_size)
+        error += n_compactions * weight
+        count, weight = n_compactions * sketch_size, 2 * weight
+    return error / n_samples if n_samples else 0.0
+
+
+def sketch_rows_bound(n_samples: int, sketch_size: Optional[int] = DEFAULT_SKETCH_SIZE) -> int:
+    """Max number of rows held by the sketch of n_samples samples"""
+    n_levels, count = 1, n_samples
+    while count >= 2 * sketch_size:
+        count = count // (2 * sketch_size) * sketch_size
+        n_levels += 1
+    return min(n_samples, n_levels * 2 * sketch_size)
+
+
+class StreamingQuantiles:
+
+    def __init__(self, params: List[str], sketch_size: Optional[int] = DEFAULT_SKETCH_SIZE):
+        """
+        :param params: columns of the blocks to summarise
+        :param sketch_size: rows kept by each compaction (larger: more memory,
+            smaller error)
+        """
+        self.params = params
+        self.sketch_size = sketch_size
+        self.n_samples = 0
+        # rows of weight 2 ** level, and the compactions done, of each level
+        self.levels: List[np.ndarray] = []
+        self.n_compactions: List[int] = []
+        self.has_nan = np.zeros(len(params), dtype=bool)
+
+    def update(self, samples: pd.DataFrame):
+        """Add a block of samples (a df with the params columns)"""
+        self.update_matrix(samples[self.params].to_numpy(dtype=float))
+
+    def update_matrix(self, samples: np.ndarray):
+        """Add a (n_samples, n_params) block"""
+        self.has_nan |= np.isnan(samples).any(axis=0)
+        self.n_samples += len(samples)
+        self._push(0, samples)
+        level = 0
+        while level < len(self.levels) and len(self.levels[level]) >= 2 * self.sketch_size:
+            self._compact(level)
+            level += 1
+
+    def _push(self, level: int, rows: np.ndarray):
+        if level == len(self.levels):
+            self.levels.append(np.empty((0, len(self.params))))
+            self.n_compactions.append(0)
+        self.levels[level] = np.concatenate([self.levels[level], rows])
+
+    def _compact(self, level: int):
+        """Halve every full block of 2 * sketch_size rows of level"""
+        k = self.sketch_size
+        rows = self.levels[level]
+        n_blocks = len(rows) // (2 * k)
+        blocks = np.sort(rows[:n_blocks * 2 * k].reshape(n_blocks, 2 * k, -1), axis=1)
+        offsets = (self.n_compactions[level] + np.arange(n_blocks)) % 2
+        kept = blocks[np.arange(n_blocks)[:, None], offsets[:, None] + 2 * np.arange(k)]
+        self.levels[level] = rows[n_blocks * 2 * k:]
+        self.n_compactions[level] += n_blocks
+        self._push(level + 1, kept.reshape(n_blocks * k, -1))
+
+    def rank_error(self) -> float:
+        """Max quantile level error of the summary (see rank_error_bound)"""
+        error = sum(n * 2 ** level for level, n in enumerate(self.n_compactions))
+        return error / self.n_samples if self.n_samples else 0.0
+
+    def memory_usage(self) -> int:
+        """Bytes held by the sketch"""
+        return sum(level.nbytes for level in self.levels)
+
+    def quantiles(self, quantiles: Optional[List[float]] = [0.16, 0.84]
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Lower, upper and median of every column (as summarise_samples_matrix)"""
+        if not any(self.n_compactions):
+            return summarise_samples_matrix(self.levels[0] if self.levels else
+                                            np.empty((0, len(self.params))), quantiles)
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(rows), 2 ** level)
+                                  for level, rows in enumerate(self.levels)])
+        order = np.argsort(items, axis=0)
+        items = np.take_along_axis(items, order, axis=0)
+        # number of samples at or below each item
+        cumulative = np.cumsum(weights[order], axis=0)
+
+        positions, below, above = _quantile_positions(self.n_samples, quantiles)
+        a, b = (
+            np.take_along_axis(items, np.stack([(cumulative <= r).sum(axis=0) for r in ranks]),
+                               axis=0)
+            for ranks in [below, above]
+        )
+        qtles, median = _interpolate_quantiles(self.n_samples, positions, below, a, b)
+        qtles[:, self.has_nan] = np.nan
+        median = np.where(self.has_nan, np.nan, median)
+        return qtles[0], qtles[1], median
+
+    def summary(self, quantiles: Optional[List[float]] = [0.16, 0.84]) -> Dict[str, float]:
+        """{param}_lower, {param}_upper and {param} (median), as summarise_dataframe"""
+        return summary_dict(self.params, *self.quantiles(quantiles))
@@ -0,0 +1,229 @@
+"""Synthetic posterior files laid out like each catalog's release files.
+
+Used by the benchmarks and tests to run (and time) the parsers without
+downloading the real posteriors. Each event's samples are scattered around a
+random binary, so the converted masses, spins and distances are physical (but
+otherwise meaningless).
+
+Example usage:
+
+    data_dirs = write_synthetic_catalogs("/tmp/synthetic", n_events=20, n_samples=10000)
+    generate_ias_catalog(data_dirs["IAS"], "/tmp/synthetic/ias_catalog.json")
+
+"""
+import datetime
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .cosmology import luminosity_distance_to_redshift
+from .gps_time import utc_to_gps
+from .lazy_import import lazy_import
+
+h5py = lazy_import("h5py")
+
+# start of the observing run of each catalog's events
+FIRST_EVENT_DATE = {
+    "IAS": datetime.datetime(2015, 9, 12),
+    "PyCBC": datetime.datetime(2015, 9, 12),
+    "GWTC-1": datetime.datetime(2015, 9, 12),
+    "GWTC-2": datetime.datetime(2019, 4, 1),
+    "bilby": datetime.datetime(2019, 4, 1),
+}
+
+
+def get_synthetic_event_times(
+        n_events: int, first_date: datetime.datetime, rng: np.random.Generator
+) -> List[datetime.datetime]:
+    """UTC merger times, one per day at most (so GWyymmdd names are unique)"""
+    days = np.cumsum(rng.integers(1, 8, size=n_events))
+    seconds = rng.integers(0, 24 * 3600, size=n_events)
+    return [first_date + datetime.timedelta(days=int(d), seconds=int(s))
+            for d, s in zip(days, seconds)]
+
+
+def draw_event_samples(
+        n_samples: int, gps: float, rng: np.random.Generator
+) -> Dict[str, np.ndarray]:
+    """Posterior-like samples (bilby parameter names) of a random binary"""
+    mass_1_source = rng.uniform(8, 50)
+    mass_ratio = rng.uniform(0.3, 1)
+    distance = rng.uniform(300, 3000)
+
+    s = dict()
+    s['luminosity_distance'] = np.abs(rng.normal(distance, 0.3 * distance, n_samples))
+    s['redshift'] = luminosity_distance_to_redshift(s['luminosity_distance'])
+    s['mass_1_source'] = np.abs(rng.normal(mass_1_source, 0.1 * mass_1_source, n_samples))
+    s['mass_ratio'] = np.clip(rng.normal(mass_ratio, 0.1, n_samples), 0.05, 1)
+    s['mass_2_source'] = s['mass_1_source'] * s['mass_ratio']
+    s['total_mass_source'] = s['mass_1_source'] + s['mass_2_source']
+    s['chirp_mass_source'] = (s['mass_1_source'] * s['mass_2_source']) ** 0.6 / \
+                             s['total_mass_source'] ** 0.2
+    s['final_mass_source'] = 0.95 * s['total_mass_source']
+    for key in ['mass_1', 'mass_2', 'total_mass', 'chirp_mass']:
+        s[key] = s[f'{key}_source'] * (1 + s['redshift'])
+    s['symmetric_mass_ratio'] = s['mass_ratio'] / (1 + s['mass_ratio']) ** 2
+    for ii in [1, 2]:
+        s[f'a_{ii}'] = rng.uniform(0, 0.99, n_samples)
+        s[f'cos_tilt_{ii}'] = rng.uniform(-1, 1, n_samples)
+        s[f'phi_{ii}'] = rng.uniform(0, 2 * np.pi, n_samples)
+        s[f'chi_{ii}'] = s[f'a_{ii}'] * s[f'cos_tilt_{ii}']
+    s['chi_eff'] = (s['chi_1'] + s['mass_ratio'] * s['chi_2']) / (1 + s['mass_ratio'])
+    s['chi_p'] = s['a_1'] * np.sqrt(1 - s['cos_tilt_1'] ** 2)
+    s['ra'] = rng.normal(rng.uniform(0, 2 * np.pi), 0.1, n_samples) % (2 * np.pi)
+    s['dec'] = np.clip(rng.normal(np.arcsin(rng.uniform(-1, 1)), 0.1, n_samples),
+                       -np.pi / 2, np.pi / 2)
+    s['theta_jn'] = np.arccos(rng.uniform(-1, 1, n_samples))
+    s['psi'] = rng.uniform(0, np.pi, n_samples)
+    s['phase'] = rng.uniform(0, 2 * np.pi, n_samples)
+    s['geocent_time'] = gps + rng.normal(0, 0.01, n_samples)
+    s['network_matched_filter_snr'] = rng.normal(12, 1, n_samples)
+    s['log_likelihood'] = rng.normal(100, 5, n_samples)
+    return s
+
+
+def write_ias_file(fname: str, s: Dict[str, np.ndarray], gps: float, **kwargs):
+    """npy array with the columns of ias_parser.SEARCH_PARAMS"""
+    columns = [
+        s['chirp_mass'], s['symmetric_mass_ratio'], s['chi_1'], s['chi_2'],
+        s['ra'], s['dec'], s['psi'], s['theta_jn'], s['phase'],
+        s['geocent_time'] - gps, s['luminosity_distance']
+    ]
+    np.save(fname, np.stack(columns, axis=1))
+
+
+def write_pycbc_file(fname: str, s: Dict[str, np.ndarray], compression=None, **kwargs):
+    """hdf file with a 'samples/<param>' dataset per pycbc_parser.SEARCH_PARAMS"""
+    comoving_distance = s['luminosity_distance'] / (1 + s['redshift'])
+    columns = dict(
+        mass1=s['mass_1'], mass2=s['mass_2'], chi_eff=s['chi_eff'],
+        chi_p=s['chi_p'], spin1_a=s['a_1'], spin2_a=s['a_2'],
+        spin1_azimuthal=s['phi_1'], spin2_azimuthal=s['phi_2'],
+        spin1_polar=np.arccos(s['cos_tilt_1']), spin2_polar=np.arccos(s['cos_tilt_2']),
+        tc=s['geocent_time'], ra=s['ra'], dec=s['dec'],
+        distance=s['luminosity_distance'], redshift=s['redshift'],
+        comoving_volume=4 / 3 * np.pi * comoving_distance ** 3,
+        inclination=s['theta_jn'], polarization=s['psi'],
+        loglikelihood=s['log_likelihood'],
+        logprior=np.zeros_like(s['log_likelihood']),
+        logjacobian=np.zeros_like(s['log_likelihood']),
+    )
+    with h5py.File(fname, mode='w') as h5file:
+        group = h5file.create_group("samples")
+        for key, value in columns.items():
+            group.create_dataset(key, data=value, compression=compression)
+
+
+def write_lvc_file(fname: str, s: Dict[str, np.ndarray], compression=None, **kwargs):
+    """hdf5 file with an 'Overall_posterior' compound dataset (fields of
+    lvc_gwtc1_parser.SEARCH_PARAMS)"""
+    columns = dict(
+        luminosity_distance_Mpc=s['luminosity_distance'],
+        m1_detector_frame_Msun=s['mass_1'],
+        m2_detector_frame_Msun=s['mass_2'],
+        right_ascension=s['ra'],
+        declination=s['dec'],
+        costheta_jn=np.cos(s['theta_jn']),
+        spin1=s['a_1'],
+        costilt1=s['cos_tilt_1'],
+        spin2=s['a_2'],
+        costilt2=s['cos_tilt_2'],
+    )
+    with h5py.File(fname, mode='w') as h5file:
+        _create_compound_dataset(h5file, "Overall_posterior", columns, compression)
+
+
+def write_bilby_file(fname: str, s: Dict[str, np.ndarray], compression=None, **kwargs):
+    """bilby result file with a 'posterior/<param>' dataset per parameter"""
+    with h5py.File(fname, mode='w') as h5file:
+        group = h5file.create_group("posterior")
+        for key, value in s.items():
+            group.create_dataset(key, data=value, compression=compression)
+
+
+def _create_compound_dataset(h5file, path: str, columns: Dict[str, np.ndarray], compression):
+    n_samples = len(next(iter(columns.values())))
+    data = np.empty(n_samples, dtype=[(key, 'f8') for key in columns])
+    for key, value in columns.items():
+        data[key] = value
+    chunks = True if compression else None
+    h5file.create_dataset(path, data=data, compression=compression, chunks=chunks)
+
+
+def _ias_fname(utc: datetime.datetime) -> str:
+    return f"GW{utc:%y%m%d}.npy"
+
+
+def _pycbc_fname(utc: datetime.datetime) -> str:
+    return f"H1L1V1-EXTRACT_POSTERIOR_{utc:%y%m%d_%HH_%MM_%S}UTC-0-1.hdf"
+
+
+def _gwtc1_fname(utc: datetime.datetime) -> str:
+    return f"GW{utc:%y%m%d}_GWTC-1.hdf5"
+
+
+def _gwtc2_fname(utc: datetime.datetime) -> str:
+    return f"GW{utc:%y%m%d_%H%M%S}.h5"
+
+
+def _bilby_fname(utc: datetime.datetime) -> str:
+    return f"GW{utc:%y%m%d_%H%M%S}_result.h5"
+
+
+# {catalog name: (file name of the event at a UTC time, file writer)}
+SYNTHETIC_WRITERS = {
+    "IAS": (_ias_fname, write_ias_file),
+    "PyCBC": (_pycbc_fname, write_pycbc_file),
+    "GWTC-1": (_gwtc1_fname, write_lvc_file),
+    "GWTC-2": (_gwtc2_fname, write_lvc_file),
+    "bilby": (_bilby_fname, write_bilby_file),
+}
+
+
+def write_synthetic_catalog(
+        catalog: str,
+        data_dir: str,
+        n_events: Optional[int] = 10,
+        n_samples: Optional[int] = 5000,
+        seed: Optional[int] = 0,
+        compression: Optional[str] = None
+) -> List[str]:
+    """Write n_events synthetic posterior files in the layout of catalog.
+
+    :param catalog: one of SYNTHETIC_WRITERS
+    :param compression: h5py compression of the HDF5 datasets (eg "gzip")
+    :return: the written files
+    """
+    if catalog not in SYNTHETIC_WRITERS:
+        raise ValueError(f"Catalog {catalog} not in {list(SYNTHETIC_WRITERS.keys())}")
+    get_fname, write_file = SYNTHETIC_WRITERS[catalog]
+    rng = np.random.default_rng(seed)
+    os.makedirs(data_dir, exist_ok=True)
+    files = []
+    for utc in get_synthetic_event_times(n_events, FIRST_EVENT_DATE[catalog], rng):
+        gps = utc_to_gps(utc)
+        fname = os.path.join(data_dir, get_fname(utc))
+        write_file(fname, draw_event_samples(n_samples, gps, rng),
+                   gps=gps, compression=compression)
+        files.append(fname)
+    return files
+
+
+def write_synthetic_catalogs(
+        out_dir: str,
+        catalogs: Optional[List[str]] = None,
+        **kwargs
+) -> Dict[str, str]:
+    """Write a synthetic catalog per catalog into out_dir/<catalog>
+
+    :param catalogs: catalogs to write (default: all of SYNTHETIC_WRITERS)
+    :param kwargs: passed to write_synthetic_catalog
+    :return: {catalog: data_dir}
+    """
+    catalogs = list(SYNTHETIC_WRITERS.keys()) if catalogs is None else catalogs
+    data_dirs = {}
+    for catalog in catalogs:
+        data_dirs[catalog] = os.path.join(out_dir, catalog)
+        write_synthetic_catalog(catalog, data_dirs[catalog], **kwargs)
+    return data_dirs
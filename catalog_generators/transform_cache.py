@@ -0,0 +1,143 @@
+"""On-disk, content-addressed cache of derived sample columns.
+
+A derived array is stored under the hash of the transform name, the names of
+its outputs and the bytes (and dtype/shape) of its input arrays, so the same
+samples converted by the same transform hit the same entry whichever parser,
+run or process computes them (eg the GWTC-1 and GWTC-2 parsers share the
+"component_masses" transform). Entries are .npy files, written atomically and
+loaded memory-mapped. The least recently used entries are evicted once the
+cache grows beyond max_bytes.
+
+The cache is used by gwosc_conversion.derive_columns when a cache dir is
+configured: get_transform_cache() returns one in <cache dir>/transforms, with
+the cache dir taken from the CATALOG_GENERATORS_CACHE_DIR environment
+variable (set by the cli --cache-dir).
+
+Example usage:
+
+    cache = TransformCache("~/.cache/catalog_generators/transforms", max_bytes=2 ** 30)
+    chirp_mass = cache.compute("chirp_mass", component_masses_to_chirp_mass, m1, m2)
+
+"""
+import hashlib
+import os
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from . import profiling
+from .atomic_file import atomic_write
+from .cosmology import CACHE_DIR_ENV
+
+CACHE_SIZE_ENV = "CATALOG_GENERATORS_CACHE_SIZE_MB"
+DEFAULT_MAX_BYTES = 2 ** 30
+TRANSFORMS_SUBDIR = "transforms"
+ENTRY_SUFFIX = ".npy"
+
+
+def array_digest(hasher, array: np.ndarray):
+    """Add the dtype, shape and bytes of array to hasher"""
+    array = np.ascontiguousarray(array)
+    hasher.update(f"{array.dtype.str}{array.shape}".encode())
+    hasher.update(memoryview(array).cast("B"))
+
+
+def transform_key(name: str, arrays: List[np.ndarray]) -> str:
+    hasher = hashlib.blake2b(name.encode(), digest_size=20)
+    for array in arrays:
+        array_digest(hasher, array)
+    return hasher.hexdigest()
+
+
+class TransformCache:
+
+    def __init__(self, cache_dir: str, max_bytes: Optional[int] = DEFAULT_MAX_BYTES):
+        """
+        :param max_bytes: entries are evicted (least recently used first) when
+            the cache is larger than this
+        """
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def fname(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ENTRY_SUFFIX)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """The (read-only, memory-mapped) array cached under key, or None"""
+        fname = self.fname(key)
+        try:
+            value = np.load(fname, mmap_mode='r')
+            # the mtime orders the entries for eviction
+            os.utime(fname)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # unreadable entry
+            self._remove(fname)
+            return None
+        return value
+
+    def put(self, key: str, value: np.ndarray):
+        fname = self.fname(key)
+        with atomic_write(fname, 'wb') as f:
+            np.save(f, np.ascontiguousarray(value))
+        self.evict()
+
+    def compute(self, name: str, func: Callable, *arrays: np.ndarray) -> np.ndarray:
+        """func(*arrays), cached under the name and the contents of arrays"""
+        key = transform_key(name, arrays)
+        value = self.get(key)
+        if value is None:
+            profiling.count("transform_cache_misses")
+            value = func(*arrays)
+            self.put(key, value)
+        else:
+            profiling.count("transform_cache_hits")
+        return value
+
+    def entries(self) -> List[os.DirEntry]:
+        return [e for e in os.scandir(self.cache_dir)
+                if e.is_file() and e.name.endswith(ENTRY_SUFFIX)]
+
+    def size(self) -> int:
+        return sum(self._stat(e).st_size for e in self.entries())
+
+    def evict(self):
+        """Remove the least recently used entries until the cache fits max_bytes"""
+        entries = sorted(self.entries(), key=lambda e: self._stat(e).st_mtime_ns)
+        total = sum(self._stat(e).st_size for e in entries)
+        for entry in entries:
+            if total <= self.max_bytes:
+                break
+            total -= self._stat(entry).st_size
+            self._remove(entry.path)
+
+    def clear(self):
+        for entry in self.entries():
+            self._remove(entry.path)
+
+    @staticmethod
+    def _stat(entry: os.DirEntry) -> os.stat_result:
+        try:
+            return entry.stat()
+        except FileNotFoundError:
+            # removed by another process: sorts first and takes no space
+            return os.stat_result((0,) * 10)
+
+    @staticmethod
+    def _remove(fname: str):
+        try:
+            os.remove(fname)
+        except FileNotFoundError:
+            pass
+
+
+def get_transform_cache() -> Optional[TransformCache]:
+    """The TransformCache of the configured cache dir (None if not configured)"""
+    cache_dir = os.environ.get(CACHE_DIR_ENV)
+    if not cache_dir:
+        return None
+    size_mb = os.environ.get(CACHE_SIZE_ENV)
+    max_bytes = int(float(size_mb) * 2 ** 20) if size_mb else DEFAULT_MAX_BYTES
+    return TransformCache(os.path.join(cache_dir, TRANSFORMS_SUBDIR), max_bytes)
@@ -1,14 +1,15 @@
 import json
 import re
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
-import corner
 import numpy as np
-from astropy import units
-from astropy.cosmology import Planck15
-from scipy.interpolate import interp1d
+from . import event_keys, profiling
+from .cosmology import luminosity_distance_to_redshift
 
-from . import event_keys
+# max bytes of resample counts held at once by bootstrap_quantiles
+BOOTSTRAP_CHUNK_BYTES = 2 ** 26
+# samples per block when searching the order statistics of the resamples
+ORDER_STATISTIC_BLOCK = 64
 
 
 def summarise_samples(
@@ -18,12 +19,202 @@ def summarise_samples(
     """Converts df to lower upper median valus
     :return: lower, upper, median
     """
-    qtles = corner.quantile(x=samples, q=quantiles)
-    return (
-        qtles[0],
-        qtles[1],
-        np.median(samples)
-    )
+    lower, upper, median = summarise_samples_matrix(
+        np.asarray(samples, dtype=float)[:, None], quantiles)
+    return lower[0], upper[0], median[0]
+
+
+def summarise_samples_matrix(
+        samples: np.ndarray,
+        quantiles: Optional[List[float]] = [0.16, 0.84],
+        weights: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Lower, upper and median of every column of a (n_samples, n_params) array.
+
+    Unweighted samples need a single np.partition along the sample axis and give
+    the same numbers as corner.quantile (np.percentile) and np.median. Weighted
+    samples use the same weighted cdf interpolation as corner.quantile (also for
+    the median).
+
+    :return: lower, upper, median (arrays of length n_params)
+    """
+    samples = np.asarray(samples, dtype=float)
+    if weights is not None:
+        return _weighted_quantiles(samples, [*quantiles, 0.5], weights)
+
+    n = len(samples)
+    positions, below, above = _quantile_positions(n, quantiles)
+    kth = np.unique(np.concatenate([below, above]))
+    part = np.partition(samples, kth, axis=0)
+    qtles, median = _interpolate_quantiles(n, positions, below, part[below], part[above])
+
+    nans = np.isnan(samples).any(axis=0)
+    qtles[:, nans] = np.nan
+    median = np.where(nans, np.nan, median)
+    return qtles[0], qtles[1], median
+
+
+def _quantile_positions(n: int, quantiles: List[float]):
+    """Positions of the quantiles (and median) in n sorted samples, and the
+    order statistics below/above them"""
+    positions = np.array([*quantiles, 0.5]) * (n - 1)
+    below = np.floor(positions).astype(int)
+    above = np.minimum(below + 1, n - 1)
+    return positions, below, above
+
+
+def _interpolate_quantiles(n, positions, below, a, b):
+    """Quantiles from the order statistics a (below) and b (above) of each
+    position (first axis)
+    :return: quantiles (the last one at the median position), median
+    """
+    # linear interpolation, written as in np.percentile(method="linear")
+    t = (positions - below).reshape(-1, *[1] * (a.ndim - 1))
+    diff = b - a
+    qtles = np.where(t >= 0.5, b - diff * (1 - t), a + diff * t)
+    # np.median averages the two middle samples
+    median = qtles[-1] if n % 2 else (a[-1] + b[-1]) / 2
+    return qtles, median
+
+
+def _weighted_quantiles(samples, quantiles, weights):
+    """Vectorised version of the weighted branch of corner.quantile"""
+    order = np.argsort(samples, axis=0)
+    sorted_samples = np.take_along_axis(samples, order, axis=0)
+    cdf = np.cumsum(np.asarray(weights, dtype=float)[order], axis=0)[:-1]
+    cdf /= cdf[-1]
+    cdf = np.vstack([np.zeros((1, samples.shape[1])), cdf])
+
+    cols = np.arange(samples.shape[1])
+    qtles = []
+    for q in quantiles:
+        i = np.clip((cdf <= q).sum(axis=0) - 1, 0, len(cdf) - 2)
+        lo, hi = cdf[i, cols], cdf[i + 1, cols]
+        x_lo, x_hi = sorted_samples[i, cols], sorted_samples[i + 1, cols]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.where(hi > lo, (q - lo) / (hi - lo), 1.0)
+        qtles.append(np.where(q >= 1, sorted_samples[-1], x_lo + t * (x_hi - x_lo)))
+    return tuple(qtles)
+
+
+def summarise_dataframe(
+        samples_df,
+        quantiles: Optional[List[float]] = [0.16, 0.84],
+        weights: Optional[np.ndarray] = None
+) -> Dict[str, float]:
+    """Summarise all columns of a df of samples in one batched pass
+    :return: dict of {param}_lower, {param}_upper and {param} (median)
+    """
+    with profiling.timer("quantiles"):
+        lower, upper, median = summarise_samples_matrix(
+            samples_df.to_numpy(dtype=float), quantiles, weights)
+    return summary_dict(list(samples_df.columns), lower, upper, median)
+
+
+def summary_dict(params: List[str], lower, upper, median) -> Dict[str, float]:
+    """dict of {param}_lower, {param}_upper and {param} (median)"""
+    summary = {}
+    for i, param in enumerate(params):
+        summary[f"{param}_lower"] = float(lower[i])
+        summary[f"{param}_upper"] = float(upper[i])
+        summary[param] = float(median[i])
+    return summary
+
+
+def bootstrap_quantiles(
+        samples: np.ndarray,
+        n_bootstrap: int,
+        rng: np.random.Generator,
+        quantiles: Optional[List[float]] = [0.16, 0.84],
+        max_chunk_bytes: Optional[int] = BOOTSTRAP_CHUNK_BYTES
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Lower, upper and median of n_bootstrap resamples of the rows of a
+    (n_samples, n_params) array (the same values as summarise_samples_matrix of
+    each resample).
+
+    Each replicate resamples whole rows, ie the same indices for every
+    parameter, and is held as the number of times each row was drawn. The
+    columns are sorted once, so the order statistics of a replicate are found
+    from its cumulative counts (in sorted order) rather than a partition of
+    the resampled samples. The replicates are processed in chunks holding at
+    most max_chunk_bytes of counts.
+
+    :return: lower, upper, median (arrays of shape (n_bootstrap, n_params))
+    """
+    samples = np.asarray(samples, dtype=float)
+    n, n_params = samples.shape
+    positions, below, above = _quantile_positions(n, quantiles)
+    ranks = np.concatenate([below, above])
+    order = np.argsort(samples, axis=0)
+    sorted_samples = np.take_along_axis(samples, order, axis=0)
+
+    chunk_size = int(max(1, min(n_bootstrap, max_chunk_bytes // (24 * n))))
+    replicates = np.empty((3, n_bootstrap, n_params))
+    for start in range(0, n_bootstrap, chunk_size):
+        size = min(chunk_size, n_bootstrap - start)
+        indices = rng.integers(0, n, size=(size, n))
+        counts = np.bincount(
+            (indices + np.arange(size)[:, None] * n).ravel(), minlength=size * n
+        ).reshape(size, n)
+        for j in range(n_params):
+            found = _order_statistic_positions(counts[:, order[:, j]], ranks)
+            values = sorted_samples[found, j].T
+            qtles, median = _interpolate_quantiles(
+                n, positions, below, values[:len(below)], values[len(below):])
+            replicates[:, start:start + size, j] = qtles[0], qtles[1], median
+
+    nans = np.isnan(samples).any(axis=0)
+    replicates[:, :, nans] = np.nan
+    return replicates[0], replicates[1], replicates[2]
+
+
+def bootstrap_dataframe(
+        samples_df,
+        n_bootstrap: int,
+        rng: np.random.Generator,
+        quantiles: Optional[List[float]] = [0.16, 0.84]
+) -> Dict[str, np.ndarray]:
+    """summarise_dataframe of n_bootstrap resamples of the rows of samples_df
+    :return: dict of {param}_lower, {param}_upper and {param} (arrays of the
+        n_bootstrap replicates)
+    """
+    with profiling.timer("bootstrap"):
+        lower, upper, median = bootstrap_quantiles(
+            samples_df.to_numpy(dtype=float), n_bootstrap, rng, quantiles)
+    replicates = {}
+    for i, param in enumerate(samples_df.columns):
+        replicates[f"{param}_lower"] = lower[:, i]
+        replicates[f"{param}_upper"] = upper[:, i]
+        replicates[param] = median[:, i]
+    return replicates
+
+
+def _order_statistic_positions(
+        sorted_counts: np.ndarray,
+        ranks: np.ndarray,
+        block: Optional[int] = ORDER_STATISTIC_BLOCK
+) -> np.ndarray:
+    """Positions (in sorted order) of the rank-th order statistics of each
+    resample, ie the first sample with more than rank draws up to it.
+
+    Only the block of samples holding each order statistic (found from the
+    cumulative block sums) is accumulated sample by sample.
+
+    :param sorted_counts: (n_resamples, n_samples) draws of each sorted sample
+    :return: (n_resamples, len(ranks)) array
+    """
+    size, n = sorted_counts.shape
+    n_blocks = -(-n // block)
+    blocks = np.zeros((size, n_blocks * block), dtype=sorted_counts.dtype)
+    blocks[:, :n] = sorted_counts
+    blocks = blocks.reshape(size, n_blocks, block)
+    block_cumulative = blocks.sum(axis=2).cumsum(axis=1)
+    in_block = (block_cumulative[:, None, :] <= ranks[None, :, None]).sum(axis=2)
+    before = np.where(in_block > 0, np.take_along_axis(
+        block_cumulative, np.maximum(in_block - 1, 0), axis=1), 0)
+    cumulative = np.cumsum(blocks[np.arange(size)[:, None], in_block], axis=2)
+    cumulative += before[..., None]
+    return in_block * block + (cumulative <= ranks[None, :, None]).sum(axis=2)
 
 
 def dict_to_json(json_fname, data_dict):
@@ -37,9 +228,9 @@ def sort_parameters(samples_standardising_func):
     def wrap(*args, **kwargs):
         samples = samples_standardising_func(*args, **kwargs)
         missing_params = event_keys.REQUIRED_PARAMETERS - set(samples.columns.values)
-        if len(missing_params)>1:
+        if missing_params:
             raise ValueError(f"The samples are missing values for {missing_params}")
-        return samples[event_keys.REQUIRED_PARAMETERS]
+        return samples[sorted(event_keys.REQUIRED_PARAMETERS)]
 
     return wrap
 
@@ -49,10 +240,8 @@ def get_event_name(fname):
 
 
 def get_redshift_from_dl(dl):
-    z_array = np.expm1(np.linspace(np.log(1), np.log(11), 1000))
-    distance_array = Planck15.luminosity_distance(z_array).to(units.Mpc).value
-    z_of_d = interp1d(distance_array, z_array)
-    return z_of_d(dl)
+    return luminosity_distance_to_redshift(dl)
+
 
 def add_aligned_component_spins(df):
     df['spin_1x'], df['spin_1y'], df['spin_1z'] = 0, 0, 1
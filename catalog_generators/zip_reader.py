@@ -0,0 +1,134 @@
+"""Open HDF5 files inside zip archives without unpacking them to disk.
+
+A file inside an archive is addressed as "<archive>.zip::<member>", eg
+"data/bilby/gwtc1/pesummary_samples.zip::GW150914.h5", and can be passed to
+hdf5_reader.open_hdf5 (and so to the parsers) like a regular filename.
+
+Members stored without compression (the usual case for already compressed
+HDF5 files) are read in place, seeking straight to the bytes h5py asks for.
+Deflated members cannot be seeked efficiently, so they are decompressed once
+into a spooled temporary file: members up to SPOOL_MAX_SIZE bytes stay in
+memory, larger ones are written to disk in blocks of EXTRACT_CHUNK_SIZE bytes.
+
+Example usage:
+
+    for member in list_zip_members("pesummary_samples.zip", "*.h5"):
+        with open_hdf5(member) as h5file:
+            ...
+
+"""
+import fnmatch
+import io
+import os
+import shutil
+import struct
+import tempfile
+import zipfile
+from typing import List, Tuple
+
+ZIP_MEMBER_SEPARATOR = "::"
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+EXTRACT_CHUNK_SIZE = 2 ** 16
+SPOOL_MAX_SIZE = 2 ** 20
+
+
+def is_zip_member(path: str) -> bool:
+    return ZIP_MEMBER_SEPARATOR in str(path)
+
+
+def split_zip_member(path: str) -> Tuple[str, str]:
+    """:return: archive filename, member name"""
+    archive, member = str(path).split(ZIP_MEMBER_SEPARATOR, 1)
+    return archive, member
+
+
+def join_zip_member(archive: str, member: str) -> str:
+    return f"{archive}{ZIP_MEMBER_SEPARATOR}{member}"
+
+
+def list_zip_members(archive: str, pattern: str = "*") -> List[str]:
+    """Sorted "<archive>::<member>" paths of the members whose basename
+    matches pattern"""
+    with zipfile.ZipFile(archive) as zf:
+        members = [
+            info.filename for info in zf.infolist()
+            if not info.is_dir() and fnmatch.fnmatch(os.path.basename(info.filename), pattern)
+        ]
+    return [join_zip_member(archive, m) for m in sorted(members)]
+
+
+def get_zip_member_info(path: str) -> zipfile.ZipInfo:
+    archive, member = split_zip_member(path)
+    with zipfile.ZipFile(archive) as zf:
+        return zf.getinfo(member)
+
+
+def open_zip_member(path: str, in_memory: bool = False) -> io.IOBase:
+    """Seekable read-only file object of an archive member
+
+    :param in_memory: decompress a deflated member into memory whatever its
+        size (else into a temporary file spooled to disk above SPOOL_MAX_SIZE)
+    """
+    archive, member = split_zip_member(path)
+    with zipfile.ZipFile(archive) as zf:
+        info = zf.getinfo(member)
+        if info.compress_type == zipfile.ZIP_STORED and not info.flag_bits & 0x1:
+            return StoredMemberFile(archive, info)
+        if in_memory:
+            return io.BytesIO(zf.read(info))
+        extracted = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        with zf.open(info) as source:
+            shutil.copyfileobj(source, extracted, EXTRACT_CHUNK_SIZE)
+        extracted.seek(0)
+        return extracted
+
+
+class StoredMemberFile(io.RawIOBase):
+    """Random access to the bytes of an uncompressed archive member"""
+
+    def __init__(self, archive: str, info: zipfile.ZipInfo):
+        super().__init__()
+        self._file = open(archive, 'rb')
+        self._file.seek(info.header_offset)
+        header = _LOCAL_HEADER.unpack(self._file.read(_LOCAL_HEADER.size))
+        if header[0] != zipfile.stringFileHeader:
+            self._file.close()
+            raise zipfile.BadZipFile(f"Bad local header of {info.filename} in {archive}")
+        fname_length, extra_length = header[-2:]
+        self.start = info.header_offset + _LOCAL_HEADER.size + fname_length + extra_length
+        self.size = info.file_size
+        self.position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        if offset < 0:
+            raise ValueError(f"Negative seek position {offset}")
+        self.position = offset
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        n_bytes = min(len(buffer), self.size - self.position)
+        if n_bytes <= 0:
+            return 0
+        self._file.seek(self.start + self.position)
+        n_bytes = self._file.readinto(memoryview(buffer)[:n_bytes])
+        self.position += n_bytes
+        return n_bytes
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+        super().close()
@@ -1,8 +1,11 @@
 import os
 
-from tqdm import tqdm
+from catalog_generators.downloader import download_all, parse_data_files
 
 DATA_FILE = "data_files.txt"
+# size and sha256 of the downloaded files (recorded on the first download)
+DOWNLOAD_MANIFEST = "data_files.manifest.json"
+N_WORKERS = 4
 
 
 def makedirs():
@@ -13,10 +16,8 @@ def makedirs():
 
 
 def download_data():
-    download_commands = open(DATA_FILE, "r").read().split('\n')
-    download_commands = [f"wget -q {c}" for c in download_commands if c]
-    for command in tqdm(download_commands, desc="Downloading LVC Event Samples"):
-        os.system(command)
+    download_all(parse_data_files(DATA_FILE), manifest_fname=DOWNLOAD_MANIFEST,
+                 n_workers=N_WORKERS)
 
 
 def main():
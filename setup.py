@@ -21,6 +21,9 @@ setup(
     keywords="example documentation tutorial",
     url="http://packages.python.org/an_example_pypi_project",
     packages=['catalog_generators'],
+    entry_points={
+        "console_scripts": ["catalog-generators=catalog_generators.cli:main"],
+    },
     long_description=read('README.md'),
     classifiers=[
         "Development Status :: 3 - Alpha",
@@ -0,0 +1,59 @@
+import os
+import tempfile
+import unittest
+
+from catalog_generators.atomic_file import AtomicFile, atomic_write
+
+
+class AtomicFileTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.fname = os.path.join(self.tmp_dir.name, "file.json")
+        with open(self.fname, 'w') as f:
+            f.write("old")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read(self) -> str:
+        with open(self.fname) as f:
+            return f.read()
+
+    def test_commit(self):
+        with atomic_write(self.fname) as f:
+            f.write("new")
+            self.assertEqual(self.read(), "old")
+        self.assertEqual(self.read(), "new")
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["file.json"])
+
+    def test_discard(self):
+        with self.assertRaises(RuntimeError):
+            with atomic_write(self.fname, 'wb') as f:
+                f.write(b"partial")
+                raise RuntimeError
+        self.assertEqual(self.read(), "old")
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["file.json"])
+
+        output = AtomicFile(self.fname)
+        output.file.write("partial")
+        output.discard()
+        output.discard()
+        self.assertEqual(self.read(), "old")
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["file.json"])
+
+    def test_concurrent_writers(self):
+        # each writer has its own temporary file, the last one to commit wins
+        first, second = AtomicFile(self.fname), AtomicFile(self.fname)
+        self.assertNotEqual(first.tmp_fname, second.tmp_fname)
+        self.assertIn(f".{os.getpid()}.", first.tmp_fname)
+        first.file.write("first")
+        second.file.write("second")
+        second.commit()
+        first.commit()
+        self.assertEqual(self.read(), "first")
+        self.assertEqual(os.listdir(self.tmp_dir.name), ["file.json"])
+
+
+if __name__ == '__main__':
+    unittest.main()
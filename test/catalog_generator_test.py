@@ -0,0 +1,134 @@
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import h5py
+import numpy as np
+import pandas as pd
+
+from catalog_generators import bilby_parser, event_keys, lvc_gwtc2_parser, synthetic_data
+from catalog_generators.catalog_generator import (
+    CATALOG_REGISTRY,
+    CatalogGenerator,
+    get_catalog_generator,
+    get_catalog_names,
+    register_catalog
+)
+from catalog_generators.cosmology import luminosity_distance_to_redshift
+from catalog_generators.event_keys import GWOSC_KEYS
+from catalog_generators.utils import sort_parameters
+
+
+class CatalogGeneratorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_registry(self):
+        self.assertEqual(sorted(get_catalog_names()),
+                         sorted(["IAS", "PyCBC", "GWTC-1", "GWTC-2", "bilby"]))
+        with self.assertRaises(ValueError):
+            get_catalog_generator("GWTC-0")
+
+        @register_catalog
+        class DummyCatalog(CatalogGenerator):
+            name = "dummy"
+
+        try:
+            self.assertIs(get_catalog_generator("dummy"), DummyCatalog)
+        finally:
+            del CATALOG_REGISTRY["dummy"]
+
+    def test_executor_parity(self):
+        data_dir = os.path.join(self.tmp_dir.name, "gwtc1")
+        synthetic_data.write_synthetic_catalog("GWTC-1", data_dir, n_events=3, n_samples=300)
+        generator_class = get_catalog_generator("GWTC-1")
+        catalogs = []
+        with ThreadPoolExecutor(2) as pool:
+            for executor in ["serial", "thread", "process", pool]:
+                out_fname = os.path.join(self.tmp_dir.name, f"catalog_{len(catalogs)}.json")
+                generator_class(data_dir, n_workers=2, executor=executor).generate(
+                    out_fname, incremental=False)
+                with open(out_fname) as f:
+                    catalogs.append(f.read())
+        self.assertEqual(len(set(catalogs)), 1)
+
+    def test_shared_summary(self):
+        data_dir = os.path.join(self.tmp_dir.name, "gwtc2")
+        synthetic_data.write_synthetic_catalog("GWTC-2", data_dir, n_events=2, n_samples=300)
+        generator = get_catalog_generator("GWTC-2")(data_dir, executor="serial")
+        summaries = generator.generate(os.path.join(self.tmp_dir.name, "gwtc2.json"))
+        for event_name, summary in summaries.items():
+            self.assertEqual(sorted(summary), sorted(GWOSC_KEYS))
+            self.assertEqual(summary['catalog.shortName'], "GWTC-2")
+            self.assertEqual(summary['reference'], lvc_gwtc2_parser.LvcGwtc2Catalog.reference)
+            self.assertEqual(summary['commonName'], event_name)
+            redshift = float(luminosity_distance_to_redshift(summary['luminosity_distance']))
+            self.assertAlmostEqual(summary['redshift'], redshift)
+            _, samples = generator.read_event_file(
+                next(f for f in generator.get_event_files()
+                     if generator.get_event_name(f) == event_name))
+            mass_1 = np.median(generator.convert_samples(samples)['mass_1'])
+            self.assertAlmostEqual(summary['mass_1_source'], mass_1 / (1 + redshift))
+
+    def test_sort_parameters(self):
+        required = sorted(event_keys.REQUIRED_PARAMETERS)
+
+        @sort_parameters
+        def standardise(columns):
+            return pd.DataFrame({c: np.zeros(2) for c in columns})
+
+        df = standardise(["extra"] + required[::-1])
+        self.assertEqual(list(df.columns), required)
+        with self.assertRaises(ValueError):
+            standardise(required[1:])
+
+    def test_gwtc2_event_names(self):
+        for fname, event_name in [
+            ("data/GW190521.h5", "GW190521"),
+            ("data/GW190521_074359.h5", "GW190521_074359"),
+            ("data/GW190412_prod.hdf5", "GW190412"),
+        ]:
+            self.assertEqual(lvc_gwtc2_parser.get_event_name(fname), event_name)
+
+    def test_bilby_layouts(self):
+        rng = np.random.default_rng(0)
+        samples = {"mass_1": rng.normal(30, size=50), "mass_2": rng.normal(20, size=50)}
+        compound = np.zeros(50, dtype=[(name, float) for name in samples])
+        for name, values in samples.items():
+            compound[name] = values
+        fname = os.path.join(self.tmp_dir.name, "GW150914_095045_pesummary.h5")
+        with h5py.File(fname, mode='w') as h5file:
+            h5file.create_dataset("C01:IMRPhenomPv2/posterior_samples", data=compound[::2])
+            h5file.create_dataset("PublicationSamples/posterior_samples", data=compound)
+            group = h5file.create_group("Other/posterior_samples")
+            group.create_dataset("samples", data=np.column_stack(list(samples.values()))[:10])
+            group.create_dataset("parameter_names", data=[n.encode() for n in samples])
+        self.assertEqual(bilby_parser.get_event_name(fname), "GW150914_095045")
+        self.assertEqual(bilby_parser.get_event_name(
+            "data/pesummary_samples.zip::samples/GW170817_GWTC-1.h5"), "GW170817")
+
+        # the preferred label, unless another one is asked for
+        event_name, df = bilby_parser.read_event_file(fname, parameters=["mass_2", "spin"])
+        self.assertEqual(list(df.columns), ["mass_2"])
+        np.testing.assert_array_equal(df['mass_2'], samples['mass_2'])
+        self.assertEqual(bilby_parser.count_event_samples(fname), 50)
+        _, df = bilby_parser.read_event_file(fname, label="Other")
+        np.testing.assert_array_equal(df['mass_1'], samples['mass_1'][:10])
+        self.assertEqual(bilby_parser.count_event_samples(fname, label="C01:IMRPhenomPv2"), 25)
+
+        # bilby results
+        data_dir = os.path.join(self.tmp_dir.name, "bilby")
+        files = synthetic_data.write_synthetic_catalog("bilby", data_dir, n_events=1, n_samples=40)
+        _, df = bilby_parser.read_event_file(files[0])
+        self.assertEqual(len(df), 40)
+        converted = bilby_parser.BilbyCatalog.convert_samples(df)
+        np.testing.assert_allclose(converted['total_mass'], df['mass_1'] + df['mass_2'])
+
+
+if __name__ == '__main__':
+    unittest.main()
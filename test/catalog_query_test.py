@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from catalog_generators import profiling, synthetic_data
+from catalog_generators.catalog_generator import get_catalog_generator
+from catalog_generators.catalog_query import Catalog
+
+
+def make_catalogs(n_events=200, seed=0):
+    rng = np.random.default_rng(seed)
+    catalogs = {}
+    for name in ["IAS", "PyCBC", "GWTC-1"]:
+        catalogs[name] = {
+            f"GW{i:04d}": {
+                "catalog.shortName": name,
+                "GPS": 1.1e9 + float(rng.uniform(0, 1e7)),
+                "mass_1_source": float(rng.uniform(5, 80)),
+                "luminosity_distance": float(rng.uniform(100, 5000)),
+                "network_matched_filter_snr": None if i % 3 else float(rng.uniform(8, 25)),
+            }
+            for i in range(n_events)
+        }
+    return catalogs
+
+
+class CatalogQueryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = Catalog(make_catalogs())
+        self.df = self.catalog.to_dataframe()
+
+    def tearDown(self):
+        profiling.disable_profiling()
+
+    def assert_rows(self, rows, mask):
+        self.assertEqual(list(rows), list(self.df[mask].index))
+
+    def test_filters(self):
+        df = self.df
+        rows = self.catalog.query({"mass_1_source": (30, 50),
+                                   "catalog.shortName": ["IAS", "PyCBC"]})
+        self.assert_rows(rows, df.mass_1_source.between(30, 50)
+                         & df["catalog.shortName"].isin(["IAS", "PyCBC"]))
+        rows = self.catalog.query({"luminosity_distance": (None, 1000),
+                                   "network_matched_filter_snr": (10, None)})
+        self.assert_rows(rows, (df.luminosity_distance <= 1000)
+                         & (df.network_matched_filter_snr >= 10))
+        self.assertEqual(self.catalog.count({"catalog.shortName": "GWTC-1"}), 200)
+        self.assertEqual(self.catalog.query({"catalog.shortName": "O3"}), ())
+
+    def test_repeated_values(self):
+        catalog = Catalog({"A": {"e1": {"GPS": 1.0, "catalog.shortName": "A"}}})
+        for condition in [[1, 1.0], [1, 1, np.float64(1)], [1.0, 2, 1]]:
+            self.assertEqual(len(catalog.query({"GPS": condition})), 1, condition)
+            self.assertEqual(catalog.count({"GPS": condition}), 1, condition)
+        self.assertEqual(catalog.count({"catalog.shortName": ["A", "A"]}), 1)
+
+    def test_top_k(self):
+        df = self.df
+        rows = self.catalog.top_k("mass_1_source", 5)
+        self.assertEqual(list(rows), list(df.mass_1_source.nlargest(5).index))
+        # selective and unselective filters
+        for low in [70, 6]:
+            rows = self.catalog.query({"mass_1_source": (low, None)}, order_by="GPS", limit=10)
+            self.assertEqual(list(rows), list(df[df.mass_1_source >= low].GPS.nsmallest(10).index))
+        rows = self.catalog.query({"catalog.shortName": "IAS"},
+                                  order_by="network_matched_filter_snr", descending=True)
+        self.assertEqual(len(rows), 67)
+
+    def test_results_are_cached(self):
+        profiling.enable_profiling()
+        for _ in range(3):
+            self.catalog.query({"mass_1_source": (30, 50)})
+        report = profiling.disable_profiling()
+        self.assertEqual(report['counters']['query_cache_misses'], 1)
+        self.assertEqual(report['counters']['query_cache_hits'], 2)
+
+    def test_from_catalog_files_and_manifests(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            synthetic_data.write_synthetic_catalog("GWTC-1", tmp_dir, n_events=3, n_samples=200)
+            fname = os.path.join(tmp_dir, "catalog.json")
+            get_catalog_generator("GWTC-1")(tmp_dir).generate(fname)
+            from_json = Catalog.from_catalog_files({"GWTC-1": fname})
+            from_manifest = Catalog.from_manifests({"GWTC-1": fname})
+        self.assertEqual(len(from_json), 3)
+        self.assertEqual(from_json.rows, from_manifest.rows)
+        self.assertEqual(from_json.top_k("mass_1_source", 1), from_manifest.top_k("mass_1_source", 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
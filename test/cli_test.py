@@ -0,0 +1,59 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from catalog_generators import cli
+from catalog_generators.synthetic_data import write_synthetic_catalog
+
+
+class CliTestCase(unittest.TestCase):
+
+    def test_builds_catalogs_concurrently(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_root, out_dir = os.path.join(tmp_dir, "data"), os.path.join(tmp_dir, "out")
+            write_synthetic_catalog("IAS", os.path.join(data_root, "ias_search"), n_events=2,
+                                    n_samples=500)
+            write_synthetic_catalog("GWTC-1", os.path.join(tmp_dir, "gwtc1"), n_events=3,
+                                    n_samples=500)
+            args = ["IAS", "GWTC-1", "--data-root", data_root, "--out-dir", out_dir,
+                    "--data-dir", f"GWTC-1={os.path.join(tmp_dir, 'gwtc1')}", "--jobs", "2",
+                    "--cache-dir", os.path.join(tmp_dir, "cache"),
+                    "--profile", os.path.join(tmp_dir, "profile.json")]
+            # main configures the caches of the worker processes in os.environ
+            with contextlib.redirect_stdout(io.StringIO()), mock.patch.dict(os.environ):
+                self.assertEqual(cli.main(args), 0)
+            for fname, n_events in [("ias_catalog.json", 2), ("gwtc1_catalog.json", 3)]:
+                with open(os.path.join(out_dir, fname)) as f:
+                    self.assertEqual(len(json.load(f)['events']), n_events)
+            with open(os.path.join(tmp_dir, "profile.json")) as f:
+                self.assertEqual(json.load(f)['counters']['files_read'], 5)
+            # the redshift lookup table and the derived columns
+            self.assertEqual(len(os.listdir(os.path.join(tmp_dir, "cache"))), 2)
+            self.assertGreater(len(os.listdir(os.path.join(tmp_dir, "cache", "transforms"))), 0)
+
+    def test_missing_data_dir_fails(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with contextlib.redirect_stdout(io.StringIO()), \
+                    contextlib.redirect_stderr(io.StringIO()) as stderr:
+                self.assertEqual(cli.main(["PyCBC", "--data-root", tmp_dir,
+                                           "--out-dir", tmp_dir]), 1)
+        self.assertIn("No data dir", stderr.getvalue())
+
+    def test_data_dir_of_unselected_catalog_fails(self):
+        for args in [["IAS", "--data-dir", "GWTC-1=gwtc1"], ["--data-dir", "GWTC-0=gwtc0"]]:
+            with contextlib.redirect_stderr(io.StringIO()) as stderr, \
+                    self.assertRaises(SystemExit):
+                cli.main(args)
+            self.assertIn("--data-dir given for catalogs that are not built", stderr.getvalue())
+
+    def test_catalog_fname(self):
+        self.assertEqual(cli.get_catalog_fname("GWTC-1", "out"), os.path.join("out", "gwtc1_catalog.json"))
+        self.assertEqual(cli.parse_data_dirs(["IAS=a=b"]), {"IAS": "a=b"})
+
+
+if __name__ == '__main__':
+    unittest.main()
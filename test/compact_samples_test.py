@@ -0,0 +1,60 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from catalog_generators import compact_samples, utils
+from catalog_generators.catalog_generator import get_catalog_generator
+from catalog_generators.synthetic_data import write_synthetic_catalog
+
+
+class CompactSamplesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        n = 10000
+        self.df = pd.DataFrame(dict(
+            mass_1=rng.normal(35, 5, n),
+            GPS=1126259462.4 + rng.normal(0, 0.01, n),
+            tiny_spread=1e6 + rng.normal(0, 1e-3, n),
+            incl=np.zeros(n),
+        ))
+        self.df = utils.add_aligned_component_spins(self.df)
+
+    def test_compact_dataframe(self):
+        compact = compact_samples.compact_dataframe(self.df)
+        self.assertEqual(list(compact.columns), list(self.df.columns))
+        self.assertEqual(compact['mass_1'].dtype, np.float32)
+        # float32 would lose the spread of these
+        self.assertEqual(compact['GPS'].dtype, np.float64)
+        self.assertEqual(compact['tiny_spread'].dtype, np.float64)
+        for column in ['incl', 'spin_1x', 'spin_1z']:
+            self.assertIsInstance(compact[column].dtype, pd.SparseDtype)
+            np.testing.assert_array_equal(compact[column].to_numpy(), self.df[column])
+        self.assertLess(compact_samples.memory_usage(compact),
+                        0.5 * compact_samples.memory_usage(self.df))
+
+        summary = utils.summarise_dataframe(compact)
+        expected = utils.summarise_dataframe(self.df)
+        for key, value in expected.items():
+            self.assertAlmostEqual(summary[key], value, delta=1e-6 * max(abs(value), 1))
+
+    def test_compact_generator_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_synthetic_catalog("GWTC-1", tmp_dir, n_events=2, n_samples=1000)
+            generator = get_catalog_generator("GWTC-1")(tmp_dir, compact=True)
+            events = generator.make_events_gwosc_compatible(
+                generator.load_catalog_event_samples())
+        self.assertEqual(set(generator.memory_report), set(events))
+        for usage in generator.memory_report.values():
+            self.assertLess(usage['after'], usage['before'])
+        report = compact_samples.format_memory_report(generator.memory_report)
+        self.assertIn("total", report)
+        for samples in events.values():
+            self.assertEqual(samples['mass_1'].dtype, np.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from catalog_generators import corner_plot
+
+PARAMETERS = ["mass_1", "mass_2", "ra"]
+
+
+class CornerPlotTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.samples = {
+            "LVC": pd.DataFrame(rng.normal(size=(2000, 3)), columns=PARAMETERS),
+            "IAS": pd.DataFrame(rng.normal(0.5, 1, size=(1000, 3)), columns=PARAMETERS),
+        }
+
+    def test_contour_levels(self):
+        x, y = np.random.default_rng(1).normal(size=(2, 100000))
+        histogram = corner_plot.histogram_2d(x, y, ((-5, 5), (-5, 5)), bins=50, smooth=None)
+        counts, levels = histogram['counts'], histogram['levels']
+        self.assertTrue(np.all(np.diff(levels) > 0))
+        for level, fraction in zip(levels[::-1], corner_plot.DEFAULT_LEVELS):
+            # the counts above each level hold (just under) its probability mass
+            self.assertAlmostEqual(counts[counts >= level].sum() / counts.sum(), fraction, 2)
+
+    def test_histograms_are_cached(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = corner_plot.HistogramCache(tmp_dir, n_workers=2)
+            fname = os.path.join(tmp_dir, "GW1.png")
+            corner_plot.plot_overlaid_corner(self.samples, "GW1", PARAMETERS, cache, fname)
+            self.assertTrue(os.path.exists(fname))
+            self.assertEqual(len(os.listdir(os.path.join(tmp_dir, "IAS", "GW1"))), 6)
+
+            with mock.patch.object(corner_plot, "_compute_histogram") as compute:
+                # from memory and (for a new cache) from disk
+                for cache in [cache, corner_plot.HistogramCache(tmp_dir)]:
+                    corner_plot.plot_overlaid_corner(self.samples, "GW1", PARAMETERS, cache)
+                compute.assert_not_called()
+
+            # changed samples are re-binned
+            self.samples["IAS"]["ra"] += 0.1
+            histograms = cache.get_histograms(
+                "IAS", "GW1", self.samples["IAS"], PARAMETERS,
+                corner_plot.get_ranges(list(self.samples.values()), PARAMETERS))
+            np.testing.assert_allclose(histograms[("ra",)]['quantiles'],
+                                       np.quantile(self.samples["IAS"]["ra"], [0.16, 0.84]))
+
+    def test_plot_overlapping_events(self):
+        catalogs = {"LVC": {"GW1": self.samples["LVC"], "GW2": self.samples["LVC"]},
+                    "IAS": {"GW1": self.samples["IAS"]}}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fnames = corner_plot.plot_overlapping_events(catalogs, PARAMETERS[:2], tmp_dir)
+            self.assertEqual(fnames, [os.path.join(tmp_dir, "GW1.png")])
+
+
+if __name__ == '__main__':
+    unittest.main()
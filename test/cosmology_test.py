@@ -0,0 +1,44 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from catalog_generators import cosmology
+from catalog_generators.cosmology import RedshiftInterpolator
+
+
+class RedshiftInterpolatorTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.interpolator = RedshiftInterpolator(z_max=2, rtol=1e-6)
+
+    def test_accuracy_bound(self):
+        z = np.linspace(1e-4, 2, 101)
+        dl = self.interpolator.exact_luminosity_distance(z)
+        np.testing.assert_allclose(self.interpolator(dl), z, rtol=1e-6)
+
+    def test_fallback_outside_grid(self):
+        dl = self.interpolator.exact_luminosity_distance(3.0)
+        self.assertAlmostEqual(self.interpolator(dl), 3.0, places=6)
+        self.assertTrue(np.isnan(self.interpolator(-1.0)))
+        self.assertEqual(self.interpolator(0.0), 0.0)
+
+    def test_grid_persisted_to_disk(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            saved = RedshiftInterpolator(z_max=2, cache_dir=cache_dir)
+            loaded = RedshiftInterpolator(z_max=2, cache_dir=cache_dir)
+            np.testing.assert_array_equal(saved.dl_grid, loaded.dl_grid)
+
+    def test_capped_grid_warns_and_is_not_persisted(self):
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch.object(cosmology, "MAX_GRID_POINTS", 1500):
+            with self.assertWarns(RuntimeWarning):
+                capped = RedshiftInterpolator(z_max=2, rtol=1e-9, cache_dir=cache_dir)
+            self.assertEqual(len(capped.z_grid), 1500)
+            self.assertEqual(os.listdir(cache_dir), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import functools
+import hashlib
+import http.server
+import os
+import tempfile
+import threading
+import unittest
+
+from catalog_generators import downloader
+
+
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Serves files with support for 'Range: bytes=<start>-' requests"""
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("Range")))
+        fname = self.translate_path(self.path)
+        if not os.path.isfile(fname):
+            self.send_error(404)
+            return
+        with open(fname, 'rb') as f:
+            data = f.read()
+        start = 0
+        if self.headers.get("Range"):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            if start >= len(data):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        self.wfile.write(data[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+class DownloaderTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.served = os.path.join(self.tmp_dir.name, "served")
+        self.out = os.path.join(self.tmp_dir.name, "out")
+        os.makedirs(self.served)
+        self.data = {f"GW15091{i}.npy": os.urandom(3 * 10 ** 5 + i) for i in range(3)}
+        for name, data in self.data.items():
+            with open(os.path.join(self.served, name), 'wb') as f:
+                f.write(data)
+        RangeRequestHandler.requests = []
+        handler = functools.partial(RangeRequestHandler, directory=self.served)
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{self.server.server_port}"
+        self.tasks = [(f"{url}/{name}", os.path.join(self.out, name)) for name in self.data]
+        self.manifest = os.path.join(self.tmp_dir.name, "manifest.json")
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    def download(self, tasks, **kwargs):
+        return downloader.download_all(
+            tasks, self.manifest, n_workers=2, backoff=0, **kwargs)
+
+    def test_deduplicates_and_skips_complete_files(self):
+        results = self.download(self.tasks + self.tasks[:2])
+        self.assertEqual([r['status'] for r in results], [downloader.DOWNLOADED] * 3)
+        for (_, target), data in zip(self.tasks, self.data.values()):
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), data)
+        manifest = downloader.load_download_manifest(self.manifest)
+        self.assertEqual(manifest[self.tasks[0][1]]['sha256'],
+                         hashlib.sha256(self.data["GW150910.npy"]).hexdigest())
+
+        results = self.download(self.tasks)
+        self.assertEqual([r['status'] for r in results], [downloader.SKIPPED] * 3)
+        self.assertEqual(len(RangeRequestHandler.requests), 3)
+
+    def test_resumes_partial_download(self):
+        url, target = self.tasks[0]
+        data = self.data["GW150910.npy"]
+        os.makedirs(self.out)
+        with open(target + downloader.PART_SUFFIX, 'wb') as f:
+            f.write(data[:1000])
+        result = downloader.download_file(url, target)
+        self.assertEqual(result['status'], downloader.RESUMED)
+        self.assertEqual(result['bytes'], len(data) - 1000)
+        self.assertEqual(RangeRequestHandler.requests[-1][1], "bytes=1000-")
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
+    def test_untracked_targets_are_checked_against_the_remote_size(self):
+        os.makedirs(self.out)
+        for (_, target), data, size in zip(self.tasks, self.data.values(), [None, 1000]):
+            with open(target, 'wb') as f:
+                f.write(data[:size])
+        results = self.download(self.tasks[:2])
+        self.assertEqual([r['status'] for r in results], [downloader.SKIPPED, downloader.RESUMED])
+        # (the complete one is only checked with a HEAD request)
+        self.assertEqual(RangeRequestHandler.requests, [("/GW150911.npy", "bytes=1000-")])
+        manifest = downloader.load_download_manifest(self.manifest)
+        for (_, target), data in zip(self.tasks[:2], self.data.values()):
+            with open(target, 'rb') as f:
+                self.assertEqual(f.read(), data)
+            self.assertEqual(manifest[target]['sha256'], hashlib.sha256(data).hexdigest())
+
+    def test_checksum_mismatch_fails(self):
+        url, target = self.tasks[0]
+        downloader.save_download_manifest(
+            self.manifest, {target: dict(url=url, sha256="0" * 64)})
+        with self.assertRaises(RuntimeError):
+            self.download(self.tasks[:1], retries=1)
+        self.assertFalse(os.path.exists(target))
+
+
+if __name__ == '__main__':
+    unittest.main()
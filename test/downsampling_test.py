@@ -0,0 +1,125 @@
+import math
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import h5py
+import numpy as np
+
+from catalog_generators.catalog_generator import get_catalog_generator
+from catalog_generators.downsampling import (
+    Downsampler,
+    autocorrelation_ess,
+    integrated_autocorrelation_time,
+    quantile_error_bound
+)
+from catalog_generators.manifest import CatalogManifest
+from catalog_generators.synthetic_data import write_synthetic_catalog
+
+
+def ar1_chain(n: int, rho: float, rng: np.random.Generator) -> np.ndarray:
+    """Chain with integrated autocorrelation time (1 + rho) / (1 - rho)"""
+    noise = rng.normal(size=n) * np.sqrt(1 - rho ** 2)
+    chain = np.empty(n)
+    chain[0] = rng.normal()
+    for i in range(1, n):
+        chain[i] = rho * chain[i - 1] + noise[i]
+    return chain
+
+
+class DownsamplingTestCase(unittest.TestCase):
+
+    def test_target_sizes(self):
+        self.assertEqual(Downsampler(n_samples=100).target_size(1000), 100)
+        self.assertEqual(Downsampler(n_samples=100).target_size(50), 50)
+        self.assertEqual(Downsampler(fraction=0.25).target_size(1000), 250)
+        self.assertEqual(Downsampler(ess=100).target_size(1000), 100)
+        # each row is worth half an independent sample
+        self.assertEqual(Downsampler(ess=100).target_size(1000, 500), 200)
+        with self.assertRaises(ValueError):
+            Downsampler(n_samples=10, fraction=0.1)
+
+    def test_autocorrelation_ess(self):
+        rng = np.random.default_rng(0)
+        independent = rng.normal(size=20000)
+        self.assertAlmostEqual(integrated_autocorrelation_time(independent), 1, delta=0.1)
+        chain = ar1_chain(20000, 0.9, rng)
+        self.assertAlmostEqual(integrated_autocorrelation_time(chain), 19, delta=3)
+        # the most correlated column
+        samples = np.column_stack([rng.normal(size=20000), chain])
+        self.assertAlmostEqual(autocorrelation_ess(samples), 20000 / 19, delta=200)
+        self.assertEqual(autocorrelation_ess(np.ones((10, 2))), 10)
+
+    def test_ess_target_of_correlated_chains(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, "data")
+            files = write_synthetic_catalog("PyCBC", data_dir, n_events=2, n_samples=5000)
+            with h5py.File(files[0], mode='a') as h5file:
+                h5file["samples/mass1"][:] = 30 + ar1_chain(5000, 0.9, np.random.default_rng(1))
+            catalog_cls = get_catalog_generator("PyCBC")
+            by_ess = catalog_cls(data_dir, downsampler=Downsampler(ess=100))
+            by_size = catalog_cls(data_dir, downsampler=Downsampler(n_samples=100))
+            # the thinned chain keeps ~tau times more rows, the independent one ess
+            self.assertGreater(len(by_ess.select_rows(files[0])), 1000)
+            self.assertEqual(len(by_size.select_rows(files[0])), 100)
+            self.assertLess(len(by_ess.select_rows(files[1])), 130)
+            report = by_ess.downsampling_report()
+            self.assertGreater(report[catalog_cls.get_event_name(files[0])]['n_selected'], 1000)
+
+            # the pilot read is capped, and its ess scaled to the whole file
+            ess = by_ess.estimate_ess(files[0])
+            with mock.patch.object(catalog_cls, "ess_pilot_rows", 2500), \
+                    mock.patch.object(catalog_cls, "read_event_file",
+                                      wraps=catalog_cls.read_event_file) as read_event_file:
+                self.assertAlmostEqual(by_ess.estimate_ess(files[0]), ess, delta=0.3 * ess)
+            self.assertEqual(read_event_file.call_args.kwargs['rows'], slice(0, 2500))
+
+    def test_selection_is_seeded_by_file(self):
+        for method in ["reservoir", "stratified"]:
+            downsampler = Downsampler(n_samples=100, method=method, seed=1)
+            rows = downsampler.select_rows(1000, "data/GW150914.h5")
+            self.assertEqual(len(rows), 100)
+            self.assertEqual(len(np.unique(rows)), 100)
+            self.assertTrue(np.all(np.diff(rows) > 0))
+            np.testing.assert_array_equal(rows, downsampler.select_rows(1000, "GW150914.h5"))
+            self.assertFalse(np.array_equal(rows, downsampler.select_rows(1000, "GW151012.h5")))
+        # one row in each block of 10
+        rows = Downsampler(n_samples=100, method="stratified").select_rows(1000, "a")
+        np.testing.assert_array_equal(rows // 10, np.arange(100))
+        self.assertIsNone(Downsampler(n_samples=1000).select_rows(1000, "a"))
+
+    def test_quantile_error_bound(self):
+        self.assertAlmostEqual(quantile_error_bound(1000, 0.05),
+                               math.sqrt(math.log(40) / 2000))
+        report = Downsampler(n_samples=1000).report(5000)
+        self.assertEqual(report['n_selected'], 1000)
+        self.assertEqual(Downsampler(n_samples=1000).report(500)['quantile_error'], 0.0)
+
+    def test_generator_reads_selected_rows(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, "data")
+            write_synthetic_catalog("PyCBC", data_dir, n_events=2, n_samples=1000)
+            catalog_cls = get_catalog_generator("PyCBC")
+            downsampler = Downsampler(n_samples=100)
+            generator = catalog_cls(data_dir, downsampler=downsampler)
+            file = generator.get_event_files()[0]
+            _, samples = generator._read_event_file(file, ["mass1"])
+            _, all_samples = catalog_cls.read_event_file(file, ["mass1"])
+            np.testing.assert_array_equal(
+                samples['mass1'], all_samples['mass1'].to_numpy()[
+                    downsampler.select_rows(1000, file)])
+
+            # the cached summaries are only reused with the same downsampler
+            out_catalog_fname = os.path.join(tmp_dir, "catalog.json")
+            generator.generate(out_catalog_fname)
+            settings = generator.manifest_settings()
+            self.assertEqual(settings['downsampler'], downsampler.settings())
+            self.assertEqual(len(CatalogManifest.load(
+                out_catalog_fname, catalog_cls.parser_version, settings=settings).entries), 2)
+            self.assertEqual(len(CatalogManifest.load(
+                out_catalog_fname, catalog_cls.parser_version).entries), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
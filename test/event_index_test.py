@@ -0,0 +1,58 @@
+import datetime
+import os
+import tempfile
+import unittest
+
+from catalog_generators import gps_time, synthetic_data
+from catalog_generators.catalog_generator import get_catalog_generator
+from catalog_generators.event_index import EventIndex
+
+
+class GpsTimeTestCase(unittest.TestCase):
+
+    def test_gps_from_event_name(self):
+        # GW150914 merged at GPS 1126259462.4
+        gps, half_width = gps_time.gps_from_event_name("GW150914_09H_50M_45UTC-0-1")
+        self.assertLessEqual(abs(gps - 1126259462.4), half_width)
+        gps, half_width = gps_time.gps_from_event_name("GW150914_GWTC-1")
+        self.assertLessEqual(abs(gps - 1126259462.4), half_width)
+        self.assertIsNone(gps_time.gps_from_event_name("S190425z"))
+
+    def test_round_trip(self):
+        utc = datetime.datetime(2019, 5, 21, 7, 43, 59)
+        self.assertEqual(gps_time.gps_to_utc(gps_time.utc_to_gps(utc)), utc)
+
+
+class EventIndexTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.n_events = 4
+        catalogs = {}
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # the same seed gives the same event times in every catalog
+            for catalog in ["IAS", "PyCBC", "GWTC-1"]:
+                data_dir = os.path.join(tmp_dir, catalog)
+                synthetic_data.write_synthetic_catalog(
+                    catalog, data_dir, n_events=self.n_events, n_samples=100)
+                catalogs[catalog] = get_catalog_generator(catalog)(data_dir).generate(
+                    os.path.join(tmp_dir, f"{catalog}.json"))
+        self.index = EventIndex(catalogs)
+
+    def test_query(self):
+        pycbc_gps = [gps for c, gps in zip(self.index.catalog, self.index.gps) if c == "PyCBC"]
+        matches = self.index.query(pycbc_gps[0], tolerance=1)
+        self.assertEqual(sorted(c for c, _, _ in matches), ["GWTC-1", "IAS", "PyCBC"])
+        self.assertEqual(self.index.query(pycbc_gps[0] - 10 ** 6), [])
+
+    def test_merged_catalog_links_every_catalog(self):
+        merged = self.index.merged_catalog()
+        self.assertEqual(len(merged), self.n_events)
+        for name, entry in merged.items():
+            self.assertEqual(set(entry['events']), {"IAS", "PyCBC", "GWTC-1"})
+            self.assertTrue(entry['events']['IAS'].startswith(name[:8]))
+        df = self.index.to_dataframe(parameters=["mass_1_source"])
+        self.assertEqual(df.shape, (self.n_events, 7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+
+from catalog_generators import cli, profiling, synthetic_data
+from catalog_generators.file_index import FileIndex
+
+
+class FileIndexTestCase(unittest.TestCase):
+
+    def tearDown(self):
+        profiling.disable_profiling()
+
+    def test_scan(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dirs = {"IAS": os.path.join(tmp_dir, "ias"), "GWTC-1": os.path.join(tmp_dir, "lvc")}
+            ias_files = synthetic_data.write_synthetic_catalog(
+                "IAS", data_dirs["IAS"], n_events=2, n_samples=300)
+            synthetic_data.write_synthetic_catalog("GWTC-1", data_dirs["GWTC-1"], n_events=3,
+                                                   n_samples=200)
+            with open(os.path.join(data_dirs["GWTC-1"], "GW170817_GWTC-1.hdf5"), "w") as f:
+                f.write("not hdf5")
+            fname = os.path.join(tmp_dir, "file_index.json")
+            index = FileIndex.load(fname)
+            self.assertEqual(len(index.scan(data_dirs)), 6)
+            index.save()
+
+            index = FileIndex.load(fname)
+            self.assertEqual(index.summary(), {
+                "IAS": dict(n_files=2, n_samples=600, size=index.summary()["IAS"]["size"], n_errors=0),
+                "GWTC-1": dict(n_files=4, n_samples=600, size=index.summary()["GWTC-1"]["size"],
+                               n_errors=1),
+            })
+            path, entry = index.files("IAS")[0]
+            self.assertEqual(entry['format'], "npy")
+            self.assertEqual(entry['columns']['mchirp'], "<f8")
+            self.assertEqual(index.get_current_entry(ias_files[0])['n_samples'], 300)
+            self.assertIsNotNone(entry['gps'])
+            _, entry = index.files("GWTC-1")[0]
+            self.assertEqual(entry['dataset'], "/Overall_posterior")
+
+            # only new/changed files are opened again, removed ones are dropped
+            os.remove(ias_files[1])
+            os.utime(ias_files[0], ns=(0, 0))
+            self.assertEqual(index.scan(data_dirs), [os.path.abspath(ias_files[0])])
+            self.assertEqual(index.summary()["IAS"]["n_files"], 1)
+            self.assertEqual(len(index.to_dataframe()), 5)
+
+    def test_cli_scan(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            synthetic_data.write_synthetic_catalog(
+                "PyCBC", os.path.join(tmp_dir, "pycbc_search"), n_events=2, n_samples=100)
+            with contextlib.redirect_stdout(io.StringIO()) as stdout:
+                self.assertEqual(cli.main(["PyCBC", "--scan", "--data-root", tmp_dir]), 0)
+            self.assertIn("PyCBC: 2 files, 200 samples", stdout.getvalue())
+            self.assertEqual(FileIndex.load(os.path.join(tmp_dir, "file_index.json"))
+                             .summary()["PyCBC"]["n_files"], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
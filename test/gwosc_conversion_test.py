@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+from bilby.gw import conversion as bilby_conversion
+
+from catalog_generators import gwosc_conversion, ias_parser, pycbc_parser
+
+
+class GwoscConversionTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.mass_1 = rng.uniform(20, 50, 1000)
+        self.mass_2 = rng.uniform(5, 20, 1000)
+        self.eta = rng.uniform(0.1, 0.25, 1000)
+
+    def test_formulas_match_bilby(self):
+        q = gwosc_conversion.symmetric_mass_ratio_to_mass_ratio(self.eta)
+        np.testing.assert_array_equal(
+            q, bilby_conversion.symmetric_mass_ratio_to_mass_ratio(self.eta))
+        np.testing.assert_array_equal(
+            gwosc_conversion.chirp_mass_and_mass_ratio_to_total_mass(self.mass_1, q),
+            bilby_conversion.chirp_mass_and_mass_ratio_to_total_mass(self.mass_1, q))
+        np.testing.assert_array_equal(
+            gwosc_conversion.component_masses_to_chirp_mass(self.mass_1, self.mass_2),
+            bilby_conversion.component_masses_to_chirp_mass(self.mass_1, self.mass_2))
+        for ours, theirs in zip(
+                gwosc_conversion.total_mass_and_mass_ratio_to_component_masses(q, self.mass_1),
+                bilby_conversion.total_mass_and_mass_ratio_to_component_masses(q, self.mass_1)):
+            np.testing.assert_array_equal(ours, theirs)
+
+    def test_aliases_and_input_columns_are_not_copied(self):
+        df = pd.DataFrame(dict(
+            mchirp=self.mass_1, eta=self.eta, s1z=self.eta, s2z=self.eta,
+            RA=self.mass_2, DEC=self.mass_2, tc=self.mass_1, DL=self.mass_1))
+        converted = ias_parser.convert_df_to_gwosc_df(df)
+        for alias, column in ias_parser.ALIASES.items():
+            self.assertTrue(np.shares_memory(converted[alias].to_numpy(), df[column].to_numpy()))
+        np.testing.assert_array_equal(
+            converted['mass_ratio'], bilby_conversion.symmetric_mass_ratio_to_mass_ratio(df['eta']))
+
+    def test_source_frame(self):
+        df = pd.DataFrame(dict(mass1=self.mass_1, mass2=self.mass_2, chi_eff=self.eta,
+                               tc=self.mass_1, distance=self.mass_1, redshift=self.eta))
+        converted = pycbc_parser.convert_df_to_gwosc_df(df)
+        np.testing.assert_array_equal(
+            converted['total_mass_source'], (self.mass_1 + self.mass_2) / (1 + self.eta))
+
+
+if __name__ == '__main__':
+    unittest.main()
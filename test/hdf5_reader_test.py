@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import h5py
+import numpy as np
+
+from catalog_generators import hdf5_reader, synthetic_data
+from catalog_generators.catalog_generator import get_catalog_generator
+
+ROW_SELECTIONS = [
+    None,
+    slice(10, 50),
+    slice(5, None, 7),
+    np.array([3, 7, 8, 40, 99]),
+    [0, 1, 2],
+    np.array([], dtype=int),
+]
+
+
+def open_files() -> int:
+    return h5py.h5f.get_obj_count(h5py.h5f.OBJ_ALL, h5py.h5f.OBJ_FILE)
+
+
+def select(array: np.ndarray, rows) -> np.ndarray:
+    return array if rows is None else array[rows]
+
+
+class Hdf5ReaderTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.columns = {name: rng.normal(size=100) for name in ["a", "b", "c"]}
+        self.fname = os.path.join(self.tmp_dir.name, "layouts.h5")
+        with h5py.File(self.fname, mode='w') as h5file:
+            group = h5file.create_group("plain")
+            for name, values in self.columns.items():
+                group.create_dataset(name, data=values, chunks=(16,), compression="gzip")
+            compound = np.zeros(100, dtype=[(name, float) for name in self.columns])
+            for name, values in self.columns.items():
+                compound[name] = values
+            h5file.create_dataset("compound", data=compound, chunks=(16,))
+            group = h5file.create_group("label/posterior_samples")
+            group.create_dataset("samples", data=np.column_stack(list(self.columns.values())))
+            group.create_dataset("parameter_names", data=[n.encode() for n in self.columns])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_layouts(self):
+        for path in ["plain", "compound", "label/posterior_samples"]:
+            self.assertEqual(hdf5_reader.get_hdf5_columns(self.fname, path), ["a", "b", "c"])
+            self.assertEqual(hdf5_reader.get_hdf5_n_rows(self.fname, path), 100)
+            for rows in ROW_SELECTIONS:
+                columns = hdf5_reader.read_hdf5_columns(self.fname, path, ["c", "a"], rows)
+                self.assertEqual(list(columns), ["c", "a"])
+                for name, values in columns.items():
+                    np.testing.assert_array_equal(
+                        values, select(self.columns[name], rows), f"{path} {rows}")
+                self.assertEqual(open_files(), 0, path)
+
+    def test_keep_open(self):
+        with hdf5_reader.keep_open(self.fname) as h5file:
+            for start in range(0, 100, 30):
+                columns = hdf5_reader.read_hdf5_columns(
+                    self.fname, "compound", ["b"], slice(start, start + 30))
+                np.testing.assert_array_equal(columns["b"], self.columns["b"][start:start + 30])
+                self.assertTrue(h5file.id.valid)
+                self.assertEqual(open_files(), 1)
+            self.assertEqual(hdf5_reader.get_hdf5_n_rows(self.fname, "plain"), 100)
+        self.assertEqual(open_files(), 0)
+
+    def test_split_rows(self):
+        [(read, take)] = hdf5_reader._split_rows(np.array([4, 6, 9]))
+        self.assertEqual(read, slice(4, 10))
+        np.testing.assert_array_equal(take, [0, 2, 5])
+        for rows in [[5, 3], [3, 3, 4], [-1, 2], np.array([[1, 2]]), np.array([1.0, 2.0])]:
+            with self.assertRaises(ValueError, msg=rows):
+                hdf5_reader._split_rows(rows)
+
+        # selections spanning the file are read one bounded block at a time
+        rows = np.array([0, 1, 15, 40, 41, 99])
+        with mock.patch.object(hdf5_reader, "READ_BLOCK_ROWS", 16):
+            splits = hdf5_reader._split_rows(rows)
+            self.assertEqual([read for read, _ in splits],
+                             [slice(0, 16), slice(40, 42), slice(99, 100)])
+            for path in ["plain", "compound", "label/posterior_samples"]:
+                columns = hdf5_reader.read_hdf5_columns(self.fname, path, ["b"], rows)
+                np.testing.assert_array_equal(columns["b"], self.columns["b"][rows], path)
+
+    def test_parsers(self):
+        catalogs = {"IAS": ["DL", "mchirp"], "PyCBC": ["distance", "mass1"],
+                    "GWTC-1": ["m1_detector_frame_Msun", "luminosity_distance_Mpc"],
+                    "bilby": ["mass_1", "luminosity_distance"]}
+        for catalog, parameters in catalogs.items():
+            generator = get_catalog_generator(catalog)
+            file = synthetic_data.write_synthetic_catalog(
+                catalog, os.path.join(self.tmp_dir.name, catalog), n_events=1, n_samples=100)[0]
+            _, everything = generator.read_event_file(file)
+            self.assertEqual(len(everything), generator.count_event_samples(file))
+            for rows in ROW_SELECTIONS:
+                _, samples = generator.read_event_file(file, parameters=parameters, rows=rows)
+                self.assertEqual(list(samples.columns), parameters, catalog)
+                for name in parameters:
+                    np.testing.assert_array_equal(
+                        samples[name].to_numpy(),
+                        select(everything[name].to_numpy(), rows), f"{catalog} {rows}")
+                self.assertEqual(open_files(), 0, catalog)
+
+
+if __name__ == '__main__':
+    unittest.main()
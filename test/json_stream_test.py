@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from catalog_generators.json_stream import (
+    CatalogWriter, iter_catalog_events, read_catalog_dataframe, write_catalog
+)
+from catalog_generators.utils import dict_to_json
+
+SUMMARIES = {
+    f"GW1509{14 + i}": {"GPS": 1126259462.4 + i, "mass_1_source": 35.6 + i,
+                        "commonName": f"GW1509{14 + i}", "flag": None}
+    for i in range(5)
+}
+
+
+class JsonStreamTestCase(unittest.TestCase):
+
+    def test_pretty_matches_dict_to_json(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            expected, streamed = (os.path.join(tmp_dir, f) for f in ["a.json", "b.json"])
+            dict_to_json(json_fname=expected, data_dict=dict(events=SUMMARIES))
+            # events written out of order are sorted on close
+            write_catalog(streamed, dict(reversed(SUMMARIES.items())))
+            with open(expected, 'rb') as f1, open(streamed, 'rb') as f2:
+                self.assertEqual(f1.read(), f2.read())
+
+    def test_modes_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            # the format is read from the file, not from its extension
+            for mode, fname in [("pretty", "c.json"), ("compact", "c.json"),
+                                ("ndjson", "c.ndjson"), ("ndjson", "d.json"),
+                                ("pretty", "d.ndjson"), ("compact", "d.jsonl")]:
+                fname = os.path.join(tmp_dir, fname)
+                write_catalog(fname, SUMMARIES, mode)
+                # chunks smaller than an event
+                self.assertEqual(dict(iter_catalog_events(fname, chunk_size=7)), SUMMARIES)
+                write_catalog(fname, {}, mode)
+                self.assertEqual(list(iter_catalog_events(fname)), [])
+
+    def test_failed_write_keeps_previous_catalog(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fname = os.path.join(tmp_dir, "catalog.json")
+            write_catalog(fname, SUMMARIES)
+            with self.assertRaises(RuntimeError):
+                with CatalogWriter(fname) as writer:
+                    writer.write_event("GW000000", {})
+                    raise RuntimeError
+            self.assertEqual(dict(iter_catalog_events(fname)), SUMMARIES)
+            self.assertEqual(os.listdir(tmp_dir), ["catalog.json"])
+
+    def test_read_catalog_dataframe(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            fname = os.path.join(tmp_dir, "catalog.json")
+            write_catalog(fname, SUMMARIES, "compact")
+            df = read_catalog_dataframe(fname, columns=["GPS", "missing"])
+        self.assertEqual(list(df.columns), ["GPS", "missing"])
+        self.assertEqual(list(df.index), list(SUMMARIES))
+        self.assertAlmostEqual(df.loc["GW150914", "GPS"], 1126259462.4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+from catalog_generators import benchmark
+from catalog_generators.lazy_import import LazyModule, lazy_import
+
+
+class LazyImportTestCase(unittest.TestCase):
+
+    def test_package_import_defers_heavy_dependencies(self):
+        for module in ["catalog_generators", "catalog_generators.ias_parser",
+                       "catalog_generators.bilby_parser", "catalog_generators.sample_store"]:
+            result = benchmark.time_import(module, repeat=1)
+            self.assertEqual(result['loaded'], [], module)
+
+    def test_lazy_module_loads_on_attribute_access(self):
+        module = LazyModule("json.decoder")
+        self.assertIn("not loaded", repr(module))
+        self.assertTrue(callable(module.JSONDecoder))
+        self.assertIs(lazy_import("json"), __import__("json"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from catalog_generators import catalog_generator, synthetic_data
+from catalog_generators.catalog_generator import get_catalog_generator
+from catalog_generators.downsampling import Downsampler
+from catalog_generators.manifest import get_manifest_fname
+
+
+class ManifestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.data_dir = os.path.join(self.tmp_dir, "gwtc1")
+        self.files = synthetic_data.write_synthetic_catalog(
+            "GWTC-1", self.data_dir, n_events=3, n_samples=200)
+        self.out_fname = os.path.join(self.tmp_dir, "gwtc1_catalog.json")
+        self.generator_class = get_catalog_generator("GWTC-1")
+        self.read_files = []
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def generate(self, **kwargs):
+        """summaries of generate, with the files read recorded in self.read_files"""
+        read_event_file = self.generator_class.read_event_file
+        self.read_files = []
+
+        def counting_read_event_file(file, *args, **kwargs):
+            self.read_files.append(file)
+            return read_event_file(file, *args, **kwargs)
+
+        generator = self.generator_class(self.data_dir, executor="serial", **kwargs)
+        with mock.patch.object(generator, "read_event_file", counting_read_event_file):
+            return generator.generate(self.out_fname)
+
+    def test_unchanged_files_are_not_read(self):
+        summaries = self.generate()
+        self.assertEqual(sorted(self.read_files), sorted(self.files))
+        self.assertEqual(self.generate(), summaries)
+        self.assertEqual(self.read_files, [])
+
+    def test_modified_file_is_summarised_again(self):
+        summaries = self.generate()
+        shutil.copyfile(self.files[1], self.files[0])
+        new_summaries = self.generate()
+        self.assertEqual(self.read_files, [self.files[0]])
+        event_name = self.generator_class.get_event_name(self.files[0])
+        self.assertNotEqual(new_summaries[event_name], summaries[event_name])
+
+    def test_touched_identical_file_is_kept(self):
+        self.generate()
+        stat = os.stat(self.files[0])
+        os.utime(self.files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.generate()
+        self.assertEqual(self.read_files, [])
+        # the new mtime is recorded, so the file is not hashed again
+        with open(get_manifest_fname(self.out_fname)) as f:
+            entries = json.load(f)['files']
+        self.assertEqual(entries[os.path.abspath(self.files[0])]['mtime'],
+                         stat.st_mtime_ns + 10 ** 9)
+
+    def test_deleted_file_is_dropped(self):
+        self.generate()
+        os.remove(self.files[2])
+        summaries = self.generate()
+        self.assertEqual(self.read_files, [])
+        self.assertNotIn(self.generator_class.get_event_name(self.files[2]), summaries)
+        with open(self.out_fname) as f:
+            self.assertEqual(sorted(json.load(f)['events']), sorted(summaries))
+
+    def test_parser_version_and_settings_invalidate(self):
+        self.generate()
+        self.generate(downsampler=Downsampler(n_samples=100))
+        self.assertEqual(len(self.read_files), 3)
+        self.generate(downsampler=Downsampler(n_samples=100))
+        self.assertEqual(self.read_files, [])
+        with mock.patch.object(self.generator_class, "parser_version",
+                               self.generator_class.parser_version + 1):
+            self.generate(downsampler=Downsampler(n_samples=100))
+        self.assertEqual(len(self.read_files), 3)
+
+        with mock.patch.object(catalog_generator, "SUMMARY_VERSION",
+                               catalog_generator.SUMMARY_VERSION + 1):
+            self.generate(downsampler=Downsampler(n_samples=100))
+        self.assertEqual(len(self.read_files), 3)
+
+    def test_file_changed_while_read_is_stale(self):
+        read_event_file = self.generator_class.read_event_file
+
+        def read_and_modify(file, *args, **kwargs):
+            result = read_event_file(file, *args, **kwargs)
+            if file == self.files[0]:
+                shutil.copyfile(self.files[1], self.files[0])
+            return result
+
+        with mock.patch.object(self.generator_class, "read_event_file",
+                               staticmethod(read_and_modify)):
+            self.generate()
+        self.assertEqual(len(self.read_files), 3)
+        # the fingerprint cached is the one of the file as it was read
+        self.generate()
+        self.assertEqual(self.read_files, [self.files[0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,25 @@
+import unittest
+
+from catalog_generators.parallel import parallel_map
+
+
+def square(x):
+    return x * x
+
+
+class ParallelMapTestCase(unittest.TestCase):
+
+    def test_results_keep_input_order(self):
+        items = list(range(20))
+        expected = [square(i) for i in items]
+        for executor in ["serial", "thread", "process"]:
+            results = parallel_map(square, items, n_workers=3, executor=executor)
+            self.assertEqual(results, expected)
+
+    def test_unknown_executor(self):
+        with self.assertRaises(ValueError):
+            parallel_map(square, [1], executor="gpu")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import os
+import tempfile
+import unittest
+
+from catalog_generators import profiling, synthetic_data
+from catalog_generators.catalog_generator import get_catalog_generator
+
+
+class ProfilingTestCase(unittest.TestCase):
+
+    def tearDown(self) -> None:
+        profiling.disable_profiling()
+
+    def test_disabled_by_default(self):
+        with profiling.timer("read"), profiling.profile_event("event"):
+            profiling.count("samples_read", 10)
+        self.assertIsNone(profiling.get_profile_report())
+
+    def test_worker_processes_are_merged(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            files = synthetic_data.write_synthetic_catalog(
+                "GWTC-1", tmp_dir, n_events=3, n_samples=100)
+            generator = get_catalog_generator("GWTC-1")(
+                tmp_dir, n_workers=2, executor="process")
+            profiling.enable_profiling(cprofile=True)
+            generator.generate(os.path.join(tmp_dir, "catalog.json"))
+            report = profiling.disable_profiling()
+        self.assertEqual(report['counters']['files_read'], 3)
+        self.assertEqual(report['counters']['samples_read'], 300)
+        self.assertEqual(report['timers']['summarise']['calls'], 3)
+        self.assertEqual(report['timers']['serialise']['calls'], 3)
+        self.assertEqual(set(report['events']), {os.path.basename(f) for f in files})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from catalog_generators import ias_parser, synthetic_data
+from catalog_generators.sample_store import SampleStore, export_parser_samples
+
+
+def assert_samples_equal(df, expected):
+    """(the columns may be memmaps)"""
+    assert list(df.columns) == list(expected.columns), (df.columns, expected.columns)
+    for column in df.columns:
+        np.testing.assert_array_equal(np.asarray(df[column]), expected[column].to_numpy())
+
+
+def is_memmap_backed(array: np.ndarray) -> bool:
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+class SampleStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.store = SampleStore(os.path.join(self.tmp_dir.name, "samples.h5"))
+        rng = np.random.default_rng(0)
+        self.events = {
+            "GW1": pd.DataFrame(dict(mass_1=rng.normal(size=100), mass_2=rng.normal(size=100),
+                                     n=np.arange(100))),
+            "GW2": pd.DataFrame(dict(mass_1=rng.normal(size=50), mass_2=rng.normal(size=50),
+                                     n=np.arange(50))),
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        self.store.write_catalog("A", self.events)
+        self.assertEqual(self.store.catalogs(), ["A"])
+        self.assertEqual(self.store.events("A"), ["GW1", "GW2"])
+        self.assertEqual(self.store.columns("A", "GW1"), ["mass_1", "mass_2", "n"])
+        for mmap in [True, False]:
+            for event, samples in self.events.items():
+                assert_samples_equal(self.store.read_event("A", event, mmap=mmap), samples)
+        projected = self.store.read_catalog("A", columns=["n", "mass_2"])
+        assert_samples_equal(projected["GW2"], self.events["GW2"][["n", "mass_2"]])
+
+    def test_mmap_columns_are_read_only(self):
+        self.store.write_catalog("A", self.events)
+        df = self.store.read_event("A", "GW1")
+        for column in df.columns:
+            self.assertTrue(is_memmap_backed(df[column].to_numpy()), column)
+            self.assertFalse(df[column].to_numpy().flags.writeable, column)
+        in_memory = self.store.read_event("A", "GW1", mmap=False)
+        for column in in_memory.columns:
+            self.assertFalse(is_memmap_backed(in_memory[column].to_numpy()), column)
+
+    def test_overwrite_event(self):
+        self.store.write_catalog("A", self.events)
+        new_samples = pd.DataFrame(dict(chirp_mass=np.ones(10)))
+        self.store.write_event("A", "GW1", new_samples)
+        assert_samples_equal(self.store.read_event("A", "GW1"), new_samples)
+        assert_samples_equal(self.store.read_event("A", "GW2"), self.events["GW2"])
+
+    def test_export_parser_samples(self):
+        data_dir = os.path.join(self.tmp_dir.name, "ias")
+        files = synthetic_data.write_synthetic_catalog("IAS", data_dir, n_events=2, n_samples=100)
+        export_parser_samples(self.store, "IAS", ias_parser, data_dir)
+        expected = ias_parser.make_events_gwosc_compatible(
+            ias_parser.load_event_samples_to_dataframes(data_dir))
+        self.assertEqual(self.store.events("IAS"), sorted(expected))
+        self.assertEqual(len(expected), len(files))
+        for event, samples in expected.items():
+            assert_samples_equal(self.store.read_event("IAS", event), samples)
+
+
+if __name__ == '__main__':
+    unittest.main()
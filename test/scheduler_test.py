@@ -0,0 +1,91 @@
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from catalog_generators import synthetic_data
+from catalog_generators.catalog_generator import get_catalog_generator
+from catalog_generators.file_index import FileIndex
+from catalog_generators.scheduler import Scheduler, largest_first
+
+
+class MemoryTracker:
+
+    def __init__(self, costs):
+        self.costs = costs
+        self.memory = 0
+        self.peak = 0
+        self.started = []
+        self.lock = threading.Lock()
+
+    def __call__(self, i):
+        with self.lock:
+            self.started.append(i)
+            self.memory += self.costs[i][1]
+            self.peak = max(self.peak, self.memory)
+        time.sleep(0.01)
+        with self.lock:
+            self.memory -= self.costs[i][1]
+        return i * 2
+
+
+class SchedulerTestCase(unittest.TestCase):
+
+    def test_largest_first(self):
+        self.assertEqual(largest_first([(1, 0), (5, 0), (1, 0), (3, 0)]), [1, 3, 0, 2])
+
+    def test_memory_budget(self):
+        costs = [(w, w * 4) for w in [1, 8, 2, 20, 3, 3, 5]]
+        tracker = MemoryTracker(costs)
+        scheduler = Scheduler(n_workers=4, executor="thread", memory_budget=100)
+        results = dict(scheduler.imap(tracker, range(len(costs)), costs))
+        self.assertEqual(results, {i: i * 2 for i in range(len(costs))})
+        self.assertEqual(tracker.started[0], 3)
+        self.assertLessEqual(tracker.peak, 100)
+        # the item above the budget runs alone
+        costs[3] = (20, 500)
+        tracker = MemoryTracker(costs)
+        dict(scheduler.imap(tracker, range(len(costs)), costs))
+        self.assertEqual(tracker.peak, 500)
+        self.assertEqual(scheduler.report['peak_memory'], 500)
+
+        report = scheduler.report
+        self.assertEqual(sum(w['n_items'] for w in report['workers'].values()), len(costs))
+        self.assertLessEqual(len(report['workers']), 4)
+        self.assertGreater(report['efficiency'], 0)
+        self.assertLessEqual(report['ideal_seconds'], report['wall_seconds'])
+
+    def test_generate(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, "gwtc1")
+            synthetic_data.write_synthetic_catalog("GWTC-1", data_dir, n_events=4, n_samples=500)
+            index = FileIndex(os.path.join(tmp_dir, "file_index.json"))
+            index.scan({"GWTC-1": data_dir})
+            generator_class = get_catalog_generator("GWTC-1")
+            generator = generator_class(data_dir, n_workers=2, executor="thread",
+                                        memory_budget=1, file_index=index)
+            files = generator.get_event_files()
+            # the work is the number of summarised values
+            n_values = 500 * len(generator_class.summary_params)
+            with mock.patch.object(generator, "describe_event_file", side_effect=AssertionError):
+                costs = generator.estimate_event_file_costs(files)
+            self.assertEqual([work for work, _ in costs], [n_values] * len(files))
+            # (the files are opened by the workers without an index)
+            unindexed = generator_class(data_dir, n_workers=2, executor="thread")
+            self.assertEqual(unindexed.estimate_event_file_costs(files), costs)
+
+            out_fname = os.path.join(tmp_dir, "scheduled.json")
+            serial_fname = os.path.join(tmp_dir, "serial.json")
+            generator.generate(out_fname, incremental=False)
+            generator_class(data_dir).generate(serial_fname, incremental=False)
+            with open(out_fname) as f, open(serial_fname) as g:
+                self.assertEqual(f.read(), g.read())
+            # a budget of 1 byte runs one file at a time
+            self.assertEqual(generator.schedule_report['peak_memory'],
+                             max(generator.estimate_event_file_cost(f)[1] for f in files))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from catalog_generators import profiling, synthetic_data
+from catalog_generators.catalog_generator import get_catalog_generator
+from catalog_generators.streaming_quantiles import StreamingQuantiles, rank_error_bound
+from catalog_generators.utils import summarise_samples_matrix
+
+
+def stream(samples, chunk_size, sketch_size):
+    quantiles = StreamingQuantiles(["a", "b"], sketch_size)
+    for start in range(0, len(samples), chunk_size):
+        quantiles.update_matrix(samples[start:start + chunk_size])
+    return quantiles
+
+
+class StreamingQuantilesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.samples = np.column_stack([rng.normal(size=100000), rng.exponential(size=100000)])
+
+    def tearDown(self):
+        profiling.disable_profiling()
+
+    def test_exact_without_compaction(self):
+        samples = self.samples[:1001]
+        quantiles = stream(samples, 100, sketch_size=1024)
+        for streamed, exact in zip(quantiles.quantiles(), summarise_samples_matrix(samples)):
+            np.testing.assert_array_equal(streamed, exact)
+        self.assertEqual(quantiles.rank_error(), 0)
+
+    def test_error_within_bound(self):
+        quantiles = stream(self.samples, 3000, sketch_size=256)
+        epsilon = quantiles.rank_error()
+        self.assertEqual(epsilon, rank_error_bound(len(self.samples), 256))
+        self.assertLess(quantiles.memory_usage(), 2 * 256 * 16 * 2 * 8)
+        n = len(self.samples)
+        for values, q in zip(quantiles.quantiles(), [0.16, 0.84, 0.5]):
+            for j in range(2):
+                rank = np.sum(self.samples[:, j] <= values[j])
+                self.assertLessEqual(abs(rank - q * (n - 1)), epsilon * n + 1)
+        # independent of the block boundaries
+        for streamed, other in zip(quantiles.quantiles(),
+                                   stream(self.samples, 777, sketch_size=256).quantiles()):
+            np.testing.assert_array_equal(streamed, other)
+
+    def test_nans(self):
+        samples = self.samples.copy()
+        samples[5, 1] = np.nan
+        lower, upper, median = stream(samples, 1000, sketch_size=128).quantiles()
+        self.assertTrue(np.isfinite(median[0]))
+        self.assertTrue(np.isnan([lower[1], upper[1], median[1]]).all())
+
+    def test_chunked_generate(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            synthetic_data.write_synthetic_catalog("PyCBC", tmp_dir, n_events=2, n_samples=20000)
+            exact = get_catalog_generator("PyCBC")(tmp_dir).generate(
+                os.path.join(tmp_dir, "exact.json"))
+            profiling.enable_profiling()
+            chunked = get_catalog_generator("PyCBC")(tmp_dir, chunk_size=3000, sketch_size=512).generate(
+                os.path.join(tmp_dir, "chunked.json"))
+            report = profiling.disable_profiling()
+        self.assertEqual(report['counters']['files_read'], 2)
+        self.assertEqual(report['counters']['chunks_read'], 14)
+        for event_name, summary in exact.items():
+            for key in ["mass_1_source", "luminosity_distance_lower", "chi_eff_upper"]:
+                self.assertAlmostEqual(chunked[event_name][key], summary[key], delta=0.05 * abs(summary[key]))
+
+    def test_chunk_size_excludes_bootstrap(self):
+        with self.assertRaises(ValueError):
+            get_catalog_generator("PyCBC")(chunk_size=1000, n_bootstrap=10)
+
+
+if __name__ == '__main__':
+    unittest.main()
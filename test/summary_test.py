@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from catalog_generators import utils
+from catalog_generators.catalog_generator import get_catalog_generator
+from catalog_generators.synthetic_data import write_synthetic_catalog
+
+
+class SummaryTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.default_rng(0)
+        self.samples = rng.normal(size=(1001, 4)) * [1, 10, 100, 1000]
+        self.weights = rng.uniform(size=1001)
+
+    def test_matches_percentile_and_median(self):
+        for n in [1000, 1001]:
+            samples = self.samples[:n]
+            lower, upper, median = utils.summarise_samples_matrix(samples)
+            expected = np.percentile(samples, [16, 84], axis=0)
+            np.testing.assert_array_equal(lower, expected[0])
+            np.testing.assert_array_equal(upper, expected[1])
+            np.testing.assert_array_equal(median, np.median(samples, axis=0))
+
+    def test_uniform_weights_match_unweighted(self):
+        weighted = utils.summarise_samples_matrix(
+            self.samples, weights=np.ones(len(self.samples)))
+        unweighted = utils.summarise_samples_matrix(self.samples)
+        scale = self.samples.std(axis=0)
+        for w, u in zip(weighted, unweighted):
+            np.testing.assert_allclose(w / scale, u / scale, atol=1e-2)
+
+    def test_summarise_dataframe_keys(self):
+        df = pd.DataFrame(self.samples, columns=["a", "b", "c", "d"])
+        summary = utils.summarise_dataframe(df, weights=self.weights)
+        self.assertEqual(len(summary), 12)
+        self.assertLess(summary["a_lower"], summary["a"])
+        self.assertLess(summary["a"], summary["a_upper"])
+
+    def test_bootstrap_matches_resampled_summaries(self):
+        samples = np.round(self.samples, 1)  # with ties
+        lower, upper, median = utils.bootstrap_quantiles(
+            samples, 30, np.random.default_rng(1), max_chunk_bytes=8 * 24 * len(samples))
+        rng = np.random.default_rng(1)
+        for start in range(0, 30, 8):
+            indices = rng.integers(0, len(samples), size=(min(8, 30 - start), len(samples)))
+            for i, rows in enumerate(indices):
+                expected = utils.summarise_samples_matrix(samples[rows])
+                for replicates, values in zip([lower, upper, median], expected):
+                    np.testing.assert_array_equal(replicates[start + i], values)
+
+    def test_bootstrap_dataframe_keys(self):
+        df = pd.DataFrame(self.samples, columns=["a", "b", "c", "d"])
+        replicates = utils.bootstrap_dataframe(df, 20, np.random.default_rng(0))
+        self.assertEqual(set(replicates), set(utils.summarise_dataframe(df)))
+        self.assertEqual(replicates["a_lower"].shape, (20,))
+
+    def test_generator_standard_errors(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_synthetic_catalog("GWTC-1", tmp_dir, n_events=1, n_samples=2000)
+            generator = get_catalog_generator("GWTC-1")(tmp_dir, n_bootstrap=50)
+            summary, = generator.generate(os.path.join(tmp_dir, "catalog.json")).values()
+        errors = summary['standard_errors']
+        self.assertNotIn('commonName', errors)
+        self.assertIsNone(errors['far'])
+        # derived keys are bootstrapped too
+        for key in ['mass_1_source', 'redshift_upper', 'luminosity_distance_lower']:
+            self.assertGreater(errors[key], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
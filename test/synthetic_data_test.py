@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from catalog_generators import benchmark, synthetic_data
+from catalog_generators.catalog_generator import get_catalog_generator
+
+
+class SyntheticDataTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_dirs = synthetic_data.write_synthetic_catalogs(
+            self.tmp_dir.name, n_events=3, n_samples=200)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_every_catalog_is_generated(self):
+        for catalog, data_dir in self.data_dirs.items():
+            generator = get_catalog_generator(catalog)(data_dir)
+            _, samples = generator.read_event_file(generator.get_event_files()[0])
+            if generator.search_params:
+                self.assertEqual(set(samples.columns), set(generator.search_params))
+            summaries = generator.generate(os.path.join(self.tmp_dir.name, f"{catalog}.json"))
+            self.assertEqual(len(summaries), 3)
+            for summary in summaries.values():
+                self.assertLess(summary['mass_1_source_lower'], summary['mass_1_source'])
+                self.assertGreater(summary['redshift'], 0)
+
+    def test_benchmark_report(self):
+        results = benchmark.run_benchmarks(
+            catalogs=["GWTC-1"], n_events=2, n_samples=100, work_dir=self.tmp_dir.name)
+        stages = results['catalogs']['GWTC-1']['stages']
+        self.assertEqual(list(stages.keys()), benchmark.STAGES)
+        self.assertIn('peak_memory_mb', stages['load'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from catalog_generators import gwosc_conversion as conversion
+from catalog_generators.cosmology import CACHE_DIR_ENV
+from catalog_generators.transform_cache import TransformCache, transform_key
+
+
+class TransformCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.cache = TransformCache(self.tmp_dir.name)
+        self.calls = 0
+
+    def double(self, values):
+        self.calls += 1
+        return 2 * values
+
+    def test_compute_caches_by_content(self):
+        values = np.arange(10.)
+        first = self.cache.compute("double", self.double, values)
+        second = self.cache.compute("double", self.double, values.copy())
+        np.testing.assert_array_equal(second, first)
+        self.assertEqual(self.calls, 1)
+        self.cache.compute("double", self.double, values.astype(np.float32))
+        self.cache.compute("twice", self.double, values)
+        self.assertEqual(self.calls, 3)
+        self.assertNotEqual(transform_key("a", [values[:5]]), transform_key("a", [values[5:]]))
+
+    def test_evicts_least_recently_used(self):
+        values = [np.full(1000, i, dtype=float) for i in range(3)]
+        keys = [transform_key("double", [v]) for v in values]
+        for i, (key, value) in enumerate(zip(keys, values)):
+            self.cache.put(key, value)
+            os.utime(self.cache.fname(key), ns=(i, i))
+        entry_size = os.path.getsize(self.cache.fname(keys[0]))
+        self.cache.get(keys[0])
+        self.cache.max_bytes = 2 * entry_size
+        self.cache.evict()
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+        self.assertEqual(self.cache.size(), 2 * entry_size)
+
+    def test_unreadable_entry_is_a_miss(self):
+        key = transform_key("double", [np.ones(3)])
+        with open(self.cache.fname(key), "w") as f:
+            f.write("not an npy file")
+        self.assertIsNone(self.cache.get(key))
+        self.assertFalse(os.path.exists(self.cache.fname(key)))
+
+    def test_derive_columns(self):
+        columns = dict(mass_1=np.array([30., 20.]), mass_2=np.array([20., 10.]))
+        names = ["mass_ratio", "total_mass", "chirp_mass"]
+        args = ("component_masses", names, columns, ["mass_1", "mass_2"],
+                conversion.derive_component_mass_columns)
+        expected = conversion.derive_columns(*args)
+        with mock.patch.dict(os.environ, {CACHE_DIR_ENV: self.tmp_dir.name}):
+            for _ in range(2):
+                derived = conversion.derive_columns(*args)
+                for name in names:
+                    np.testing.assert_array_equal(derived[name], expected[name])
+        self.assertEqual(len(os.listdir(os.path.join(self.tmp_dir.name, "transforms"))), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
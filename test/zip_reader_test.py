@@ -0,0 +1,111 @@
+import os
+import tempfile
+import tracemalloc
+import unittest
+import zipfile
+from unittest import mock
+
+from catalog_generators import hdf5_reader, synthetic_data, zip_reader
+from catalog_generators.catalog_generator import get_catalog_generator
+
+
+class ZipReaderTestCase(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.unpacked_dir = os.path.join(self.tmp_dir.name, "unpacked")
+        self.files = synthetic_data.write_synthetic_catalog(
+            "bilby", self.unpacked_dir, n_events=3, n_samples=500)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def write_archive(self, compression):
+        data_dir = os.path.join(self.tmp_dir.name, f"zip_{compression}")
+        os.makedirs(data_dir)
+        archive = os.path.join(data_dir, "pesummary_samples.zip")
+        with zipfile.ZipFile(archive, 'w', compression=compression) as zf:
+            for fname in self.files:
+                zf.write(fname, arcname=f"samples/{os.path.basename(fname)}")
+        return data_dir, archive
+
+    def test_stored_member_random_access(self):
+        _, archive = self.write_archive(zipfile.ZIP_STORED)
+        member = zip_reader.list_zip_members(archive, "*.h5")[1]
+        with open(self.files[1], 'rb') as f:
+            data = f.read()
+        with zip_reader.open_zip_member(member) as fileobj:
+            self.assertIsInstance(fileobj, zip_reader.StoredMemberFile)
+            fileobj.seek(-100, os.SEEK_END)
+            self.assertEqual(fileobj.read(), data[-100:])
+            fileobj.seek(10)
+            self.assertEqual(fileobj.read(50), data[10:60])
+
+    def test_catalog_from_archive_matches_unpacked_files(self):
+        generator = get_catalog_generator("bilby")
+        expected = generator(self.unpacked_dir).generate(
+            os.path.join(self.tmp_dir.name, "unpacked.json"))
+        for compression in [zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED]:
+            data_dir, _ = self.write_archive(compression)
+            catalog = generator(data_dir)
+            self.assertEqual(len(catalog.get_event_files()), 3)
+            summaries = catalog.generate(os.path.join(data_dir, "catalog.json"))
+            self.assertEqual(summaries, expected)
+
+    def write_large_archive(self):
+        """data dir of an archive with a deflated member much larger than
+        SPOOL_MAX_SIZE, and the member's unpacked file"""
+        fname = synthetic_data.write_synthetic_catalog(
+            "bilby", os.path.join(self.tmp_dir.name, "large"), n_events=1, n_samples=40000)[0]
+        data_dir = os.path.join(self.tmp_dir.name, "zip_large")
+        os.makedirs(data_dir)
+        with zipfile.ZipFile(os.path.join(data_dir, "samples.zip"), 'w',
+                             compression=zipfile.ZIP_DEFLATED) as zf:
+            zf.write(fname, arcname=os.path.basename(fname))
+        self.assertGreater(os.path.getsize(fname), 8 * zip_reader.SPOOL_MAX_SIZE)
+        return data_dir, fname
+
+    def test_deflated_member_spools_to_disk(self):
+        data_dir, fname = self.write_large_archive()
+        member = zip_reader.list_zip_members(os.path.join(data_dir, "samples.zip"))[0]
+        with open(fname, 'rb') as f:
+            data = f.read()
+        tracemalloc.start()
+        try:
+            with zip_reader.open_zip_member(member) as fileobj:
+                _, peak = tracemalloc.get_traced_memory()
+                self.assertTrue(fileobj._rolled)
+                fileobj.seek(-100, os.SEEK_END)
+                self.assertEqual(fileobj.read(), data[-100:])
+                fileobj.seek(10)
+                self.assertEqual(fileobj.read(50), data[10:60])
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, len(data) / 4)
+        # decompressing into memory is opt-in
+        with zip_reader.open_zip_member(member, in_memory=True) as fileobj:
+            self.assertEqual(fileobj.read(), data)
+
+    def test_chunked_deflated_member(self):
+        # large enough for the member to dominate the memory of a whole read
+        data_dir, fname = self.write_large_archive()
+        generator = get_catalog_generator("bilby")(data_dir, chunk_size=2000, sketch_size=256)
+        member = generator.get_event_files()[0]
+        expected = generator.summarise_event_file(fname)
+
+        open_member = mock.Mock(wraps=zip_reader.open_zip_member)
+        tracemalloc.start()
+        try:
+            with mock.patch.object(hdf5_reader, "open_zip_member", open_member):
+                summary = generator.summarise_event_file(member)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(summary[1], expected[1])
+        # the member is decompressed once for all the blocks
+        open_member.assert_called_once_with(member)
+        self.assertLess(peak, os.path.getsize(fname) / 4)
+
+
+if __name__ == '__main__':
+    unittest.main()